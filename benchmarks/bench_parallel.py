@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark of evaluate_many scaling with the number of worker processes.
+
+Runs the same batch of series with 1, 2, 4, ... workers up to the number
+of CPUs and prints the time and speedup against one worker.
+
+    python benchmarks/bench_parallel.py --series 40000 --backend python
+"""
+
+import argparse
+import os
+import random
+import time
+
+from spcchart.batch import evaluate_many
+from spcchart.spc import RULES_ALL, CHART_X_MR_X
+
+
+def make_series(count, min_len, max_len, seed=1):
+    rnd = random.Random(seed)
+    return [[rnd.gauss(10, 2) for _ in range(rnd.randint(min_len, max_len))]
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--series', type=int, default=4000)
+    parser.add_argument('--min-len', type=int, default=500)
+    parser.add_argument('--max-len', type=int, default=5000)
+    parser.add_argument('--backend', default=None, help="python or numpy")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    options = parser.parse_args()
+
+    series = make_series(options.series, options.min_len, options.max_len)
+    if options.backend == 'numpy':
+        import numpy as np
+        values = np.concatenate([np.array(s) for s in series])
+        offsets = np.cumsum([0] + [len(s) for s in series])
+    else:
+        values = [v for s in series for v in s]
+        offsets = [0]
+        for s in series:
+            offsets.append(offsets[-1] + len(s))
+    print("%d series, %d points, backend %s" % (len(series), len(values), options.backend or "auto"))
+
+    workers = 1
+    base = None
+    while workers <= options.max_workers:
+        start = time.perf_counter()
+        evaluate_many(values, offsets, CHART_X_MR_X, RULES_ALL,
+                      workers=workers, backend=options.backend)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print("workers %3d: %8.2f s  speedup %5.2f" % (workers, elapsed, base / elapsed))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the streaming readers throughput in MB/s.
+
+Writes a CSV and a NDJSON file (plain and gzip compressed) with a
+timestamp, a label and a value per row, then reads the value column and
+pushes it into an incremental Spc. MB/s are of uncompressed text.
+
+    python benchmarks/bench_readers.py --rows 2000000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+
+from spcchart.readers import read_csv, read_ndjson, stream_spc
+from spcchart.spc import CHART_X_MR_X
+
+
+def write_files(directory, rows, seed=1):
+    rnd = random.Random(seed)
+    records = [(1700000000 + i, "line-%d" % (i % 4), round(rnd.gauss(10, 2), 4)) for i in range(rows)]
+    csv_text = "time,line,value\n" + "".join("%d,%s,%r\n" % r for r in records)
+    ndjson_text = "".join(json.dumps({"time": t, "line": l, "value": v}) + "\n" for t, l, v in records)
+    paths = {}
+    for name, text in (("csv", csv_text), ("ndjson", ndjson_text)):
+        paths[name] = os.path.join(directory, "data." + name)
+        with open(paths[name], "w") as f:
+            f.write(text)
+        paths[name + ".gz"] = paths[name] + ".gz"
+        with gzip.open(paths[name + ".gz"], "wt", compresslevel=6) as f:
+            f.write(text)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, options.rows)
+        for name, path in sorted(paths.items()):
+            read = read_csv if name.startswith("csv") else read_ndjson
+            mb = os.path.getsize(paths[name.replace(".gz", "")]) / 1e6
+            start = time.perf_counter()
+            count = sum(len(chunk) for chunk in read(path, "value"))
+            parse = time.perf_counter() - start
+            start = time.perf_counter()
+            stream_spc(read(path, "value"), CHART_X_MR_X)
+            total = time.perf_counter() - start
+            print("%-10s %8.1f MB %9d values  parse %7.1f MB/s  parse + Spc %7.1f MB/s"
+                  % (name, mb, count, mb / parse, mb / total))
+
+
+if __name__ == '__main__':
+    main()
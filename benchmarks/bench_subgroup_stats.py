@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark of subgroup statistics against the statistics module.
+
+Times means, ranges and standard deviations of all subgroups computed with
+`statistics.mean` / `statistics.stdev` per subgroup (as before) and with
+the single pass `subgroup_stats`, then the whole Xbar S charts.
+
+    python benchmarks/bench_subgroup_stats.py --subgroups 20000 --size 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from spcchart.spc import Spc, CHART_X_BAR_S_X, CHART_X_BAR_S_S, subgroup_stats
+
+
+def per_subgroup(data):
+    return ([statistics.mean(x) for x in data], [max(x) - min(x) for x in data],
+            [statistics.stdev(x) for x in data])
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subgroups', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=5)
+    options = parser.parse_args()
+
+    rnd = random.Random(1)
+    data = [[rnd.gauss(10, 2) for _ in range(options.size)] for _ in range(options.subgroups)]
+
+    old, expected = timed(per_subgroup, data)
+    new, result = timed(subgroup_stats, data)
+    error = max(abs(a - b) / b for a, b in zip(result[2], expected[2]))
+    print("statistics module %8.3f s" % old)
+    print("subgroup_stats    %8.3f s  speedup %6.1f  max rel. error of stdev %.1e"
+          % (new, old / new, error))
+    for chart_type in (CHART_X_BAR_S_X, CHART_X_BAR_S_S):
+        elapsed, _ = timed(lambda: Spc(data, chart_type).get_violating_points())
+        print("Spc %-14s %8.3f s" % (chart_type, elapsed))
+
+
+if __name__ == '__main__':
+    main()
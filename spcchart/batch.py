@@ -0,0 +1,372 @@
+"""
+Batch evaluation of many independent series of one chart type.
+
+Instead of building an `Spc` per series, all series are passed at once as
+columnar data: flat `values` and `offsets` where series `i` is
+`values[offsets[i]:offsets[i+1]]` (for subgrouped charts `values` holds
+one subgroup per row). Limits and violations come back as compact arrays.
+
+With NumPy installed (and array input, see `spc.get_backend`) the common
+charts are computed for all series together with array operations, so the
+cost per series is a few microseconds. Other charts, and the pure Python
+backend, fall back to a loop over the series which still skips building
+`Spc` objects. EWMA charts, which have limits per point rather than per
+series, are refused with `ValueError`; check them with `spc.Spc`.
+
+`evaluate_many` spreads the series over a pool of processes,
+`find_violating_points_parallel` splits one long series in chunks.
+
+>>> result = evaluate_batch([[1, 2, 3, 3, 2, 1, 3, 8], [5, 5, 6, 5, 4, 5]])
+>>> result.get_violating_points(0)
+{'1 beyond 3*sigma': [7]}
+"""
+
+import bisect
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from . import spc
+
+
+SUBGROUP_CHARTS = (spc.CHART_X_BAR_R_X, spc.CHART_X_BAR_R_R,
+                   spc.CHART_X_BAR_S_X, spc.CHART_X_BAR_S_S)
+
+
+class BatchResult(object):
+    """
+    Limits and violations of a batch of series.
+
+    `center`, `lcl` and `ucl` have one value per series (NaN where a chart
+    has no limit). Violations are three arrays of the same length, sorted
+    by series, rule and point: `series`, `rule` (index into `rules`) and
+    `point` (index as reported by `Spc.get_violating_points`).
+    """
+
+    def __init__(self, rules, center, lcl, ucl, series, rule, point):
+        self.rules = rules
+        self.center = center
+        self.lcl = lcl
+        self.ucl = ucl
+        self.series = series
+        self.rule = rule
+        self.point = point
+
+    def __len__(self):
+        return len(self.center)
+
+    def get_stats(self, i):
+        """Return limits of series `i` as tuple: (center, LCL, UCL)."""
+        return self.center[i], self.lcl[i], self.ucl[i]
+
+    def get_violating_points(self, i):
+        """Return violations of series `i` as {rule: [index]}, like `Spc`."""
+        lo = bisect.bisect_left(self.series, i)
+        hi = bisect.bisect_right(self.series, i, lo)
+        points = {}
+        for j in range(lo, hi):
+            points.setdefault(self.rules[self.rule[j]], []).append(int(self.point[j]))
+        # same key order as Spc: by first violation, then by rule
+        order = sorted(points, key=lambda r: (points[r][0], self.rules.index(r)))
+        return dict((r, points[r]) for r in order)
+
+
+def _check_chart(chart_type):
+    """Refuse charts whose limits do not fit one value per series."""
+    if chart_type == spc.CHART_EWMA:
+        raise ValueError("Chart %s has limits per point, evaluate it with spc.Spc" % chart_type)
+
+
+def _columnar(values, offsets, chart_type):
+    """Return flat values and offsets for list of series or 2D/3D input."""
+    if offsets is not None:
+        return values, offsets
+    if hasattr(values, 'ndim') and values.ndim == (3 if chart_type in SUBGROUP_CHARTS else 2):
+        rows = values.shape[1]
+        offsets = [i * rows for i in range(values.shape[0] + 1)]
+        return values.reshape((-1,) + values.shape[2:]), offsets
+    offsets = [0]
+    flat = []
+    for s in values:
+        flat.extend(s)
+        offsets.append(len(flat))
+    return flat, offsets
+
+
+def evaluate_batch(values, offsets=None, chart_type=spc.CHART_X_MR_X,
+                   rules=spc.RULES_BASIC, sizes=None, backend=None):
+    """
+    Evaluate control chart of every series, return `BatchResult`.
+
+    :arguments:
+      values
+       flat values (subgroups for Xbar charts) of all series, or a list
+       (2D array) of series when `offsets` is not given
+      offsets
+       start of each series in `values` followed by the total length
+      sizes
+       subgroup size, taken from the data for Xbar charts
+    """
+    _check_chart(chart_type)
+    values, offsets = _columnar(values, offsets, chart_type)
+    if sizes is None:
+        sizes = len(values[0]) if chart_type in SUBGROUP_CHARTS else 1
+    nb = spc.get_backend(values, backend)
+    if nb is not None:
+        from . import numpy_backend
+        return numpy_backend.evaluate_batch(values, offsets, chart_type, rules, sizes)
+    return _evaluate_loop(values, offsets, chart_type, rules, sizes)
+
+
+def first_violations(values, offsets=None, chart_type=spc.CHART_X_MR_X,
+                     rules=spc.RULES_BASIC, sizes=None, stop_any=False, backend=None):
+    """
+    Return `BatchResult` with only the first violation of each rule of
+    every series, or with `stop_any` only the violations at the first
+    violating point of each series, see `spc.Spc.first_violations`.
+
+    Series are checked one by one up to their first violations with the
+    pure Python backend; with NumPy all series are checked together in one
+    vectorized pass and only the first violations are kept.
+    """
+    _check_chart(chart_type)
+    values, offsets = _columnar(values, offsets, chart_type)
+    if sizes is None:
+        sizes = len(values[0]) if chart_type in SUBGROUP_CHARTS else 1
+    nb = spc.get_backend(values, backend)
+    if nb is not None and chart_type in nb.BATCH_STATS_FUNCS:
+        result = nb.evaluate_batch(values, offsets, chart_type, rules, sizes)
+        return nb.first_of_batch(result, stop_any)
+    # charts without vectorized statistics stop early in the loop
+    return _evaluate_loop(values, offsets, chart_type, rules, sizes, nb=nb, first=True, stop_any=stop_any)
+
+
+def _evaluate_loop(values, offsets, chart_type, rules, sizes, nb=None, first=False, stop_any=False):
+    """
+    Evaluate series one by one with pure Python or NumPy backend `nb`,
+    with `first` only up to the first violations, see `first_violations`.
+    """
+    sf, pd = (spc.STATS_FUNCS if nb is None else nb.STATS_FUNCS)[chart_type]
+    rs = spc._unique_rules(rules)
+    nan = float('nan')
+    center, lcl, ucl = array('d'), array('d'), array('d')
+    series, rule, point = array('q'), array('q'), array('q')
+    for i in range(len(offsets) - 1):
+        data = values[offsets[i]:offsets[i+1]]
+        c, l, u = sf(data, sizes)
+        center.append(c)
+        lcl.append(nan if l is None else l)
+        ucl.append(nan if u is None else u)
+        if first:
+            engine = spc.RuleEngine(c, l, u, rs, warmup=1)
+            found = engine.first(pd(data, sizes), stop_any=stop_any)
+            found = dict((r, [p]) for r, p in found.items())
+        elif nb is None:
+            found = spc.RuleEngine(c, l, u, rs, warmup=1).feed(pd(data, sizes))
+        else:
+            found = nb.find_violating_points(pd(data, sizes), c, l, u, rs, warmup=1)
+        for pos, r in enumerate(rs):
+            for p in found.get(r, ()):
+                series.append(i)
+                rule.append(pos)
+                point.append(p)
+    return BatchResult(rs, center, lcl, ucl, series, rule, point)
+
+
+def _pack(values, lo, hi, subgroups, numpy):
+    """Return values[lo:hi] as raw float64 bytes."""
+    if numpy:
+        import numpy as np
+        return np.ascontiguousarray(values[lo:hi], dtype=float).tobytes()
+    if not subgroups:
+        return array('d', values[lo:hi]).tobytes()
+    flat = array('d')
+    for xset in values[lo:hi]:
+        flat.extend(xset)
+    return flat.tobytes()
+
+
+def _register_rules(rules):
+    """
+    Register custom rules in a worker process, which does not share the
+    registry with the parent when it is spawned; `rules` only holds rules
+    the parent checks.
+    """
+    for r in rules:
+        spc.register_rule(r)
+
+
+def _evaluate_shard(payload):
+    """Evaluate one shard in a worker process, see `evaluate_many`."""
+    raw, offsets, chart_type, rules, sizes, numpy = payload
+    _register_rules(rules)
+    subgroups = chart_type in SUBGROUP_CHARTS
+    if numpy:
+        import numpy as np
+        values = np.frombuffer(raw, dtype=float)
+        if subgroups:
+            values = values.reshape(-1, sizes)
+        return evaluate_batch(values, offsets, chart_type, rules, sizes, backend=spc.BACKEND_NUMPY)
+    values = array('d')
+    values.frombytes(raw)
+    if subgroups:
+        values = [values[i:i+sizes] for i in range(0, len(values), sizes)]
+    return evaluate_batch(values, offsets, chart_type, rules, sizes, backend=spc.BACKEND_PYTHON)
+
+
+def _merge(results, firsts):
+    """Join `BatchResult` of consecutive shards, series of shard i start at firsts[i]."""
+    first = results[0]
+    if not isinstance(first.center, array):
+        import numpy as np
+        join = np.concatenate
+        series = [r.series + f for r, f in zip(results, firsts)]
+    else:
+        def join(parts):
+            out = array(parts[0].typecode)
+            for p in parts:
+                out.extend(p)
+            return out
+        series = [array('q', [s + f for s in r.series]) for r, f in zip(results, firsts)]
+    return BatchResult(first.rules,
+                       join([r.center for r in results]),
+                       join([r.lcl for r in results]),
+                       join([r.ucl for r in results]),
+                       join(series),
+                       join([r.rule for r in results]),
+                       join([r.point for r in results]))
+
+
+def evaluate_many(values, offsets=None, chart_type=spc.CHART_X_MR_X,
+                  rules=spc.RULES_BASIC, sizes=None, workers=None, backend=None):
+    """
+    `evaluate_batch` run on a pool of `workers` processes.
+
+    Series are split into contiguous shards of about the same number of
+    points. Each shard is sent to a worker as raw float64 bytes with its
+    offsets, and the results are joined in shard order, so the output is
+    the same as from `evaluate_batch` whatever the number of workers.
+    `workers` defaults to the number of CPUs.
+    """
+    _check_chart(chart_type)
+    values, offsets = _columnar(values, offsets, chart_type)
+    if sizes is None:
+        sizes = len(values[0]) if chart_type in SUBGROUP_CHARTS else 1
+    if workers is None:
+        workers = os.cpu_count() or 1
+    nseries = len(offsets) - 1
+    if workers <= 1 or nseries < 2:
+        return evaluate_batch(values, offsets, chart_type, rules, sizes, backend=backend)
+
+    numpy = spc.get_backend(values, backend) is not None
+    subgroups = chart_type in SUBGROUP_CHARTS
+    offsets = [int(o) for o in offsets]
+    nshards = min(nseries, workers * 4)
+    total = offsets[-1]
+    bounds = [0]
+    for k in range(1, nshards):
+        b = bisect.bisect_left(offsets, total * k // nshards, bounds[-1] + 1, nseries)
+        if b > bounds[-1]:
+            bounds.append(b)
+    bounds.append(nseries)
+
+    payloads = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        lo, hi = offsets[a], offsets[b]
+        shard_offsets = [o - lo for o in offsets[a:b+1]]
+        payloads.append((_pack(values, lo, hi, subgroups, numpy), shard_offsets,
+                         chart_type, spc._unique_rules(rules), sizes, numpy))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_evaluate_shard, payloads))
+    return _merge(results, bounds[:-1])
+
+
+def rules_halo(rules):
+    """Number of points before a chunk needed to check `rules` exactly."""
+    return max([spc.RULES_FUNCS[r][1] for r in rules if r in spc.RULES_FUNCS] or [1]) - 1
+
+
+def _check_chunk_numpy(data, start, end, halo_start, limits, rules):
+    from . import numpy_backend
+    import numpy as np
+    x = np.frombuffer(data, dtype=float, count=end - halo_start, offset=halo_start * 8)
+    points = {}
+    for r, mask in numpy_backend.rule_masks(x, *limits, rules=rules):
+        idx = np.flatnonzero(mask[start - halo_start:])
+        if len(idx):
+            points[r] = (idx + start).tolist()
+    order = sorted(points, key=lambda r: (points[r][0], rules.index(r)))
+    return dict((r, points[r]) for r in order)
+
+
+def _check_chunk(payload):
+    """Check rules on one chunk of the shared series, see `find_violating_points_parallel`."""
+    name, length, start, end, halo_start, limits, rules, numpy = payload
+    _register_rules(rules)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        data = shm.buf.cast('d')[:length]
+        try:
+            if numpy:
+                return _check_chunk_numpy(data, start, end, halo_start, limits, rules)
+            engine = spc.RuleEngine(*limits, rules=rules)
+            engine.index = halo_start
+            engine.feed(data[halo_start:start])
+            return engine.feed(data[start:end])
+        finally:
+            data.release()
+    finally:
+        shm.close()
+
+
+def find_violating_points_parallel(data, center, lcl, ucl, rules, warmup=0,
+                                   workers=None, backend=None):
+    """
+    Check rules on one long series split in chunks over `workers` processes.
+
+    The series is copied once into shared memory as float64, workers read
+    their chunk from there. Each chunk is preceded by a halo of the
+    `rules_halo` points before it, which only prime the detectors, so runs
+    crossing chunk borders are found exactly once. Returns the same dict
+    as `spc.RuleEngine` (with the same `warmup`) would.
+    """
+    rs = spc._unique_rules(rules)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    halo = rules_halo(rs)
+    n = len(data)
+    if workers <= 1 or n - warmup < workers * (halo + 1) * 2:
+        engine = spc.RuleEngine(center, lcl, ucl, rs, warmup=warmup)
+        return engine.feed(data)
+
+    numpy = spc.get_backend(data, backend) is not None
+    shm = shared_memory.SharedMemory(create=True, size=n * 8)
+    try:
+        buf = shm.buf.cast('d')
+        try:
+            if numpy:
+                import numpy as np
+                np.frombuffer(buf, dtype=float)[:n] = data
+            else:
+                buf[:n] = array('d', data)
+        finally:
+            buf.release()
+        step = -(-(n - warmup) // workers)
+        payloads = []
+        for start in range(warmup, n, step):
+            end = min(start + step, n)
+            halo_start = max(warmup, start - halo)
+            payloads.append((shm.name, n, start, end, halo_start,
+                             (center, lcl, ucl), rs, numpy))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_check_chunk, payloads))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    points = {}
+    for found in chunks:
+        for r, idx in found.items():
+            points.setdefault(r, []).extend(idx)
+    return points
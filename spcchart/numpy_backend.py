@@ -0,0 +1,786 @@
+"""
+NumPy implementation of the SPC statistics and rules.
+
+Every function mirrors the pure Python one in `spc` with the same name but
+works on whole arrays at once. `Spc` picks this backend automatically for
+array input when NumPy is installed, the pure Python code stays the
+reference and the default for lists.
+"""
+
+import sys
+
+import numpy as np
+
+from . import spc
+
+
+def is_array(data):
+    """
+    Return True if data should be handled by this backend.
+
+    That is NumPy arrays, objects convertible with `__array__` (e.g. Arrow
+    arrays) and anything supporting the buffer protocol (`array.array`,
+    `memoryview`, ...). Float64 input is used without copying, the
+    functions below only wrap it with `np.asarray`.
+    """
+    if isinstance(data, np.ndarray) or hasattr(data, '__array__'):
+        return True
+    try:
+        memoryview(data)
+    except TypeError:
+        return False
+    return True
+
+
+def _mr_bar(data):
+    # correctly rounded like the pure Python backend, see spc._mean
+    return spc._mean(np.abs(np.diff(data)))
+
+
+def get_stats_x_mr_x(data, size):
+    assert size == 1
+    data = np.asarray(data, dtype=float)
+    center = spc._mean(data)
+    sd = _mr_bar(data)
+    d2 = 1.128
+    return center, center - 3*sd/d2, center + 3*sd/d2
+
+def get_stats_x_mr_mr(data, size):
+    assert size == 1
+    sd = _mr_bar(np.asarray(data, dtype=float))
+    d2 = 1.128
+    return sd, 0, sd + 3*sd/d2
+
+def _subgroups(data, size):
+    data = np.asarray(data, dtype=float)
+    n = size
+    assert n >= 2
+    assert n <= 10
+    assert data.ndim == 2 and data.shape[1] == n
+    return data
+
+def get_stats_x_bar_r_x(data, size):
+    data = _subgroups(data, size)
+    Rbar = float(np.ptp(data, axis=1).mean())
+    center = float(data.mean())
+    return center, center - spc.A2[size]*Rbar, center + spc.A2[size]*Rbar
+
+def get_stats_x_bar_r_r(data, size):
+    data = _subgroups(data, size)
+    Rbar = float(np.ptp(data, axis=1).mean())
+    return Rbar, spc.D3[size]*Rbar, spc.D4[size]*Rbar
+
+def get_stats_x_bar_s_x(data, size):
+    data = _subgroups(data, size)
+    Sbar = float(data.std(axis=1, ddof=1).mean())
+    center = float(data.mean())
+    return center, center - spc.A3[size]*Sbar, center + spc.A3[size]*Sbar
+
+def get_stats_x_bar_s_s(data, size):
+    data = _subgroups(data, size)
+    Sbar = float(data.std(axis=1, ddof=1).mean())
+    return Sbar, spc.B3[size]*Sbar, spc.B4[size]*Sbar
+
+def _lot_sizes(data, size):
+    n = np.asarray(size, dtype=float)
+    assert n.shape == (len(data),) and n.min() > 1
+    return n
+
+def _placeholder(a):
+    """Repeat the first limit for the placeholder point of p and u charts."""
+    return np.concatenate((a[:1], a))
+
+def get_stats_p(data, size):
+    if spc.lot_sizes(size):
+        n = _lot_sizes(data, size)
+        pbar = float(np.sum(data)) / n.sum()
+        sd = np.sqrt(pbar*(1-pbar)/n)
+        return pbar, _placeholder(np.maximum(pbar - 3*sd, 0)), _placeholder(np.minimum(pbar + 3*sd, 1))
+    assert size > 1
+    return spc._limits_p(float(np.sum(data)) / (size * len(data)), size)
+
+def get_stats_np(data, size):
+    if spc.lot_sizes(size):
+        n = _lot_sizes(data, size)
+        pbar = float(np.sum(data)) / n.sum()
+        sd = np.sqrt(n*pbar*(1-pbar))
+        center = n*pbar
+        return center, np.maximum(center - 3*sd, 0), np.minimum(center + 3*sd, n)
+    assert size > 1
+    return spc._limits_np(float(np.sum(data)) / (size * len(data)), size)
+
+def get_stats_c(data, size):
+    return spc._limits_c(float(np.mean(data)))
+
+def get_stats_u(data, size):
+    if spc.lot_sizes(size):
+        n = _lot_sizes(data, size)
+        cbar = float(np.sum(data)) / n.sum()
+        sd = np.sqrt(cbar/n)
+        return cbar, _placeholder(np.maximum(cbar - 3*sd, 0)), _placeholder(cbar + 3*sd)
+    assert size > 1
+    return spc._limits_u(float(np.sum(data)) / (len(data) * size), size)
+
+def get_stats_tabular_cusum(data, size, k=spc.CUSUM_K, h=spc.CUSUM_H):
+    data = np.asarray(data, dtype=float)
+    sigma = _mr_bar(data) / 1.128
+    return 0, -h*sigma, h*sigma
+
+def prepare_data_none(data, size):
+    return np.asarray(data)
+
+def prepare_data_x_bar_rs_x(data, size):
+    return np.asarray(data, dtype=float).mean(axis=1)
+
+def prepare_data_x_bar_r_r(data, size):
+    return np.ptp(np.asarray(data, dtype=float), axis=1)
+
+def prepare_data_x_bar_s_s(data, size):
+    data = np.asarray(data, dtype=float)
+    if data.shape[1] < 2:
+        return np.zeros(len(data))
+    return data.std(axis=1, ddof=1)
+
+def prepare_data_x_mr(data, size):
+    return np.concatenate(([0.0], np.abs(np.diff(np.asarray(data, dtype=float)))))
+
+def prepare_data_p(data, size):
+    if spc.lot_sizes(size):
+        size = np.asarray(size, dtype=float)
+    return np.concatenate(([0.0], np.asarray(data, dtype=float) / size))
+
+def prepare_data_u(data, size):
+    return prepare_data_p(data, size)
+
+def prepare_data_cusum(data, size, target=None):
+    data = np.asarray(data, dtype=float)
+    if target is None:
+        target = spc._mean(data)
+    return np.concatenate(([0.0], np.cumsum(data - target)))
+
+def tabular_cusum(data, target, sigma, k=spc.CUSUM_K, h=spc.CUSUM_H):
+    """
+    Vectorized `spc.TabularCusum` starting from zero sums.
+
+    max(0, s + y) recursions are a running sum minus its running minimum,
+    so both one-sided sums are computed without a Python loop.
+    """
+    data = np.asarray(data, dtype=float)
+    K = k * sigma
+    up = np.concatenate(([0.0], np.cumsum(data - (target + K))))
+    down = np.concatenate(([0.0], np.cumsum((target - K) - data)))
+    sh = (up - np.minimum.accumulate(up))[1:]
+    sl = (down - np.minimum.accumulate(down))[1:]
+    return np.where(sh >= sl, sh, -sl)
+
+def prepare_data_tabular_cusum(data, size, k=spc.CUSUM_K, h=spc.CUSUM_H):
+    data = np.asarray(data, dtype=float)
+    sigma = _mr_bar(data) / 1.128
+    return np.concatenate(([0.0], tabular_cusum(data, spc._mean(data), sigma, k, h)))
+
+def linear_recurrence(g, a, block=64):
+    """
+    Return y with y_i = g_i + a*y_{i-1} and y_{-1} = 0, e.g. an EWMA.
+
+    Inside blocks of `block` values y is a matrix product with the powers
+    of a, the values carried over from the previous block follow the same
+    recurrence over the block ends (with a**block), solved recursively.
+    """
+    g = np.asarray(g, dtype=float)
+    n = len(g)
+    k = np.arange(block)
+    # powers[j, i] = a**(i - j) for j <= i
+    powers = np.triu(float(a) ** np.maximum(k[None, :] - k[:, None], 0))
+    m = -(-n // block)
+    y = np.zeros(m * block)
+    y[:n] = g
+    y = y.reshape(m, block) @ powers
+    if m > 1:
+        ends = linear_recurrence(y[:, -1], float(a) ** block, block)
+        y[1:] += np.outer(ends[:-1], float(a) ** (k + 1))
+    return y.ravel()[:n]
+
+def get_stats_ewma(data, size, lam=spc.EWMA_LAMBDA, L=spc.EWMA_L):
+    assert size == 1
+    data = np.asarray(data, dtype=float)
+    target = spc._mean(data)
+    sigma = _mr_bar(data) / 1.128
+    # closed form of the variance recurrence of spc.Ewma
+    i = np.arange(len(data) + 1)
+    w = L * sigma * np.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * i)))
+    return target, target - w, target + w
+
+def prepare_data_ewma(data, size, lam=spc.EWMA_LAMBDA, L=spc.EWMA_L):
+    data = np.asarray(data, dtype=float)
+    target = spc._mean(data)
+    return target + np.concatenate(([0.0], linear_recurrence(lam * (data - target), 1 - lam)))
+
+
+STATS_FUNCS = {
+    spc.CHART_X_BAR_R_X: (get_stats_x_bar_r_x, prepare_data_x_bar_rs_x),
+    spc.CHART_X_BAR_R_R: (get_stats_x_bar_r_r, prepare_data_x_bar_r_r),
+    spc.CHART_X_BAR_S_X: (get_stats_x_bar_s_x, prepare_data_x_bar_rs_x),
+    spc.CHART_X_BAR_S_S: (get_stats_x_bar_s_s, prepare_data_x_bar_s_s),
+    spc.CHART_X_MR_X: (get_stats_x_mr_x, prepare_data_none),
+    spc.CHART_X_MR_MR: (get_stats_x_mr_mr, prepare_data_x_mr),
+    spc.CHART_P: (get_stats_p, prepare_data_p),
+    spc.CHART_NP: (get_stats_np, prepare_data_none),
+    spc.CHART_C: (get_stats_c, prepare_data_none),
+    spc.CHART_U: (get_stats_u, prepare_data_u),
+    spc.CHART_EWMA: (get_stats_ewma, prepare_data_ewma),
+    spc.CHART_CUSUM: (spc.get_stats_cusum, prepare_data_cusum),
+    spc.CHART_TABULAR_CUSUM: (get_stats_tabular_cusum, prepare_data_tabular_cusum),
+    spc.CHART_THREE_WAY: (None, prepare_data_none),
+    spc.CHART_TIME_SERIES: (None, prepare_data_none)}
+
+
+def get_profile_subgroups(data, size):
+    data = _subgroups(data, size)
+    means = data.mean(axis=1)
+    ranges = np.ptp(data, axis=1)
+    stds = data.std(axis=1, ddof=1)
+    Xbar = float(means.mean())
+    Rbar = float(ranges.mean())
+    Sbar = float(stds.mean())
+    return {
+        spc.CHART_X_BAR_R_X: ((Xbar, Xbar - spc.A2[size]*Rbar, Xbar + spc.A2[size]*Rbar), means),
+        spc.CHART_X_BAR_R_R: ((Rbar, spc.D3[size]*Rbar, spc.D4[size]*Rbar), ranges),
+        spc.CHART_X_BAR_S_X: ((Xbar, Xbar - spc.A3[size]*Sbar, Xbar + spc.A3[size]*Sbar), means),
+        spc.CHART_X_BAR_S_S: ((Sbar, spc.B3[size]*Sbar, spc.B4[size]*Sbar), stds)}
+
+def get_pair_x_bar_r(data, size):
+    charts = get_profile_subgroups(data, size)
+    return charts[spc.CHART_X_BAR_R_X], charts[spc.CHART_X_BAR_R_R]
+
+def get_pair_x_bar_s(data, size):
+    charts = get_profile_subgroups(data, size)
+    return charts[spc.CHART_X_BAR_S_X], charts[spc.CHART_X_BAR_S_S]
+
+def get_pair_x_mr(data, size):
+    assert size == 1
+    data = np.asarray(data, dtype=float)
+    mr = np.abs(np.diff(data))
+    center = spc._mean(data)
+    sd = spc._mean(mr)
+    d2 = 1.128
+    return ((center, center - 3*sd/d2, center + 3*sd/d2), data), \
+           ((sd, 0, sd + 3*sd/d2), np.concatenate(([0.0], mr)))
+
+PAIR_FUNCS = {
+    spc.PAIR_X_BAR_R: get_pair_x_bar_r,
+    spc.PAIR_X_BAR_S: get_pair_x_bar_s,
+    spc.PAIR_X_MR: get_pair_x_mr}
+
+def get_profile_individuals(data, size):
+    (x_stats, x), (mr_stats, mr) = get_pair_x_mr(data, size)
+    target = spc._mean(x)
+    sigma = mr_stats[0] / 1.128
+    return {
+        spc.CHART_X_MR_X: (x_stats, x),
+        spc.CHART_X_MR_MR: (mr_stats, mr),
+        spc.CHART_CUSUM: (spc.get_stats_cusum(x, size), prepare_data_cusum(x, size, target=target)),
+        spc.CHART_TABULAR_CUSUM: ((0, -spc.CUSUM_H*sigma, spc.CUSUM_H*sigma),
+                                  np.concatenate(([0.0], tabular_cusum(x, target, sigma))))}
+
+PROFILE_FUNCS = {
+    False: get_profile_individuals,
+    True: get_profile_subgroups}
+
+
+def zones(data, center, lcl, ucl):
+    """
+    Return signed sigma zones of all points, see `spc.RuleEngine`.
+
+    Limits may be scalars or arrays with a value per point.
+    """
+    center, lcl, ucl = (np.asarray(v, dtype=float) if np.ndim(v) else v for v in (center, lcl, ucl))
+    inf = float('inf')
+    if ucl is None:
+        u1 = u2 = u3 = inf
+    else:
+        u1, u2, u3 = center + (ucl - center) / 3, center + 2 * (ucl - center) / 3, ucl
+    if lcl is None:
+        l1 = l2 = l3 = -inf
+    else:
+        l1, l2, l3 = center - (center - lcl) / 3, center - 2 * (center - lcl) / 3, lcl
+    data = np.asarray(data, dtype=float)
+    up = (data > center).astype(np.int8) + (data > u1) + (data > u2) + (data > u3)
+    down = (data < center).astype(np.int8) + (data < l1) + (data < l2) + (data < l3)
+    return up - down
+
+# Rules work on x (values), z (zones), d (deviations from center) and
+# starts, a mask of points where a new series starts. Nothing is carried
+# over a start, so many series can be checked in one call.
+
+def _run_lengths(mask, starts):
+    """Number of consecutive True values ending at each position."""
+    idx = np.arange(len(mask))
+    last_false = np.where(mask, -1, idx)
+    np.maximum(last_false, np.where(starts, idx - 1, -1), out=last_false)
+    return idx - np.maximum.accumulate(last_false)
+
+def _window_sums(mask, n, starts):
+    """Sum of mask over the last n positions, 0 where fewer are available."""
+    idx = np.arange(len(mask))
+    first = np.maximum.accumulate(np.where(starts, idx, 0))
+    c = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    sums = np.zeros(len(mask), dtype=np.int64)
+    if len(mask) >= n:
+        sums[n-1:] = c[n:] - c[:len(c)-n]
+    sums[idx - n + 1 < first] = 0
+    return sums
+
+def _previous(a, starts, fill):
+    """Value of the previous point, `fill` at series starts."""
+    prev = np.empty_like(a)
+    prev[1:] = a[:-1]
+    prev[starts] = fill
+    return prev
+
+def _beyond_limits(x, z, d, starts):
+    return np.abs(z) > 3
+
+def _side_run(n):
+    def rule(x, z, d, starts):
+        brk = starts | (d * _previous(d, starts, 0) < 0)
+        return _run_lengths(~brk, starts) + 1 >= n
+    return rule
+
+def _k_of_n(k, n, level):
+    def rule(x, z, d, starts):
+        return ((_window_sums(z > level, n, starts) >= k) |
+                (_window_sums(z < -level, n, starts) >= k))
+    return rule
+
+def _trend(n):
+    def rule(x, z, d, starts):
+        prev = _previous(x, starts, np.nan)
+        return ((_run_lengths(x > prev, starts) >= n - 1) |
+                (_run_lengths(x < prev, starts) >= n - 1))
+    return rule
+
+def _alternating(n):
+    def rule(x, z, d, starts):
+        step = np.sign(x - _previous(x, starts, np.nan))
+        step[np.isnan(step)] = 0
+        flip = (step != 0) & (step == -_previous(step, starts, 0))
+        alt = np.where(step != 0, _run_lengths(flip, starts) + 1, 0)
+        return alt >= n - 1
+    return rule
+
+def _inside_run(n, level=1):
+    def rule(x, z, d, starts):
+        return _run_lengths(np.abs(z) <= level, starts) >= n
+    return rule
+
+def _outside_run(n, level=1):
+    def rule(x, z, d, starts):
+        return ((_window_sums(np.abs(z) > level, n, starts) == n) &
+                (_window_sums(z > level, n, starts) > 0) &
+                (_window_sums(z < -level, n, starts) > 0))
+    return rule
+
+RULES_MASKS = {
+    spc.RULES_1_BEYOND_3SIGMA: _beyond_limits,
+    spc.RULES_2_OF_3_BEYOND_2SIGMA: _k_of_n(2, 3, 2),
+    spc.RULES_4_OF_5_BEYOND_1SIGMA: _k_of_n(4, 5, 1),
+    spc.RULES_7_ON_ONE_SIDE: _side_run(7),
+    spc.RULES_8_ON_ONE_SIDE: _side_run(8),
+    spc.RULES_9_ON_ONE_SIDE: _side_run(9),
+    spc.RULES_6_TRENDING: _trend(6),
+    spc.RULES_14_UP_DOWN: _alternating(14),
+    spc.RULES_15_BELOW_1SIGMA: _inside_run(15),
+    spc.RULES_8_BEYOND_1SIGMA_BOTH_SIDES: _outside_run(8)}
+
+
+# custom rules with levels between the sigma zones, {rule: level}
+RULES_LEVELS = {}
+
+def scaled_zones(data, center, lcl, ucl, level):
+    """
+    Return zones of all points against lines `level` sigma from the
+    center: 2 (-2) beyond them, 1 (-1) between them and the center, see
+    `spc._Scaled`.
+    """
+    center, lcl, ucl = (np.asarray(v, dtype=float) if np.ndim(v) else v for v in (center, lcl, ucl))
+    inf = float('inf')
+    upper = inf if ucl is None else center + level * (ucl - center) / 3
+    lower = -inf if lcl is None else center - level * (center - lcl) / 3
+    data = np.asarray(data, dtype=float)
+    up = (data > center).astype(np.int8) + (data > upper)
+    down = (data < center).astype(np.int8) + (data < lower)
+    return up - down
+
+def _rule_mask(spec):
+    """Return mask function of a rule parsed by `spc.parse_rule`."""
+    kind, k, n, level = spec
+    if level not in (0, 1, 2, 3):
+        level = 1
+    if kind == spc.RULE_BEYOND:
+        return _k_of_n(k, n, level)
+    if kind == spc.RULE_BELOW:
+        return _inside_run(n, level)
+    if kind == spc.RULE_BOTH_SIDES:
+        return _outside_run(n, level)
+    if kind == spc.RULE_ON_ONE_SIDE:
+        return _side_run(n)
+    if kind == spc.RULE_TRENDING:
+        return _trend(n)
+    return _alternating(n)
+
+def _unique_rules(rules):
+    """Return rules which have a mask, without repeats, see `spc._unique_rules`."""
+    rs = []
+    for r in rules:
+        if r not in spc.RULES_FUNCS:
+            raise KeyError("Unknown rule %r" % (r,))
+        if r not in RULES_MASKS and r in spc.RULES_SPECS:
+            # custom rule registered after this module was imported
+            spec = spc.RULES_SPECS[r]
+            RULES_MASKS[r] = _rule_mask(spec)
+            if spec[3] not in (0, 1, 2, 3):
+                RULES_LEVELS[r] = spec[3]
+        if r in RULES_MASKS and r not in rs:
+            rs.append(r)
+    return rs
+
+def rule_masks(data, center, lcl, ucl, rules, starts=None, z=None):
+    """
+    Return list of (rule, mask of violating points) for data.
+
+    `center`, `lcl` and `ucl` are scalars or arrays with a value per point,
+    `starts` marks the first point of each series (only the first point
+    when not given). Zones already computed with `zones` can be passed as
+    `z`.
+    """
+    x = np.asarray(data, dtype=float)
+    if starts is None:
+        starts = np.zeros(len(x), dtype=bool)
+        starts[:1] = True
+    if z is None:
+        z = zones(x, center, lcl, ucl)
+    d = x - center
+    masks = []
+    for r in _unique_rules(rules):
+        if r in RULES_LEVELS:
+            masks.append((r, RULES_MASKS[r](x, scaled_zones(x, center, lcl, ucl, RULES_LEVELS[r]), d, starts)))
+        else:
+            masks.append((r, RULES_MASKS[r](x, z, d, starts)))
+    return masks
+
+
+def index_runs(indexes):
+    """Vectorized `spc.index_runs`."""
+    idx = np.asarray(indexes, dtype=np.int64)
+    if len(idx) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) != 1)
+    starts = idx[np.concatenate(([0], breaks + 1))]
+    ends = idx[np.concatenate((breaks, [len(idx) - 1]))]
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def find_violating_points(data, center, lcl, ucl, rules, warmup=0, z=None, runs=False):
+    """
+    Vectorized `spc.RuleEngine` over the whole data.
+
+    Returns the same {rule: [index]} dict, including the key order, or
+    {rule: [(start, end)]} runs with `runs`.
+    """
+    x = np.asarray(data, dtype=float)[warmup:]
+    if len(x) == 0:
+        return {}
+    if z is not None:
+        z = z[warmup:]
+    # limits with a value per point
+    center, lcl, ucl = (v[warmup:] if np.ndim(v) else v for v in (center, lcl, ucl))
+    found = []
+    for pos, (r, mask) in enumerate(rule_masks(x, center, lcl, ucl, rules, z=z)):
+        idx = np.flatnonzero(mask)
+        if len(idx):
+            idx += warmup
+            found.append((int(idx[0]), pos, r, index_runs(idx) if runs else idx.tolist()))
+    found.sort()
+    return dict((r, points) for first, pos, r, points in found)
+
+
+def first_violations(data, center, lcl, ucl, rules, warmup=0, stop_any=False, chunk=1024):
+    """
+    `spc.RuleEngine.first` over the data in chunks of doubling size.
+
+    Each chunk is checked with the `batch.rules_halo` points before it, so
+    the masks are exact, and the search stops at the chunk with the
+    violations looked for: a violating series returns after the first
+    chunk, a healthy one costs one vectorized pass.
+    """
+    from . import batch
+    x = np.asarray(data, dtype=float)
+    rs = _unique_rules(rules)
+    halo = batch.rules_halo(rs)
+    found = []
+    start = warmup
+    while start < len(x) and rs:
+        end = min(len(x), start + chunk)
+        lo = max(warmup, start - halo)
+        limits = (v[lo:end] if np.ndim(v) else v for v in (center, lcl, ucl))
+        hits = []
+        for r, mask in rule_masks(x[lo:end], *limits, rules=rs):
+            idx = np.flatnonzero(mask[start - lo:])
+            if len(idx):
+                hits.append((int(idx[0]) + start, r))
+        if stop_any and hits:
+            first = min(i for i, r in hits)
+            hits = [(i, r) for i, r in hits if i == first]
+            found.extend(hits)
+            break
+        found.extend(hits)
+        fired = set(r for i, r in hits)
+        rs = [r for r in rs if r not in fired]
+        start = end
+        chunk *= 2
+    order = _unique_rules(rules)
+    found.sort(key=lambda hit: (hit[0], order.index(hit[1])))
+    return dict((r, i) for i, r in found)
+
+def _moving_sums(a, window):
+    """
+    Sums of a over the last `window` positions, all up to each one when None.
+
+    Values are shifted by the first one, so the running sums stay of the
+    size of the spread of the data rather than of its offset. Rolling
+    windows are summed blockwise, without differences of cumulative sums:
+    a window is the suffix of the block before it plus the prefix of its
+    own block, both cumulative sums inside one block.
+    """
+    a = np.asarray(a, dtype=float)
+    n = len(a)
+    if n == 0:
+        return np.zeros(0)
+    ref = a[0]
+    d = a - ref
+    i = np.arange(n)
+    if window is None or window >= n:
+        return np.cumsum(d) + (i + 1) * ref
+    m = -(-n // window)
+    blocks = np.zeros(m * window)
+    blocks[:n] = d
+    blocks = blocks.reshape(m, window)
+    sums = np.cumsum(blocks, axis=1).ravel()[:n]
+    suffix = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    start = i - window + 1
+    # windows not aligned with a block reach back into the previous one
+    back = (start > 0) & ((i + 1) % window != 0)
+    sums[back] += suffix[start[back]]
+    return sums + np.minimum(i + 1, window) * ref
+
+def window_limits(data, chart_type, window=None, sizes=None):
+    """
+    Vectorized `spc.window_limits`, the running sums are blockwise
+    cumulative sums, see `_moving_sums`. The pure Python limits are exact
+    (correctly rounded sums); these agree with them to a relative 1e-12 of
+    the spread of the data, whatever its offset. Returns four float arrays.
+    """
+    if chart_type in (spc.CHART_CUSUM, spc.CHART_TABULAR_CUSUM, spc.CHART_EWMA) or chart_type not in spc.RUNNING_STATS:
+        raise NotImplementedError("Chart %s does not support window limits" % chart_type)
+    assert window is None or window >= 2
+    data = np.asarray(data, dtype=float)
+    size = spc.subgroup_size(data) if sizes is None else sizes
+    k = np.arange(1, len(data) + 1, dtype=float)
+    if window is not None:
+        np.minimum(k, window, out=k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if chart_type in (spc.CHART_X_MR_X, spc.CHART_X_MR_MR):
+            assert size == 1
+            mr = prepare_data_x_mr(data, size)
+            # the window of k points has k - 1 moving ranges
+            mr_bar = _moving_sums(mr, None if window is None else window - 1) / (k - 1)
+            sd = mr_bar / 1.128
+            if chart_type == spc.CHART_X_MR_X:
+                points = data
+                center = _moving_sums(data, window) / k
+                lcl, ucl = center - 3*sd, center + 3*sd
+            else:
+                points = mr
+                center, lcl, ucl = mr_bar, np.zeros(len(data)), mr_bar + 3*sd
+            lcl[k < 2] = ucl[k < 2] = center[k < 2] = np.nan
+        elif chart_type in (spc.CHART_X_BAR_R_X, spc.CHART_X_BAR_R_R, spc.CHART_X_BAR_S_X, spc.CHART_X_BAR_S_S):
+            data = _subgroups(data, size)
+            if chart_type in (spc.CHART_X_BAR_R_X, spc.CHART_X_BAR_R_R):
+                spread, a, b3, b4 = np.ptp(data, axis=1), spc.A2[size], spc.D3[size], spc.D4[size]
+            else:
+                spread, a, b3, b4 = data.std(axis=1, ddof=1), spc.A3[size], spc.B3[size], spc.B4[size]
+            bar = _moving_sums(spread, window) / k
+            if chart_type in (spc.CHART_X_BAR_R_X, spc.CHART_X_BAR_S_X):
+                points = data.mean(axis=1)
+                center = _moving_sums(points, window) / k
+                lcl, ucl = center - a*bar, center + a*bar
+            else:
+                points, center, lcl, ucl = spread, bar, b3*bar, b4*bar
+        else:
+            n = 1 if chart_type == spc.CHART_C else size
+            if chart_type != spc.CHART_C:
+                assert n > 1
+            points = data if chart_type in (spc.CHART_C, spc.CHART_NP) else data / n
+            bar = _moving_sums(data, window) / (k * n)
+            if chart_type == spc.CHART_P:
+                sd = np.sqrt(bar*(1 - bar)/n)
+                center, lcl, ucl = bar, np.maximum(bar - 3*sd, 0), np.minimum(bar + 3*sd, 1)
+            elif chart_type == spc.CHART_NP:
+                sd = np.sqrt(n*bar*(1 - bar))
+                center = n*bar
+                lcl, ucl = np.maximum(center - 3*sd, 0), np.minimum(center + 3*sd, n)
+            else:
+                sd = np.sqrt(bar/n)
+                center, lcl, ucl = bar, np.maximum(bar - 3*sd, 0), bar + 3*sd
+    return np.array(points, dtype=float), center, lcl, ucl
+
+
+def _batch_x_mr(values, offsets, lengths, size):
+    assert size == 1
+    values = np.asarray(values, dtype=float)
+    mr = np.abs(values - _previous(values, _starts(offsets, len(values)), np.nan))
+    mr[np.isnan(mr)] = 0
+    mr_bar = np.add.reduceat(mr, offsets[:-1]) / (lengths - 1)
+    return values, mr, np.add.reduceat(values, offsets[:-1]) / lengths, mr_bar
+
+def batch_stats_x_mr_x(values, offsets, lengths, size):
+    values, mr, center, mr_bar = _batch_x_mr(values, offsets, lengths, size)
+    d2 = 1.128
+    return center, center - 3*mr_bar/d2, center + 3*mr_bar/d2, values
+
+def batch_stats_x_mr_mr(values, offsets, lengths, size):
+    values, mr, center, mr_bar = _batch_x_mr(values, offsets, lengths, size)
+    d2 = 1.128
+    return mr_bar, np.zeros(len(mr_bar)), mr_bar + 3*mr_bar/d2, mr
+
+def _batch_subgroups(values, offsets, lengths, size):
+    values = _subgroups(values, size)
+    center = np.add.reduceat(values.sum(axis=1), offsets[:-1]) / (lengths * size)
+    return values, center
+
+def batch_stats_x_bar_r_x(values, offsets, lengths, size):
+    values, center = _batch_subgroups(values, offsets, lengths, size)
+    Rbar = np.add.reduceat(np.ptp(values, axis=1), offsets[:-1]) / lengths
+    return center, center - spc.A2[size]*Rbar, center + spc.A2[size]*Rbar, values.mean(axis=1)
+
+def batch_stats_x_bar_r_r(values, offsets, lengths, size):
+    values = _subgroups(values, size)
+    r = np.ptp(values, axis=1)
+    Rbar = np.add.reduceat(r, offsets[:-1]) / lengths
+    return Rbar, spc.D3[size]*Rbar, spc.D4[size]*Rbar, r
+
+def batch_stats_x_bar_s_x(values, offsets, lengths, size):
+    values, center = _batch_subgroups(values, offsets, lengths, size)
+    Sbar = np.add.reduceat(values.std(axis=1, ddof=1), offsets[:-1]) / lengths
+    return center, center - spc.A3[size]*Sbar, center + spc.A3[size]*Sbar, values.mean(axis=1)
+
+def batch_stats_x_bar_s_s(values, offsets, lengths, size):
+    values = _subgroups(values, size)
+    s = values.std(axis=1, ddof=1)
+    Sbar = np.add.reduceat(s, offsets[:-1]) / lengths
+    return Sbar, spc.B3[size]*Sbar, spc.B4[size]*Sbar, s
+
+def batch_stats_p(values, offsets, lengths, size):
+    assert size > 1
+    values = np.asarray(values, dtype=float)
+    pbar = np.add.reduceat(values, offsets[:-1]) / (size * lengths)
+    sd = np.sqrt(pbar*(1-pbar)/size)
+    return pbar, np.maximum(pbar - 3*sd, 0), np.minimum(pbar + 3*sd, 1.0), values / size
+
+def batch_stats_np(values, offsets, lengths, size):
+    assert size > 1
+    values = np.asarray(values, dtype=float)
+    pbar = np.add.reduceat(values, offsets[:-1]) / (size * lengths)
+    sd = np.sqrt(size*pbar*(1-pbar))
+    center = size*pbar
+    return center, np.maximum(center - 3*sd, 0), np.minimum(center + 3*sd, size), values
+
+def batch_stats_c(values, offsets, lengths, size):
+    values = np.asarray(values, dtype=float)
+    cbar = np.add.reduceat(values, offsets[:-1]) / lengths
+    sd = np.sqrt(cbar)
+    return cbar, np.maximum(cbar - 3*sd, 0), cbar + 3*sd, values
+
+def batch_stats_u(values, offsets, lengths, size):
+    assert size > 1
+    values = np.asarray(values, dtype=float)
+    cbar = np.add.reduceat(values, offsets[:-1]) / (lengths * size)
+    sd = np.sqrt(cbar/size)
+    return cbar, np.maximum(cbar - 3*sd, 0), cbar + 3*sd, values / size
+
+# chart -> function(values, offsets, lengths, size) returning center, lcl
+# and ucl per series and the plotted values (without placeholders)
+BATCH_STATS_FUNCS = {
+    spc.CHART_X_BAR_R_X: batch_stats_x_bar_r_x,
+    spc.CHART_X_BAR_R_R: batch_stats_x_bar_r_r,
+    spc.CHART_X_BAR_S_X: batch_stats_x_bar_s_x,
+    spc.CHART_X_BAR_S_S: batch_stats_x_bar_s_s,
+    spc.CHART_X_MR_X: batch_stats_x_mr_x,
+    spc.CHART_X_MR_MR: batch_stats_x_mr_mr,
+    spc.CHART_P: batch_stats_p,
+    spc.CHART_NP: batch_stats_np,
+    spc.CHART_C: batch_stats_c,
+    spc.CHART_U: batch_stats_u}
+
+
+def _starts(offsets, n):
+    starts = np.zeros(n, dtype=bool)
+    starts[offsets[:-1][offsets[:-1] < n]] = True
+    return starts
+
+
+def first_of_batch(result, stop_any=False):
+    """
+    Return `batch.BatchResult` with only the first violation of each rule
+    of each series of `result`, with `stop_any` only those at the first
+    violating point of each series.
+    """
+    from . import batch
+    series, rule, point = result.series, result.rule, result.point
+    # violations are sorted by series, rule and point
+    keep = np.ones(len(series), dtype=bool)
+    keep[1:] = (series[1:] != series[:-1]) | (rule[1:] != rule[:-1])
+    series, rule, point = series[keep], rule[keep], point[keep]
+    if stop_any and len(series):
+        starts = np.flatnonzero(np.concatenate(([True], series[1:] != series[:-1])))
+        lowest = np.minimum.reduceat(point, starts)
+        keep = point == np.repeat(lowest, np.diff(np.append(starts, len(series))))
+        series, rule, point = series[keep], rule[keep], point[keep]
+    return batch.BatchResult(result.rules, result.center, result.lcl, result.ucl, series, rule, point)
+
+def evaluate_batch(values, offsets, chart_type, rules, sizes):
+    """Vectorized `batch.evaluate_batch` for all series at once."""
+    from . import batch
+    if chart_type not in BATCH_STATS_FUNCS:
+        return batch._evaluate_loop(values, offsets, chart_type, rules, sizes, nb=sys.modules[__name__])
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    assert (lengths > 0).all()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center, lcl, ucl, x = BATCH_STATS_FUNCS[chart_type](values, offsets, lengths, sizes)
+    sid = np.repeat(np.arange(len(lengths)), lengths)
+    if chart_type in spc.PLACEHOLDER_CHARTS:
+        # the placeholder is the point Spc does not check
+        keep = np.ones(len(x), dtype=bool)
+        shift = 1
+    else:
+        keep = ~_starts(offsets, len(x))
+        shift = 0
+    pos = np.flatnonzero(keep)
+    sid = sid[pos]
+    starts = np.ones(len(sid), dtype=bool)
+    starts[1:] = sid[1:] != sid[:-1]
+    rs = _unique_rules(rules)
+    series, rule, point = [], [], []
+    masks = rule_masks(x[pos], center[sid], lcl[sid], ucl[sid], rs, starts)
+    for r, (name, mask) in enumerate(masks):
+        idx = np.flatnonzero(mask)
+        series.append(sid[idx])
+        rule.append(np.full(len(idx), r, dtype=np.int64))
+        point.append(pos[idx] - offsets[sid[idx]] + shift)
+    if rs:
+        series, rule, point = np.concatenate(series), np.concatenate(rule), np.concatenate(point)
+        order = np.lexsort((point, rule, series))
+        series, rule, point = series[order], rule[order], point[order]
+    else:
+        series = rule = point = np.zeros(0, dtype=np.int64)
+    return batch.BatchResult(rs, center, lcl, ucl, series, rule, point)
@@ -7,7 +7,7 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import shortuuid
 
-from .spc import Spc, CHART_X_MR_X
+from .spc import Spc, CHART_X_MR_X, lot_sizes
 
 
 class PlotlySpcChart:
@@ -19,6 +19,7 @@ class PlotlySpcChart:
         title: Chart title
         chart_type: Type of SPC chart (defaults to CHART_X_MR_X)
         sizes: Subgroup size (optional)
+        times: Timestamps of the data points for the x-axis (optional)
 
     Example:
         >>> data = [1,2,3,4,5,6,7,8,9,8,7,6,5,5,5,4,4,3,3,2,2,2,3,4,5,5,5]
@@ -26,14 +27,15 @@ class PlotlySpcChart:
         >>> html = chart.render_to_html()
     """
 
-    def __init__(self, data, title=None, chart_type=CHART_X_MR_X, sizes=None):
+    def __init__(self, data, title=None, chart_type=CHART_X_MR_X, sizes=None, times=None):
         self.data = data
         self.title = title or "SPC Chart"
         self.chart_type = chart_type
         self.sizes = sizes
+        self.times = times
 
         # Calculate SPC statistics
-        self.spc = Spc(data, chart_type, sizes=sizes)
+        self.spc = Spc(data, chart_type, sizes=sizes, times=times)
         self.center, self.lcl, self.ucl = self.spc.get_stats()
         self.violations = self.spc.get_violating_points()
 
@@ -87,18 +89,28 @@ class PlotlySpcChart:
 
         return filename
 
+    def _line(self, value):
+        """Return y values of a limit line, limits may have a value per point."""
+        if lot_sizes(value):
+            # p and u charts have a placeholder before the first point
+            return list(value)[-len(self.data):]
+        return [value] * len(self.data)
+
     def _create_figure(self):
         """Create the Plotly figure with SPC data."""
         fig = go.Figure()
 
-        # X-axis values (index of data points)
-        x_values = list(range(1, len(self.data) + 1))
+        # X-axis values (timestamps or index of data points)
+        if self.times is not None:
+            x_values = list(self.times)
+        else:
+            x_values = list(range(1, len(self.data) + 1))
 
         # Add control limits (only if they exist)
         if self.ucl is not None:
             fig.add_trace(go.Scatter(
                 x=x_values,
-                y=[self.ucl] * len(self.data),
+                y=self._line(self.ucl),
                 mode='lines',
                 name='UCL (Upper Control Limit)',
                 line=dict(color='red', width=2, dash='dash'),
@@ -108,7 +120,7 @@ class PlotlySpcChart:
         if self.lcl is not None:
             fig.add_trace(go.Scatter(
                 x=x_values,
-                y=[self.lcl] * len(self.data),
+                y=self._line(self.lcl),
                 mode='lines',
                 name='LCL (Lower Control Limit)',
                 line=dict(color='red', width=2, dash='dash'),
@@ -118,7 +130,7 @@ class PlotlySpcChart:
         # Add center line
         fig.add_trace(go.Scatter(
             x=x_values,
-            y=[self.center] * len(self.data),
+            y=self._line(self.center),
             mode='lines',
             name='Center Line',
             line=dict(color='green', width=2, dash='dot'),
@@ -138,10 +150,10 @@ class PlotlySpcChart:
 
         for i, value in enumerate(self.data):
             if i in violation_indices:
-                violation_x.append(i + 1)
+                violation_x.append(x_values[i])
                 violation_y.append(value)
             else:
-                normal_x.append(i + 1)
+                normal_x.append(x_values[i])
                 normal_y.append(value)
 
         # Add normal data points
@@ -175,7 +187,7 @@ class PlotlySpcChart:
                 'xanchor': 'center',
                 'font': {'size': 20}
             },
-            xaxis_title='Sample Number',
+            xaxis_title='Sample Number' if self.times is None else 'Time',
             yaxis_title='Value',
             hovermode='closest',
             template='plotly_white',
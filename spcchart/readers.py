@@ -0,0 +1,125 @@
+"""
+Streaming readers of CSV and NDJSON files.
+
+Files are read line by line and the values of one column come out in
+chunks of `CHUNK_SIZE`, so the memory used for parsing does not depend on
+the size of the file. Gzip compressed files are detected by their magic
+bytes and decompressed on the fly. Empty (CSV) or null and missing
+(NDJSON) values are skipped.
+
+`subgroups` forms subgroups from the values as they come and `stream_spc`
+pushes the chunks into an incremental `Spc`, see `Spc.extend`.
+
+>>> import io
+>>> f = io.StringIO("time,value\\n1,1\\n2,2\\n3,3\\n4,3\\n5,2\\n6,1\\n7,3\\n8,8\\n")
+>>> stream_spc(read_csv(f, 'value', chunk_size=3), spc.CHART_X_MR_X).get_violating_points()
+{'1 beyond 3*sigma': [7]}
+"""
+
+import contextlib
+import csv
+import gzip
+import json
+
+from . import spc
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def open_text(path):
+    """Open a text file for reading, gzip compressed or not."""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        # gzip.open owns the raw file and closes it with the text wrapper
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+def _open(source):
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        return open_text(source)
+    # already open file, the caller closes it
+    return contextlib.nullcontext(source)
+
+def _chunks(values, chunk_size):
+    chunk = []
+    append = chunk.append
+    for v in values:
+        append(v)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+            append = chunk.append
+    if chunk:
+        yield chunk
+
+
+def read_csv(source, column=0, chunk_size=CHUNK_SIZE, delimiter=',', header=True):
+    """
+    Yield lists of float values of one column of a CSV file.
+
+    `source` is a path or an open text file, `column` a name from the
+    header row or an index. Names need `header`, ValueError is raised
+    otherwise.
+    """
+    with _open(source) as f:
+        rows = csv.reader(f, delimiter=delimiter)
+        if header:
+            names = next(rows, [])
+            if not isinstance(column, int):
+                column = names.index(column)
+        elif not isinstance(column, int):
+            raise ValueError("Column %r given by name, but the file has no header row" % (column,))
+        values = (float(row[column]) for row in rows if len(row) > column and row[column])
+        for chunk in _chunks(values, chunk_size):
+            yield chunk
+
+def read_ndjson(source, field, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of float values of one field of a newline delimited JSON
+    file, one object per line.
+    """
+    with _open(source) as f:
+        records = (json.loads(line) for line in f if line.strip())
+        values = (float(v) for v in (r.get(field) for r in records) if v is not None)
+        for chunk in _chunks(values, chunk_size):
+            yield chunk
+
+
+def subgroups(chunks, size):
+    """
+    Yield chunks of subgroups of `size` consecutive values.
+
+    An incomplete subgroup at the end of the data is dropped.
+    """
+    rest = []
+    for chunk in chunks:
+        values = rest + chunk if rest else chunk
+        n = len(values) - len(values) % size
+        if n:
+            yield [values[i:i + size] for i in range(0, n, size)]
+        rest = values[n:]
+
+def stream_spc(chunks, chart_type, rules=spc.RULES_BASIC, sizes=None):
+    """
+    Return `Spc` of all values from chunks.
+
+    The chart is created from the first chunk and the following chunks are
+    added with `Spc.extend`, so points of each chunk are checked against
+    the limits of all data up to and including the chunk. ValueError is
+    raised if there are no values.
+    """
+    chunks = iter(chunks)
+    first = []
+    for chunk in chunks:
+        first.extend(chunk)
+        # limits need at least two points (subgroups)
+        if len(first) > 1:
+            break
+    if not first:
+        raise ValueError("no data")
+    chart = spc.Spc(first, chart_type, rules=rules, sizes=sizes)
+    for chunk in chunks:
+        chart.extend(chunk)
+    return chart
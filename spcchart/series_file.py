@@ -0,0 +1,163 @@
+"""
+Series stored on disk, for data larger than memory.
+
+A series file holds float64 values in native byte order, either raw (as
+written by `numpy.ndarray.tofile` or `array.array.tofile`) or after a 16
+byte header written by `write_series`:
+
+    magic b'SPCSERIE', uint32 subgroup size, uint32 reserved
+
+`SeriesFile` maps the file into memory, values are paged in by the OS
+when they are read and nothing is loaded at once. `check_series` computes
+limits and violations of a chart from it in blocks of values, so resident
+memory stays bounded however long the series is.
+
+>>> write_series('/tmp/series.spc', [1, 2, 3, 3, 2, 1, 3, 8])
+>>> with SeriesFile('/tmp/series.spc') as series:
+...     limits, violations = check_series(series, spc.CHART_X_MR_X)
+>>> violations
+{'1 beyond 3*sigma': [7]}
+"""
+
+import itertools
+import mmap
+import os
+import struct
+from array import array
+
+from . import spc
+
+
+MAGIC = b'SPCSERIE'
+HEADER = struct.Struct('<8sII')
+BLOCK_SIZE = 1 << 16
+
+PLACEHOLDER_CHARTS = spc.PLACEHOLDER_CHARTS
+
+
+def write_series(path, data, size=1):
+    """
+    Write values (or subgroups of `size` values) to a series file.
+
+    `data` can be any iterable, it is written in blocks.
+    """
+    it = iter(data)
+    if size > 1:
+        it = itertools.chain.from_iterable(it)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, size, 0))
+        while True:
+            block = array('d', itertools.islice(it, BLOCK_SIZE * size))
+            if not block:
+                break
+            assert len(block) % size == 0
+            block.tofile(f)
+
+
+class SeriesFile(object):
+    """
+    Memory-mapped series file.
+
+    Files with the `write_series` header carry their subgroup size, raw
+    files are single values unless `size` is given. `view` is a read-only
+    memoryview of all values (2D with subgroups) which can be passed
+    directly to `Spc` when NumPy is installed; `blocks` yields parts of it.
+    """
+
+    def __init__(self, path, size=None):
+        self._file = open(path, 'rb')
+        length = os.fstat(self._file.fileno()).st_size
+        self._mmap = None
+        if length:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = 0
+        file_size = 1
+        if length >= HEADER.size and self._mmap[:len(MAGIC)] == MAGIC:
+            magic, file_size, reserved = HEADER.unpack_from(self._mmap)
+            offset = HEADER.size
+        self.size = size or file_size
+        assert (length - offset) % (8 * self.size) == 0, "file is not a series of %d values" % self.size
+        if self._mmap is None:
+            self._flat = memoryview(array('d'))
+        else:
+            self._flat = memoryview(self._mmap)[offset:].cast('d')
+        if self.size > 1:
+            self.view = self._flat.cast('B').cast('d', (len(self), self.size))
+        else:
+            self.view = self._flat
+
+    def __len__(self):
+        return len(self._flat) // self.size
+
+    def blocks(self, block_size=BLOCK_SIZE):
+        """
+        Yield memoryviews of `block_size` points (subgroups) each.
+
+        A block is released when the next one is requested.
+        """
+        step = block_size * self.size
+        for start in range(0, len(self._flat), step):
+            with self._flat[start:start + step] as part:
+                if self.size == 1:
+                    yield part
+                else:
+                    with part.cast('B').cast('d', (len(part) // self.size, self.size)) as rows:
+                        yield rows
+
+    def close(self):
+        self.view.release()
+        self._flat.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_series(series, chart_type, rules=spc.RULES_BASIC, sizes=None, block_size=BLOCK_SIZE):
+    """
+    Return limits and violations of a chart of a series file.
+
+    The series is read twice block by block: first the limits are
+    computed from the running sums of `spc.RUNNING_STATS`, then the points
+    are checked against them with `spc.RuleEngine`. Only the violation
+    indexes are kept, the result is the same as
+    `Spc(data, chart_type, rules, sizes=sizes)`: `FrozenLimits` of the
+    chart and {rule: [index]}. `sizes` is the sample size of p, np and u
+    charts, by default the subgroup size of the file.
+    """
+    if chart_type not in spc.RUNNING_STATS or chart_type == spc.CHART_EWMA:
+        raise NotImplementedError("Chart %s is not supported for series files" % chart_type)
+    size = series.size if sizes is None else sizes
+    cusum = chart_type in (spc.CHART_CUSUM, spc.CHART_TABULAR_CUSUM)
+    # CUSUM charts take their target and sigma from the X mR statistics
+    stats = spc.XmRXStats() if cusum else spc.RUNNING_STATS[chart_type](size)
+    for block in series.blocks(block_size):
+        stats.extend(block.tolist())
+
+    target = sigma = None
+    if chart_type == spc.CHART_CUSUM:
+        target = stats.mean()
+        plot = spc.CusumStats(size, target=target)
+    elif chart_type == spc.CHART_TABULAR_CUSUM:
+        target, sigma = stats.mean(), stats._mr_bar() / 1.128
+        plot = spc.TabularCusum(size, target=target, sigma=sigma)
+    else:
+        plot = spc.RUNNING_STATS[chart_type](size)
+    center, lcl, ucl = (plot if cusum else stats).get_stats()
+
+    engine = spc.RuleEngine(center, lcl, ucl, rules, warmup=1)
+    if chart_type in PLACEHOLDER_CHARTS:
+        engine.index = 1
+    points = {}
+    for block in series.blocks(block_size):
+        for r, idx in engine.feed(plot.extend(block.tolist())).items():
+            points.setdefault(r, array('q')).extend(idx)
+
+    limits = spc.FrozenLimits(chart_type, center, lcl, ucl, size=size,
+                              last=getattr(stats, 'last', None), target=target, sigma=sigma)
+    return limits, dict((r, points[r].tolist()) for r in spc._order_violations(points, rules))
@@ -8,19 +8,119 @@ Author: Michal Nowikowski <godfryd@gmail.com>
 License: MIT
 """
 
+import bisect
+import collections
+import copy
+import itertools
+from array import array
 import math
+import re
 import statistics
 
 
 def _mean_2d(data):
     """Calculate mean of all elements in a 2D array (list of lists)."""
-    all_values = [item for sublist in data for item in sublist]
-    return statistics.mean(all_values)
+    count = 0
+    for row in data:
+        count += len(row)
+    return math.fsum(itertools.chain.from_iterable(data)) / count
+
+
+def _mean(data):
+    """
+    Mean of data from its correctly rounded sum, the target of CUSUM and
+    EWMA charts. The NumPy backend uses the same so points on or near the
+    center line agree between backends.
+    """
+    if not len(data):
+        raise statistics.StatisticsError('mean requires at least one data point')
+    return math.fsum(data) / len(data)
+
+
+class _ExactSum(object):
+    """
+    Sum of numbers without rounding errors, kept as non-overlapping
+    partials (Shewchuk's algorithm, as used by `math.fsum`).
+
+    `float()` of it is the correctly rounded sum, whatever the order the
+    numbers were added in or sums of parts merged in, so statistics of
+    merged shards equal those of one pass over all data bit for bit.
+    """
+    __slots__ = ('partials',)
+
+    def __init__(self):
+        self.partials = []
+
+    def add(self, x):
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def merge(self, other):
+        for y in other.partials:
+            self.add(y)
+
+    def __float__(self):
+        return math.fsum(self.partials)
 
 
 def _std_rows(data, ddof=0):
     """Calculate standard deviation for each row and return list of std values."""
-    return [statistics.stdev(row) if len(row) > 1 else 0 for row in data]
+    return [_row_stats(row)[2] for row in data]
+
+
+def _row_stats(xset):
+    """Return mean, range and sample standard deviation of one subgroup."""
+    it = iter(xset)
+    lo = hi = shift = next(it)
+    # Welford's update of mean and sum of squared deviations, on values
+    # shifted by the first one so values far from 0 lose no precision
+    mean = 0.0
+    m2 = 0.0
+    k = 1
+    for x in it:
+        k += 1
+        d = x - shift
+        delta = d - mean
+        mean += delta / k
+        m2 += delta * (d - mean)
+        if x < lo:
+            lo = x
+        elif x > hi:
+            hi = x
+    return shift + mean, hi - lo, math.sqrt(m2 / (k - 1)) if k > 1 else 0
+
+
+def subgroup_stats(data):
+    """
+    Return lists of means, ranges and sample standard deviations of all
+    subgroups, computed together in one pass over the values.
+
+    This replaces `statistics.mean` and `statistics.stdev` per subgroup,
+    which use exact fractions and are slow; results agree with them up to
+    rounding.
+
+    >>> subgroup_stats([[1, 2, 3], [2, 4, 6]])
+    ([2.0, 4.0], [2, 4], [1.0, 2.0])
+    """
+    means = []
+    ranges = []
+    stds = []
+    for xset in data:
+        mean, r, s = _row_stats(xset)
+        means.append(mean)
+        ranges.append(r)
+        stds.append(s)
+    return means, ranges, stds
 
 
 CHART_X_BAR_R_X = "Xbar R - X"
@@ -35,6 +135,7 @@ CHART_C = "c"
 CHART_U = "u"
 CHART_EWMA = "EWMA"
 CHART_CUSUM = "CUSUM"
+CHART_TABULAR_CUSUM = "tabular CUSUM"
 CHART_THREE_WAY = "three way"
 CHART_TIME_SERIES = "time series"
 
@@ -49,6 +150,9 @@ RULES_14_UP_DOWN = "14 up down"
 RULES_15_BELOW_1SIGMA = "15 below 1*sigma"
 RULES_8_BEYOND_1SIGMA_BOTH_SIDES = "8 beyond 1*sigma on both sides"
 
+BACKEND_PYTHON = "python"
+BACKEND_NUMPY = "numpy"
+
 RULES_BASIC = [RULES_1_BEYOND_3SIGMA,
                RULES_7_ON_ONE_SIDE]
 RULES_WECO = [RULES_1_BEYOND_3SIGMA,
@@ -84,6 +188,39 @@ def test_violating_runs(data, center, lcl, ucl):
             return False
     return True
 
+def _sigma_lines(center, lcl, ucl, k):
+    """Return lines k*sigma below and above the center, sigma taken per side."""
+    return center - k * (center - lcl) / 3, center + k * (ucl - center) / 3
+
+def test_2_of_3_beyond_2sigma(data, center, lcl, ucl):
+    lower, upper = _sigma_lines(center, lcl, ucl, 2)
+    return (sum(1 for d in data if d > upper) >= 2 or
+            sum(1 for d in data if d < lower) >= 2)
+
+def test_4_of_5_beyond_1sigma(data, center, lcl, ucl):
+    lower, upper = _sigma_lines(center, lcl, ucl, 1)
+    return (sum(1 for d in data if d > upper) >= 4 or
+            sum(1 for d in data if d < lower) >= 4)
+
+def test_trending(data, center, lcl, ucl):
+    return (all(data[i-1] < data[i] for i in range(1, len(data))) or
+            all(data[i-1] > data[i] for i in range(1, len(data))))
+
+def test_up_down(data, center, lcl, ucl):
+    for i in range(2, len(data)):
+        if not ((data[i-2] < data[i-1] > data[i]) or (data[i-2] > data[i-1] < data[i])):
+            return False
+    return True
+
+def test_below_1sigma(data, center, lcl, ucl):
+    lower, upper = _sigma_lines(center, lcl, ucl, 1)
+    return all(lower <= d <= upper for d in data)
+
+def test_beyond_1sigma_both_sides(data, center, lcl, ucl):
+    lower, upper = _sigma_lines(center, lcl, ucl, 1)
+    return (all(d > upper or d < lower for d in data) and
+            any(d > upper for d in data) and any(d < lower for d in data))
+
 # n         2      3      4      5      6      7      8      9      10
 A2 = [0,0, 1.880, 1.023, 0.729, 0.577, 0.483, 0.419, 0.373, 0.337, 0.308]
 D3 = [0,0, 0,     0,     0,     0,     0,     0.076, 0.136, 0.184, 0.223]
@@ -96,13 +233,14 @@ B5 = [0,0,     0,     0,     0,     0, 0.029, 0.113, 0.179, 0.232, 0.276, 0.313,
 B6 = [0,0, 2.606, 2.276, 2.088, 1.964, 1.874, 1.806, 1.751, 1.707, 1.669, 1.637, 1.610, 1.585, 1.563, 1.544]#, 1.470, 1.420]
 A3 = [0,0, 2.659, 1.954, 1.628, 1.427, 1.287, 1.182, 1.099, 1.032, 0.975, 0.927, 0.886, 0.850, 0.817, 0.789]#, 0.680, 0.606]
 
+def _mr_sum(data):
+    """Correctly rounded sum of the moving ranges of data."""
+    return math.fsum(abs(data[i] - data[i+1]) for i in range(len(data)-1))
+
 def get_stats_x_mr_x(data, size):
     assert size == 1
-    center = statistics.mean(data)
-    sd = 0
-    for i in range(len(data)-1):
-        sd += abs(data[i] - data[i+1])
-    sd /= len(data) - 1
+    center = _mean(data)
+    sd = _mr_sum(data) / (len(data) - 1)
     d2 = 1.128
     lcl = center - 3*sd/d2
     ucl = center + 3*sd/d2
@@ -110,10 +248,7 @@ def get_stats_x_mr_x(data, size):
 
 def get_stats_x_mr_mr(data, size):
     assert size == 1
-    sd = 0
-    for i in range(len(data)-1):
-        sd += abs(data[i] - data[i+1])
-    sd /= len(data) - 1
+    sd = _mr_sum(data) / (len(data) - 1)
     d2 = 1.128
     center = sd
     lcl = 0
@@ -125,11 +260,11 @@ def get_stats_x_bar_r_x(data, size):
     assert n >= 2
     assert n <= 10
 
-    Rsum = 0
+    ranges = []
     for xset in data:
         assert len(xset) == n
-        Rsum += max(xset) - min(xset)
-    Rbar = Rsum / len(data)
+        ranges.append(max(xset) - min(xset))
+    Rbar = math.fsum(ranges) / len(data)
 
     Xbar = _mean_2d(data)
 
@@ -143,11 +278,11 @@ def get_stats_x_bar_r_r(data, size):
     assert n >= 2
     assert n <= 10
 
-    Rsum = 0
+    ranges = []
     for xset in data:
         assert len(xset) == n
-        Rsum += max(xset) - min(xset)
-    Rbar = Rsum / len(data)
+        ranges.append(max(xset) - min(xset))
+    Rbar = math.fsum(ranges) / len(data)
 
     center = Rbar
     lcl = D3[n]*Rbar
@@ -159,7 +294,8 @@ def get_stats_x_bar_s_x(data, size):
     assert n >= 2
     assert n <= 10
 
-    Sbar = statistics.mean(_std_rows(data, ddof=1))
+    stds = _std_rows(data, ddof=1)
+    Sbar = math.fsum(stds) / len(stds)
     Xbar = _mean_2d(data)
 
     center = Xbar
@@ -172,18 +308,54 @@ def get_stats_x_bar_s_s(data, size):
     assert n >= 2
     assert n <= 10
 
-    Sbar = statistics.mean(_std_rows(data, ddof=1))
+    stds = _std_rows(data, ddof=1)
+    Sbar = math.fsum(stds) / len(stds)
 
     center = Sbar
     lcl = B3[n]*Sbar
     ucl = B4[n]*Sbar
     return center, lcl, ucl
 
+def lot_sizes(size):
+    """
+    Return True if `size` is a sequence with the sample size of each
+    point (lot) of a p, np or u chart rather than one size for all.
+    """
+    return hasattr(size, '__len__')
+
+def _lot_limits(limits, bar, sizes, placeholder):
+    """
+    Return (center, LCLs, UCLs) of lots of different sizes, LCLs and UCLs
+    as array('d') with a value per point, see `lot_sizes`. The center is
+    the same for all points, except for np charts where it is an array too.
+    Limits are computed once per distinct size.
+    """
+    assert min(sizes) > 1
+    cache = {}
+    centers, lcls, ucls = array('d'), array('d'), array('d')
+    for n in sizes:
+        lim = cache.get(n)
+        if lim is None:
+            lim = cache[n] = limits(bar, n)
+        centers.append(lim[0])
+        lcls.append(lim[1])
+        ucls.append(lim[2])
+    if placeholder:
+        # limits of the placeholder point are those of the first lot
+        centers, lcls, ucls = (a[:1] + a for a in (centers, lcls, ucls))
+    return (centers if limits is _limits_np else bar), lcls, ucls
+
 def get_stats_p(data, size):
     n = size
+    if lot_sizes(n):
+        assert len(n) == len(data)
+        return _lot_limits(_limits_p, float(sum(data)) / sum(n), n, True)
     assert n > 1
 
     pbar = float(sum(data)) / (n * len(data))
+    return _limits_p(pbar, n)
+
+def _limits_p(pbar, n):
     sd = math.sqrt(pbar*(1-pbar)/n)
 
     center = pbar
@@ -197,9 +369,15 @@ def get_stats_p(data, size):
 
 def get_stats_np(data, size):
     n = size
+    if lot_sizes(n):
+        assert len(n) == len(data)
+        return _lot_limits(_limits_np, float(sum(data)) / sum(n), n, False)
     assert n > 1
 
     pbar = float(sum(data)) / (n * len(data))
+    return _limits_np(pbar, n)
+
+def _limits_np(pbar, n):
     sd = math.sqrt(n*pbar*(1-pbar))
 
     center = n*pbar
@@ -212,8 +390,10 @@ def get_stats_np(data, size):
     return center, lcl, ucl
 
 def get_stats_c(data, size):
-    cbar = statistics.mean(data)
+    cbar = _mean(data)
+    return _limits_c(cbar)
 
+def _limits_c(cbar):
     center = cbar
     lcl = center - 3*math.sqrt(cbar)
     if lcl < 0:
@@ -223,10 +403,15 @@ def get_stats_c(data, size):
 
 def get_stats_u(data, size):
     n = size
+    if lot_sizes(n):
+        assert len(n) == len(data)
+        return _lot_limits(_limits_u, float(sum(data)) / sum(n), n, True)
     assert n > 1
 
     cbar = float(sum(data))/(len(data)*n)
+    return _limits_u(cbar, n)
 
+def _limits_u(cbar, n):
     center = cbar
     lcl = center - 3*math.sqrt(cbar/n)
     if lcl < 0:
@@ -234,6 +419,12 @@ def get_stats_u(data, size):
     ucl = center + 3*math.sqrt(cbar/n)
     return center, lcl, ucl
 
+# limits of one lot from pbar (ubar) and its size
+LOT_LIMITS = {
+    CHART_P: _limits_p,
+    CHART_NP: _limits_np,
+    CHART_U: _limits_u}
+
 def get_stats_cusum(data, size):
     """
     Find the data for a cusum graph
@@ -243,13 +434,69 @@ def get_stats_cusum(data, size):
     """
     return 0, None, None
 
+# tabular CUSUM reference value k and decision interval h, in sigmas
+CUSUM_K = 0.5
+CUSUM_H = 5
+
+def _smoothing_params(data):
+    """
+    Return target (mean) and sigma (from average moving range) of data, the
+    defaults of tabular CUSUM and EWMA charts.
+    """
+    data = list(data)
+    return _mean(data), get_stats_x_mr_mr(data, 1)[0] / 1.128
+
+def get_stats_tabular_cusum(data, size, k=CUSUM_K, h=CUSUM_H):
+    """
+    Find the limits for a tabular CUSUM graph
+
+    The chart is centered on 0 with the decision interval h*sigma as limits.
+    """
+    target, sigma = _smoothing_params(data)
+    return 0, -h*sigma, h*sigma
+
+# EWMA weight lambda of the newest value and width L of the limits, in sigmas
+EWMA_LAMBDA = 0.2
+EWMA_L = 3
+
+def _ewma_limits(ewma, n):
+    """
+    Return (center, LCLs, UCLs) of `n` more points of an `Ewma`, starting
+    with the limits of its current point. LCLs and UCLs are array('d').
+    """
+    lcls, ucls = array('d'), array('d')
+    a = (1 - ewma.lam) ** 2
+    b = ewma.lam ** 2
+    width = ewma.L * ewma.sigma
+    q = ewma.q
+    for i in range(n + 1):
+        w = width * math.sqrt(q)
+        lcls.append(ewma.target - w)
+        ucls.append(ewma.target + w)
+        q = a*q + b
+    return ewma.target, lcls, ucls
+
+def get_stats_ewma(data, size, lam=EWMA_LAMBDA, L=EWMA_L):
+    """
+    Find the limits for an EWMA graph
+
+    The chart is centered on the mean of the data, the limits of each
+    point come from the variance recurrence of `Ewma` and widen towards
+    target +- L*sigma*sqrt(lambda/(2-lambda)). LCL and UCL are array('d')
+    with a value per point, the first one is for the placeholder point.
+    """
+    assert size == 1
+    data = list(data)
+    target, sigma = _smoothing_params(data)
+    return _ewma_limits(Ewma(target=target, sigma=sigma, lam=lam, L=L), len(data))
+
 def prepare_data_none(data, size):
     return data
 
 def prepare_data_x_bar_rs_x(data, size):
     data2 = []
     for xset in data:
-        data2.append(statistics.mean(xset))
+        data2.append(_row_stats(xset)[0])
     return data2
 
 def prepare_data_x_bar_r_r(data, size):
@@ -259,10 +506,7 @@ def prepare_data_x_bar_r_r(data, size):
     return data2
 
 def prepare_data_x_bar_s_s(data, size):
-    data2 = []
-    for xset in data:
-        data2.append(statistics.stdev(xset) if len(xset) > 1 else 0)
-    return data2
+    return _std_rows(data, ddof=1)
 
 def prepare_data_x_mr(data, size):
     data2 = [0]
@@ -272,18 +516,19 @@ def prepare_data_x_mr(data, size):
 
 def prepare_data_p(data, size):
     data2 = [0]
+    if lot_sizes(size):
+        for d, n in zip(data, size):
+            data2.append(float(d)/n)
+        return data2
     for d in data:
         data2.append(float(d)/size)
     return data2
 
 def prepare_data_u(data, size):
-    data2 = [0]
-    for d in data:
-        data2.append(float(d)/size)
-    return data2
+    return prepare_data_p(data, size)
 
 def prepare_data_cusum(data, size, target = None):
-    """
+    r"""
     Prepares the data for a CUSUM graph
 
     subtracts the mean from each data point
@@ -293,14 +538,53 @@ def prepare_data_cusum(data, size, target = None):
     $\mu$ is the target value
 
     if $\mu is not provided the mean of the sample is used
+
+    The sum is a running one so any iterable (also a generator) can be
+    passed, it is consumed once when the target is given.
     """
-    data2 = []
     if target is None:
-        target = statistics.mean(data)
-    for d in data:
-        data2.append(float(d) - target)
-    data3 = [sum(data2[:i]) for i in range(len(data2)+1)]
-    return data3
+        data = list(data)
+        target = _mean(data)
+    return list(itertools.accumulate((float(d) - target for d in data), initial=0))
+
+def prepare_data_tabular_cusum(data, size, k=CUSUM_K, h=CUSUM_H):
+    """
+    Prepares the data for a tabular CUSUM graph
+
+    See `TabularCusum`, target and sigma are taken from the data.
+    """
+    data = list(data)
+    target, sigma = _smoothing_params(data)
+    cusum = TabularCusum(target=target, sigma=sigma, k=k, h=h)
+    return [0] + cusum.extend(data)
+
+def prepare_data_ewma(data, size, lam=EWMA_LAMBDA, L=EWMA_L):
+    """
+    Prepares the data for an EWMA graph
+
+    See `Ewma`, target and sigma are taken from the data. The first point
+    is the target (z_0).
+    """
+    data = list(data)
+    target, sigma = _smoothing_params(data)
+    return [target] + Ewma(target=target, sigma=sigma, lam=lam, L=L).extend(data)
+
+# charts where prepare_data_* puts a placeholder before the first point
+PLACEHOLDER_CHARTS = (CHART_P, CHART_U, CHART_CUSUM, CHART_TABULAR_CUSUM, CHART_EWMA)
+
+# parameters of charts, passed as keywords to their STATS_FUNCS of both
+# backends and to their RUNNING_STATS, see `Spc` (params)
+CHART_PARAMS = {
+    CHART_TABULAR_CUSUM: ('k', 'h'),
+    CHART_EWMA: ('lam', 'L')}
+
+def _chart_params(chart_type, params):
+    """Return params of the chart as a dict, raise ValueError for unknown ones."""
+    params = dict(params or {})
+    for name in params:
+        if name not in CHART_PARAMS.get(chart_type, ()):
+            raise ValueError("Chart %s has no parameter %r" % (chart_type, name))
+    return params
 
 STATS_FUNCS = {
     CHART_X_BAR_R_X: (get_stats_x_bar_r_x, prepare_data_x_bar_rs_x),
@@ -313,22 +597,1518 @@ STATS_FUNCS = {
     CHART_NP: (get_stats_np, prepare_data_none),
     CHART_C: (get_stats_c, prepare_data_none),
     CHART_U: (get_stats_u, prepare_data_u),
-    CHART_EWMA: (None, prepare_data_none),
+    CHART_EWMA: (get_stats_ewma, prepare_data_ewma),
     CHART_CUSUM: (get_stats_cusum, prepare_data_cusum),
+    CHART_TABULAR_CUSUM: (get_stats_tabular_cusum, prepare_data_tabular_cusum),
     CHART_THREE_WAY: (None, prepare_data_none),
     CHART_TIME_SERIES: (None, prepare_data_none)}
 
+# location and dispersion charts drawn together, see SpcPair
+PAIR_X_BAR_R = "Xbar R"
+PAIR_X_BAR_S = "Xbar S"
+PAIR_X_MR = "X mR"
+
+PAIRED_CHARTS = {
+    PAIR_X_BAR_R: (CHART_X_BAR_R_X, CHART_X_BAR_R_R),
+    PAIR_X_BAR_S: (CHART_X_BAR_S_X, CHART_X_BAR_S_S),
+    PAIR_X_MR: (CHART_X_MR_X, CHART_X_MR_MR)}
+
+def get_profile_subgroups(data, size):
+    """
+    Return {chart: (limits, prepared data)} of all subgroup charts (Xbar R
+    and Xbar S) from one pass over the subgroups, see `subgroup_stats`.
+    """
+    n = size
+    assert n >= 2
+    assert n <= 10
+    for xset in data:
+        assert len(xset) == n
+    means, ranges, stds = subgroup_stats(data)
+    Xbar = math.fsum(means) / len(means)
+    Rbar = math.fsum(ranges) / len(ranges)
+    Sbar = math.fsum(stds) / len(stds)
+    return {
+        CHART_X_BAR_R_X: ((Xbar, Xbar - A2[n]*Rbar, Xbar + A2[n]*Rbar), means),
+        CHART_X_BAR_R_R: ((Rbar, D3[n]*Rbar, D4[n]*Rbar), ranges),
+        CHART_X_BAR_S_X: ((Xbar, Xbar - A3[n]*Sbar, Xbar + A3[n]*Sbar), means),
+        CHART_X_BAR_S_S: ((Sbar, B3[n]*Sbar, B4[n]*Sbar), stds)}
+
+def get_pair_x_bar_r(data, size):
+    """
+    Return limits and prepared data of Xbar R - X and Xbar R - R charts
+    from one pass over the subgroups: ((stats, means), (stats, ranges)).
+    """
+    charts = get_profile_subgroups(data, size)
+    return charts[CHART_X_BAR_R_X], charts[CHART_X_BAR_R_R]
+
+def get_pair_x_bar_s(data, size):
+    """Same as `get_pair_x_bar_r` for Xbar S - X and Xbar S - S charts."""
+    charts = get_profile_subgroups(data, size)
+    return charts[CHART_X_BAR_S_X], charts[CHART_X_BAR_S_S]
+
+def get_pair_x_mr(data, size):
+    """Same as `get_pair_x_bar_r` for X mR - X and X mR - mR charts."""
+    assert size == 1
+    mr = [0]
+    it = iter(data)
+    last = next(it)
+    for x in it:
+        mr.append(abs(last - x))
+        last = x
+    center = _mean(data)
+    sd = math.fsum(mr) / (len(mr) - 1)
+    d2 = 1.128
+    return ((center, center - 3*sd/d2, center + 3*sd/d2), data), \
+           ((sd, 0, sd + 3*sd/d2), mr)
+
+PAIR_FUNCS = {
+    PAIR_X_BAR_R: get_pair_x_bar_r,
+    PAIR_X_BAR_S: get_pair_x_bar_s,
+    PAIR_X_MR: get_pair_x_mr}
+
+def get_profile_individuals(data, size):
+    """
+    Return {chart: (limits, prepared data)} of all charts of individual
+    values (X mR, CUSUM and tabular CUSUM).
+
+    Mean and moving ranges come from one pass, the cumulative sums need
+    one more pass with the mean as target.
+    """
+    (x_stats, x), (mr_stats, mr) = get_pair_x_mr(data, size)
+    target = _mean(x)
+    sigma = mr_stats[0] / 1.128
+    return {
+        CHART_X_MR_X: (x_stats, x),
+        CHART_X_MR_MR: (mr_stats, mr),
+        CHART_CUSUM: (get_stats_cusum(data, size), prepare_data_cusum(data, size, target=target)),
+        CHART_TABULAR_CUSUM: ((0, -CUSUM_H*sigma, CUSUM_H*sigma),
+                              [0] + TabularCusum(target=target, sigma=sigma).extend(data))}
+
+# by subgroups (size > 1)
+PROFILE_FUNCS = {
+    False: get_profile_individuals,
+    True: get_profile_subgroups}
+
+class RunningStats(object):
+    """
+    Base of running statistics of a chart.
+
+    Values are added one by one with `add` which returns the value as it
+    is plotted on the chart. `get_stats` gives the same limits as the
+    `get_stats_*` function of the chart for all added values, in O(1).
+
+    Statistics of consecutive parts of the data can be joined with `merge`,
+    so shards can be reduced in any grouping (map-reduce style) into the
+    limits of the whole data, see `get_partial_stats`. Sums are kept
+    exact (`_ExactSum`), so the merged limits equal the limits of one pass
+    over all data bit for bit.
+    """
+
+    def merge(self, other):
+        """Add statistics of data following this one, return self."""
+        raise TypeError("Statistics of chart %s cannot be merged" % self._chart_type())
+
+    def discard(self, x, after):
+        """
+        Remove the oldest value `x`, `after` is the value following it.
+
+        Used for limits from a moving window, see `window_limits`.
+        """
+        raise TypeError("Statistics of chart %s have no moving window" % self._chart_type())
+
+    def _chart_type(self):
+        for chart_type, cls in RUNNING_STATS.items():
+            if type(self) is cls:
+                return chart_type
+        return type(self).__name__
+
+    def fit(self, data):
+        """Add initial data of the chart."""
+        for v in data:
+            self.add(v)
+
+    def extend(self, data):
+        """Add values, return list of them as plotted on the chart."""
+        add = self.add
+        return [add(v) for v in data]
+
+
+class XmRXStats(RunningStats):
+    """Running statistics of X mR - X chart."""
+
+    def __init__(self, size=1):
+        assert size == 1
+        self.n = 0
+        self.total = _ExactSum()
+        self.mr_total = _ExactSum()
+        self.first = None
+        self.last = None
+
+    def add(self, x):
+        if self.n > 0:
+            self.mr_total.add(abs(self.last - x))
+        else:
+            self.first = x
+        self.total.add(x)
+        self.n += 1
+        self.last = x
+        return x
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.n > 0:
+            # moving range across the border of the two parts
+            self.mr_total.add(abs(self.last - other.first))
+        else:
+            self.first = other.first
+        self.mr_total.merge(other.mr_total)
+        self.total.merge(other.total)
+        self.n += other.n
+        self.last = other.last
+        return self
+
+    def discard(self, x, after):
+        self.n -= 1
+        self.total.add(-x)
+        self.mr_total.add(-abs(x - after))
+        self.first = after
+
+    def mean(self):
+        return float(self.total) / self.n
+
+    def _mr_bar(self):
+        return float(self.mr_total) / (self.n - 1)
+
+    def get_stats(self):
+        center = self.mean()
+        d2 = 1.128
+        sd = self._mr_bar()
+        return center, center - 3*sd/d2, center + 3*sd/d2
+
+
+class XmRMRStats(XmRXStats):
+    """Running statistics of X mR - mR chart."""
+
+    def add(self, x):
+        last = self.last
+        XmRXStats.add(self, x)
+        return 0 if last is None else abs(last - x)
+
+    def get_stats(self):
+        d2 = 1.128
+        center = self._mr_bar()
+        return center, 0, center + 3*center/d2
+
+
+class XBarRXStats(RunningStats):
+    """Running statistics of Xbar R - X chart, values are subgroups."""
+
+    def __init__(self, size):
+        assert size >= 2
+        assert size <= 10
+        self.size = size
+        self.n = 0
+        self.total = _ExactSum()
+        self.r_total = _ExactSum()
+
+    def add(self, xset):
+        assert len(xset) == self.size
+        self.n += 1
+        mean, r, s = _row_stats(xset)
+        for x in xset:
+            self.total.add(x)
+        self.r_total.add(r)
+        return mean
+
+    def merge(self, other):
+        assert other.size == self.size
+        self.n += other.n
+        self.total.merge(other.total)
+        self.r_total.merge(other.r_total)
+        return self
+
+    def discard(self, xset, after):
+        self.n -= 1
+        for x in xset:
+            self.total.add(-x)
+        self.r_total.add(-(max(xset) - min(xset)))
+
+    def get_stats(self):
+        Rbar = float(self.r_total) / self.n
+        center = float(self.total) / (self.n * self.size)
+        return center, center - A2[self.size]*Rbar, center + A2[self.size]*Rbar
+
+
+class XBarRRStats(XBarRXStats):
+    """Running statistics of Xbar R - R chart."""
+
+    def add(self, xset):
+        XBarRXStats.add(self, xset)
+        return max(xset) - min(xset)
+
+    def get_stats(self):
+        Rbar = float(self.r_total) / self.n
+        return Rbar, D3[self.size]*Rbar, D4[self.size]*Rbar
+
+
+class XBarSXStats(RunningStats):
+    """Running statistics of Xbar S - X chart, values are subgroups."""
+
+    def __init__(self, size):
+        assert size >= 2
+        assert size <= 10
+        self.size = size
+        self.n = 0
+        self.total = _ExactSum()
+        self.s_total = _ExactSum()
+
+    def add(self, xset):
+        return self._add(xset)[0]
+
+    def _add(self, xset):
+        mean, r, s = _row_stats(xset)
+        self.n += 1
+        for x in xset:
+            self.total.add(x)
+        self.s_total.add(s)
+        return mean, s
+
+    def merge(self, other):
+        assert other.size == self.size
+        self.n += other.n
+        self.total.merge(other.total)
+        self.s_total.merge(other.s_total)
+        return self
+
+    def discard(self, xset, after):
+        self.n -= 1
+        for x in xset:
+            self.total.add(-x)
+        self.s_total.add(-_row_stats(xset)[2])
+
+    def get_stats(self):
+        Sbar = float(self.s_total) / self.n
+        center = float(self.total) / (self.n * self.size)
+        return center, center - A3[self.size]*Sbar, center + A3[self.size]*Sbar
+
+
+class XBarSSStats(XBarSXStats):
+    """Running statistics of Xbar S - S chart."""
+
+    def add(self, xset):
+        return self._add(xset)[1]
+
+    def get_stats(self):
+        Sbar = float(self.s_total) / self.n
+        return Sbar, B3[self.size]*Sbar, B4[self.size]*Sbar
+
+
+class CStats(RunningStats):
+    """Running statistics of c chart, values are counts of defects."""
+
+    def __init__(self, size=1):
+        self.size = size
+        self.n = 0
+        self.total = _ExactSum()
+
+    def add(self, d):
+        self.n += 1
+        self.total.add(d)
+        return d
+
+    def merge(self, other):
+        assert other.size == self.size
+        self.n += other.n
+        self.total.merge(other.total)
+        return self
+
+    def discard(self, d, after):
+        self.n -= 1
+        self.total.add(-d)
+
+    def get_stats(self):
+        return _limits_c(float(self.total) / self.n)
+
+
+class PStats(CStats):
+    """Running statistics of p chart, values are counts of defectives."""
+
+    def __init__(self, size):
+        assert size > 1
+        CStats.__init__(self, size)
+
+    def add(self, d):
+        CStats.add(self, d)
+        return float(d)/self.size
+
+    def get_stats(self):
+        return _limits_p(float(self.total) / (self.size * self.n), self.size)
+
+
+class NPStats(PStats):
+    """Running statistics of np chart."""
+
+    def add(self, d):
+        CStats.add(self, d)
+        return d
+
+    def get_stats(self):
+        return _limits_np(float(self.total) / (self.size * self.n), self.size)
+
+
+class UStats(PStats):
+    """Running statistics of u chart."""
+
+    def get_stats(self):
+        return _limits_u(float(self.total) / (self.n * self.size), self.size)
+
+
+class CusumStats(RunningStats):
+    """
+    Running statistics of CUSUM chart.
+
+    The target is the mean of the data passed to `fit` (or given), later
+    values continue the cumulative sum around this target.
+    """
+
+    def __init__(self, size=1, target=None):
+        self.size = size
+        self.target = target
+        self.s = 0
+
+    def fit(self, data):
+        data = list(data)
+        if self.target is None:
+            self.target = _mean(data)
+        RunningStats.fit(self, data)
+
+    def add(self, x):
+        self.s += float(x) - self.target
+        return self.s
+
+    def merge(self, other):
+        assert other.target == self.target
+        self.s += other.s
+        return self
+
+    def get_stats(self):
+        return get_stats_cusum(None, self.size)
+
+
+class TabularCusum(RunningStats):
+    """
+    Streaming tabular CUSUM.
+
+    Keeps the upper and lower one-sided sums
+
+    SH_i = max(0, x_i - (target + k*sigma) + SH_{i-1})
+    SL_i = max(0, (target - k*sigma) - x_i + SL_{i-1})
+
+    in constant memory. A shift is signalled when either sum exceeds the
+    decision interval h*sigma. `add` returns SH, or -SL when SL is the
+    bigger one, so both sides fit on one chart with limits -h*sigma and
+    h*sigma. Target and sigma default to the mean and the moving range
+    estimate of the data passed to `fit`.
+
+    Parts can only be merged when they share target and sigma, agree on
+    them first, e.g. from merged `XmRXStats` of all parts.
+
+    >>> cusum = TabularCusum(target=10, sigma=1)
+    >>> cusum.extend([10, 11, 12, 13])
+    [0, 0.5, 2.0, 4.5]
+    """
+
+    def __init__(self, size=1, target=None, sigma=None, k=CUSUM_K, h=CUSUM_H):
+        self.size = size
+        self.target = target
+        self.sigma = sigma
+        self.k = k
+        self.h = h
+        self.sh = 0
+        self.sl = 0
+        self.n = 0
+        self.total = _ExactSum()
+
+    def fit(self, data):
+        data = list(data)
+        if self.target is None or self.sigma is None:
+            target, sigma = _smoothing_params(data)
+            if self.target is None:
+                self.target = target
+            if self.sigma is None:
+                self.sigma = sigma
+        RunningStats.fit(self, data)
+
+    def add(self, x):
+        K = self.k * self.sigma
+        self.sh = max(0, x - (self.target + K) + self.sh)
+        self.sl = max(0, (self.target - K) - x + self.sl)
+        self.n += 1
+        self.total.add(x)
+        return self.sh if self.sh >= self.sl else -self.sl
+
+    def merge(self, other):
+        assert (other.target, other.sigma, other.k, other.h) == (self.target, self.sigma, self.k, self.h)
+        # max(0, s + y) steps compose: the sums of `other` started from
+        # ours are its own sums or ours shifted by its total increment
+        K = self.k * self.sigma
+        total = float(other.total)
+        self.sh = max(other.sh, self.sh + total - other.n * (self.target + K))
+        self.sl = max(other.sl, self.sl + other.n * (self.target - K) - total)
+        self.n += other.n
+        self.total.merge(other.total)
+        return self
+
+    def get_stats(self):
+        H = self.h * self.sigma
+        return 0, -H, H
+
+
+class Ewma(RunningStats):
+    """
+    Streaming EWMA (exponentially weighted moving average).
+
+    z_i = lambda*x_i + (1 - lambda)*z_{i-1},  z_0 = target
+
+    The variance of z_i is q_i*sigma^2 with
+
+    q_i = (1 - lambda)^2*q_{i-1} + lambda^2,  q_0 = 0
+
+    so the exact time-varying limits target +- L*sigma*sqrt(q_i) of each
+    point cost O(1) and the state is a few numbers whatever the length of
+    the stream. `add` returns z_i and `get_stats` the limits of the last
+    point. Target and sigma default to the mean and the moving range
+    estimate of the data passed to `fit`.
+
+    Parts sharing target, sigma and lambda merge: the smoother of the
+    following part started from our z instead of the target adds our
+    deviation decayed by (1 - lambda)^n of its n points.
+
+    >>> ewma = Ewma(target=10, sigma=1, lam=0.5)
+    >>> ewma.extend([10, 12, 12])
+    [10.0, 11.0, 11.5]
+    >>> [round(v, 4) for v in ewma.get_stats()]
+    [10, 8.2815, 11.7185]
+    """
+
+    def __init__(self, size=1, target=None, sigma=None, lam=EWMA_LAMBDA, L=EWMA_L):
+        assert 0 < lam <= 1
+        self.size = size
+        self.target = target
+        self.sigma = sigma
+        self.lam = lam
+        self.L = L
+        self.z = target
+        self.q = 0.0
+        self.n = 0
+
+    def fit(self, data):
+        data = list(data)
+        if self.target is None or self.sigma is None:
+            target, sigma = _smoothing_params(data)
+            if self.target is None:
+                self.target = self.z = target
+            if self.sigma is None:
+                self.sigma = sigma
+        RunningStats.fit(self, data)
+
+    def add(self, x):
+        lam = self.lam
+        # smoothed deviation from the target, as in the NumPy backend, so
+        # points on the target stay exactly on the center line
+        self.z = self.target + (lam*(x - self.target) + (1 - lam)*(self.z - self.target))
+        self.q = (1 - lam)*(1 - lam)*self.q + lam*lam
+        self.n += 1
+        return self.z
+
+    def merge(self, other):
+        assert (other.target, other.sigma, other.lam, other.L) == (self.target, self.sigma, self.lam, self.L)
+        decay = (1 - self.lam) ** other.n
+        self.z = self.target + ((other.z - self.target) + decay*(self.z - self.target))
+        self.q = decay*decay*self.q + other.q
+        self.n += other.n
+        return self
+
+    def get_stats(self):
+        w = self.L * self.sigma * math.sqrt(self.q)
+        return self.target, self.target - w, self.target + w
+
+
+RUNNING_STATS = {
+    CHART_X_BAR_R_X: XBarRXStats,
+    CHART_X_BAR_R_R: XBarRRStats,
+    CHART_X_BAR_S_X: XBarSXStats,
+    CHART_X_BAR_S_S: XBarSSStats,
+    CHART_X_MR_X: XmRXStats,
+    CHART_X_MR_MR: XmRMRStats,
+    CHART_P: PStats,
+    CHART_NP: NPStats,
+    CHART_C: CStats,
+    CHART_U: UStats,
+    CHART_EWMA: Ewma,
+    CHART_CUSUM: CusumStats,
+    CHART_TABULAR_CUSUM: TabularCusum}
+
+def get_partial_stats(data, chart_type, sizes=None, target=None, sigma=None):
+    """
+    Return mergeable statistics of one shard of data of the chart.
+
+    CUSUM, tabular CUSUM and EWMA shards merge only with a common `target`
+    (and `sigma`), give them here, e.g. from merged `XmRXStats` of all
+    shards; otherwise each shard would fit its own.
+
+    >>> parts = [get_partial_stats(d, CHART_X_MR_X) for d in ([1, 2, 3, 3], [2, 1, 3, 8])]
+    >>> merge_stats(parts).get_stats() == get_stats_x_mr_x([1, 2, 3, 3, 2, 1, 3, 8], 1)
+    True
+    """
+    if sizes is None:
+        sizes = subgroup_size(data)
+    kwargs = {}
+    if target is not None:
+        kwargs['target'] = target
+    if sigma is not None:
+        kwargs['sigma'] = sigma
+    if kwargs and chart_type not in (CHART_CUSUM, CHART_TABULAR_CUSUM, CHART_EWMA):
+        raise ValueError("Chart %s has no target or sigma" % chart_type)
+    if sigma is not None and chart_type == CHART_CUSUM:
+        raise ValueError("Chart %s has no sigma" % chart_type)
+    stats = RUNNING_STATS[chart_type](sizes, **kwargs)
+    stats.fit(data)
+    return stats
+
+def merge_stats(parts):
+    """Merge statistics of consecutive shards, in their order."""
+    parts = iter(parts)
+    stats = copy.deepcopy(next(parts))
+    for p in parts:
+        stats.merge(p)
+    return stats
+
+def window_limits(data, chart_type, window=None, sizes=None):
+    """
+    Return points of the chart and limits of each point computed from the
+    last `window` points (subgroups) up to and including it, or from all
+    points up to it when `window` is None (expanding window).
+
+    Running sums are updated in O(1) per point, values leaving the window
+    are kept in a ring buffer. Returns four array('d'): points, centers,
+    LCLs and UCLs; limits are nan where there are too few points (the
+    first point of X mR charts).
+
+    >>> points, center, lcl, ucl = window_limits([1, 2, 3, 3, 2, 1, 3, 8], CHART_X_MR_X, window=4)
+    >>> list(center)
+    [nan, 1.5, 2.0, 2.25, 2.5, 2.25, 2.25, 3.5]
+    """
+    if chart_type in (CHART_CUSUM, CHART_TABULAR_CUSUM, CHART_EWMA) or chart_type not in RUNNING_STATS:
+        raise NotImplementedError("Chart %s does not support window limits" % chart_type)
+    assert window is None or window >= 2
+    size = subgroup_size(data) if sizes is None else sizes
+    stats = RUNNING_STATS[chart_type](size)
+    ring = collections.deque()
+    points, centers, lcls, ucls = array('d'), array('d'), array('d'), array('d')
+    nan = float('nan')
+    for v in data:
+        points.append(stats.add(v))
+        if window is not None:
+            ring.append(v)
+            if len(ring) > window:
+                stats.discard(ring.popleft(), ring[0])
+        try:
+            c, l, u = stats.get_stats()
+        except ZeroDivisionError:
+            c = l = u = nan
+        centers.append(c)
+        lcls.append(l)
+        ucls.append(u)
+    return points, centers, lcls, ucls
+
+def check_window(data, chart_type, rules=RULES_BASIC, window=None, sizes=None, backend=None):
+    """
+    Check rules with each point against its own limits from a moving (or
+    expanding) window, see `window_limits`.
+
+    Returns ((points, centers, lcls, ucls), {rule: [index]}), indexes are
+    positions in `data`. As in `Spc` the first point is not checked.
+    """
+    nb = get_backend(data, backend)
+    limits = (window_limits if nb is None else nb.window_limits)(data, chart_type, window, sizes)
+    points, centers, lcls, ucls = limits
+    # points before the limits can be computed are skipped
+    warmup = 1
+    while warmup < len(centers) and centers[warmup] != centers[warmup]:
+        warmup += 1
+    if nb is not None:
+        return limits, nb.find_violating_points(points, centers, lcls, ucls, rules, warmup=warmup)
+    engine = RuleEngine(0, None, None, rules, warmup=warmup)
+    return limits, engine.feed_varying(points, centers, lcls, ucls)
+
 RULES_FUNCS = {
     RULES_1_BEYOND_3SIGMA: (test_beyond_limits, 1),
-    RULES_2_OF_3_BEYOND_2SIGMA: (None, 3),
-    RULES_4_OF_5_BEYOND_1SIGMA: (None, 5),
+    RULES_2_OF_3_BEYOND_2SIGMA: (test_2_of_3_beyond_2sigma, 3),
+    RULES_4_OF_5_BEYOND_1SIGMA: (test_4_of_5_beyond_1sigma, 5),
     RULES_7_ON_ONE_SIDE: (test_violating_runs, 7),
     RULES_8_ON_ONE_SIDE: (test_violating_runs, 8),
     RULES_9_ON_ONE_SIDE: (test_violating_runs, 9),
-    RULES_6_TRENDING: (None, 6),
-    RULES_14_UP_DOWN: (None, 14),
-    RULES_15_BELOW_1SIGMA: (None, 15),
-    RULES_8_BEYOND_1SIGMA_BOTH_SIDES: (None, 8)}
+    RULES_6_TRENDING: (test_trending, 6),
+    RULES_14_UP_DOWN: (test_up_down, 14),
+    RULES_15_BELOW_1SIGMA: (test_below_1sigma, 15),
+    RULES_8_BEYOND_1SIGMA_BOTH_SIDES: (test_beyond_1sigma_both_sides, 8)}
+
+
+class _BeyondLimits(object):
+    """Detector for a single point outside of the control limits."""
+    __slots__ = ()
+
+    def push(self, x, z, d):
+        return z > 3 or z < -3
+
+
+class _SideRun(object):
+    """Detector for `n` points in a row that do not cross the center line."""
+    __slots__ = ('n', 'run', 'prev')
+
+    def __init__(self, n):
+        self.n = n
+        self.run = 0
+        self.prev = 0
+
+    def push(self, x, z, d):
+        if d * self.prev < 0:
+            self.run = 1
+        else:
+            self.run += 1
+        self.prev = d
+        return self.run >= self.n
+
+
+class _KOfN(object):
+    """Detector for `k` of the last `n` points beyond `level` sigma on one side."""
+    __slots__ = ('k', 'n', 'level', 'up', 'down', 'ups', 'downs', 'pos', 'seen')
+
+    def __init__(self, k, n, level):
+        self.k = k
+        self.n = n
+        self.level = level
+        self.up = [0] * n
+        self.down = [0] * n
+        self.ups = 0
+        self.downs = 0
+        self.pos = 0
+        self.seen = 0
+
+    def push(self, x, z, d):
+        pos = self.pos
+        u = 1 if z > self.level else 0
+        w = 1 if z < -self.level else 0
+        self.ups += u - self.up[pos]
+        self.downs += w - self.down[pos]
+        self.up[pos] = u
+        self.down[pos] = w
+        self.pos = pos + 1 if pos + 1 < self.n else 0
+        if self.seen < self.n:
+            self.seen += 1
+            if self.seen < self.n:
+                return False
+        return self.ups >= self.k or self.downs >= self.k
+
+
+class _Trend(object):
+    """Detector for `n` points in a row steadily increasing or decreasing."""
+    __slots__ = ('n', 'prev', 'inc', 'dec')
+
+    def __init__(self, n):
+        self.n = n
+        self.prev = None
+        self.inc = 0
+        self.dec = 0
+
+    def push(self, x, z, d):
+        prev = self.prev
+        self.prev = x
+        if prev is None:
+            return False
+        self.inc = self.inc + 1 if x > prev else 0
+        self.dec = self.dec + 1 if x < prev else 0
+        return self.inc >= self.n - 1 or self.dec >= self.n - 1
+
+
+class _Alternating(object):
+    """Detector for `n` points in a row alternating up and down."""
+    __slots__ = ('n', 'prev', 'step', 'alt')
+
+    def __init__(self, n):
+        self.n = n
+        self.prev = None
+        self.step = 0
+        self.alt = 0
+
+    def push(self, x, z, d):
+        prev = self.prev
+        self.prev = x
+        if prev is None:
+            return False
+        step = 1 if x > prev else -1 if x < prev else 0
+        if step == 0:
+            self.alt = 0
+        elif step == -self.step:
+            self.alt += 1
+        else:
+            self.alt = 1
+        self.step = step
+        return self.alt >= self.n - 1
+
+
+class _InsideRun(object):
+    """Detector for `n` points in a row within `level` sigma of the center."""
+    __slots__ = ('n', 'level', 'run')
+
+    def __init__(self, n, level=1):
+        self.n = n
+        self.level = level
+        self.run = 0
+
+    def push(self, x, z, d):
+        self.run = self.run + 1 if -self.level <= z <= self.level else 0
+        return self.run >= self.n
+
+
+class _OutsideRun(object):
+    """Detector for `n` points in a row beyond `level` sigma, on both sides."""
+    __slots__ = ('n', 'level', 'run', 'since_up', 'since_down')
+
+    def __init__(self, n, level=1):
+        self.n = n
+        self.level = level
+        self.run = 0
+        self.since_up = n
+        self.since_down = n
+
+    def push(self, x, z, d):
+        if z > self.level:
+            self.since_up = 0
+            self.since_down += 1
+        elif z < -self.level:
+            self.since_up += 1
+            self.since_down = 0
+        else:
+            self.run = 0
+            self.since_up = self.since_down = self.n
+            return False
+        self.run += 1
+        return self.run >= self.n and self.since_up < self.n and self.since_down < self.n
+
+
+RULES_DETECTORS = {
+    RULES_1_BEYOND_3SIGMA: _BeyondLimits,
+    RULES_2_OF_3_BEYOND_2SIGMA: lambda: _KOfN(2, 3, 2),
+    RULES_4_OF_5_BEYOND_1SIGMA: lambda: _KOfN(4, 5, 1),
+    RULES_7_ON_ONE_SIDE: lambda: _SideRun(7),
+    RULES_8_ON_ONE_SIDE: lambda: _SideRun(8),
+    RULES_9_ON_ONE_SIDE: lambda: _SideRun(9),
+    RULES_6_TRENDING: lambda: _Trend(6),
+    RULES_14_UP_DOWN: lambda: _Alternating(14),
+    RULES_15_BELOW_1SIGMA: lambda: _InsideRun(15),
+    RULES_8_BEYOND_1SIGMA_BOTH_SIDES: lambda: _OutsideRun(8)}
+
+
+# Custom rules are written like the names of the built-in rules and
+# compiled to the same detectors, see `register_rule`.
+RULE_BEYOND = "beyond"
+RULE_ON_ONE_SIDE = "on one side"
+RULE_BELOW = "below"
+RULE_BOTH_SIDES = "both sides"
+RULE_TRENDING = "trending"
+RULE_UP_DOWN = "up down"
+
+_SIGMA = r'(?P<level>\d+(?:\.\d*)?|\.\d+) ?\*? ?sigma'
+_RULE_GRAMMAR = [
+    (RULE_BEYOND, re.compile(r'(?:(?P<k>\d+) of )?(?P<n>\d+) beyond %s' % _SIGMA)),
+    (RULE_BOTH_SIDES, re.compile(r'(?P<n>\d+) beyond %s on both sides' % _SIGMA)),
+    (RULE_BELOW, re.compile(r'(?P<n>\d+) below %s' % _SIGMA)),
+    (RULE_ON_ONE_SIDE, re.compile(r'(?:(?P<k>\d+) of )?(?P<n>\d+) on one side')),
+    (RULE_TRENDING, re.compile(r'(?P<n>\d+) trending')),
+    (RULE_UP_DOWN, re.compile(r'(?P<n>\d+) up down'))]
+
+# fewest points which make sense for a rule
+_RULE_MIN_POINTS = {RULE_BOTH_SIDES: 2, RULE_TRENDING: 2, RULE_UP_DOWN: 3}
+
+# custom rules registered with `register_rule`, {rule: parse_rule(rule)}
+RULES_SPECS = {}
+
+def parse_rule(rule):
+    """
+    Return (kind, k, n, level) of a rule written like the built-in rules.
+
+    The rule language has:
+
+    - "K of N beyond S*sigma": K of the last N points beyond S sigma on
+      the same side of the center ("N beyond S*sigma" for K = N)
+    - "K of N on one side": K of the last N points on the same side of
+      the center, "N on one side" is a run of N points not crossing it
+    - "N below S*sigma": N points in a row within S sigma of the center
+    - "N beyond S*sigma on both sides": N points in a row beyond S sigma,
+      some of them on each side
+    - "N trending": N points in a row steadily increasing or decreasing
+    - "N up down": N points in a row alternating up and down
+
+    S may be fractional, "S sigma" is the same as "S*sigma". "K of N on
+    one side" with K < N is returned as beyond 0 sigma. Raises ValueError
+    for anything else.
+
+    >>> parse_rule("3 of 4 beyond 1.5 sigma")
+    ('beyond', 3, 4, 1.5)
+    >>> parse_rule("10 of 11 on one side")
+    ('beyond', 10, 11, 0)
+    >>> parse_rule(RULES_15_BELOW_1SIGMA)
+    ('below', 15, 15, 1)
+    """
+    text = ' '.join(rule.lower().split())
+    for kind, pattern in _RULE_GRAMMAR:
+        m = pattern.fullmatch(text)
+        if m is not None:
+            break
+    else:
+        raise ValueError("Cannot parse rule %r" % rule)
+    groups = m.groupdict()
+    n = int(groups['n'])
+    k = int(groups['k']) if groups.get('k') else n
+    level = float(groups['level']) if groups.get('level') else 0
+    if level == int(level):
+        level = int(level)
+    if not 1 <= k <= n or n < _RULE_MIN_POINTS.get(kind, 1):
+        raise ValueError("Rule %r needs 1 <= K <= N and more points" % rule)
+    if kind == RULE_ON_ONE_SIDE and k < n:
+        kind = RULE_BEYOND
+    return kind, k, n, level
+
+
+class _Scaled(object):
+    """
+    Detector `inner` checked against lines `level` sigma from the center
+    instead of the sigma zones, for levels which are not a zone border.
+
+    It sees zone 2 (-2) beyond the lines, 1 (-1) between them and the
+    center, so `inner` is made for level 1.
+    """
+    __slots__ = ('level', 'inner', 'lower', 'upper')
+
+    def __init__(self, inner, level):
+        self.level = level
+        self.inner = inner.push
+        self.lower = -float('inf')
+        self.upper = float('inf')
+
+    def set_limits(self, center, lcl, ucl):
+        inf = float('inf')
+        self.upper = inf if ucl is None else center + self.level * (ucl - center) / 3
+        self.lower = -inf if lcl is None else center - self.level * (center - lcl) / 3
+
+    def push(self, x, z, d):
+        if d > 0:
+            z = 2 if x > self.upper else 1
+        elif d < 0:
+            z = -2 if x < self.lower else -1
+        else:
+            z = 0
+        return self.inner(x, z, d)
+
+
+def _rule_detector(spec):
+    """Return factory of the detector of a parsed rule."""
+    kind, k, n, level = spec
+    scaled = level not in (0, 1, 2, 3)
+    zone_level = 1 if scaled else level
+    if kind == RULE_BEYOND:
+        make = lambda: _KOfN(k, n, zone_level)
+    elif kind == RULE_BELOW:
+        make = lambda: _InsideRun(n, zone_level)
+    elif kind == RULE_BOTH_SIDES:
+        make = lambda: _OutsideRun(n, zone_level)
+    elif kind == RULE_ON_ONE_SIDE:
+        make = lambda: _SideRun(n)
+    elif kind == RULE_TRENDING:
+        make = lambda: _Trend(n)
+    else:
+        make = lambda: _Alternating(n)
+    if scaled:
+        return lambda: _Scaled(make(), level)
+    return make
+
+def _rule_test(spec):
+    """Return slice test of a parsed rule, see `RULES_FUNCS`."""
+    kind, k, n, level = spec
+    if kind == RULE_ON_ONE_SIDE:
+        return test_violating_runs
+    if kind == RULE_TRENDING:
+        return test_trending
+    if kind == RULE_UP_DOWN:
+        return test_up_down
+
+    def lines(center, lcl, ucl):
+        if level == 0:
+            return center, center
+        if level == 3:
+            return lcl, ucl
+        return _sigma_lines(center, lcl, ucl, level)
+
+    def test_beyond(data, center, lcl, ucl):
+        lower, upper = lines(center, lcl, ucl)
+        return (sum(1 for d in data if d > upper) >= k or
+                sum(1 for d in data if d < lower) >= k)
+
+    def test_below(data, center, lcl, ucl):
+        lower, upper = lines(center, lcl, ucl)
+        return all(lower <= d <= upper for d in data)
+
+    def test_both_sides(data, center, lcl, ucl):
+        lower, upper = lines(center, lcl, ucl)
+        return (all(d > upper or d < lower for d in data) and
+                any(d > upper for d in data) and any(d < lower for d in data))
+
+    return {RULE_BEYOND: test_beyond, RULE_BELOW: test_below,
+            RULE_BOTH_SIDES: test_both_sides}[kind]
+
+def register_rule(rule):
+    """
+    Compile a custom rule written in the language of `parse_rule` and
+    return it, to be passed to `Spc`, `RuleEngine`, `FrozenLimits` and
+    `batch` like the built-in rules.
+
+    The rule is compiled to the counter and ring buffer detectors of the
+    built-in rules, so it is checked in the same pass over the data and
+    costs the same; levels between the sigma zones (1.5 sigma) compare
+    points with their own lines instead of the zones. Built-in rules are
+    returned as they are.
+
+    >>> rule = register_rule("3 of 4 beyond 1.5 sigma")
+    >>> data = [0, 1, -1, 0, 1, -1, 0, 1, -1, 0, 2.5, 2.5, 1, 2.5]
+    >>> Spc(data, CHART_X_MR_X).get_violating_points([rule, RULES_2_OF_3_BEYOND_2SIGMA])
+    {'3 of 4 beyond 1.5 sigma': [13]}
+    """
+    spec = parse_rule(rule)
+    if rule not in RULES_DETECTORS:
+        RULES_SPECS[rule] = spec
+        RULES_DETECTORS[rule] = _rule_detector(spec)
+        RULES_FUNCS[rule] = (_rule_test(spec), spec[2])
+    return rule
+
+
+def _unique_rules(rules):
+    """
+    Return rules which have a detector, without repeats.
+
+    Raises KeyError for a rule which is not known (not in `RULES_FUNCS`),
+    e.g. a misspelled one or a custom rule which was not registered with
+    `register_rule`.
+    """
+    rs = []
+    for r in rules:
+        if r not in RULES_FUNCS:
+            raise KeyError("Unknown rule %r" % (r,))
+        if r in RULES_DETECTORS and r not in rs:
+            rs.append(r)
+    return rs
+
+def _order_violations(points, rules):
+    """
+    Return violated rules in order of their first violation, as the
+    keys of a dict from `RuleEngine.feed`.
+    """
+    found = sorted((points[r][0], pos, r) for pos, r in enumerate(_unique_rules(rules))
+                   if r in points and len(points[r]))
+    return tuple(r for first, pos, r in found)
+
+
+class RuleEngine(object):
+    """
+    Evaluates control chart rules in one forward pass over the data.
+
+    Every point is classified once into a signed sigma zone `z`: 0 on the
+    center line, 1..3 inside the 1st, 2nd and 3rd sigma band above the
+    center (-1..-3 below) and 4 (-4) beyond the control limits. The bands
+    are derived from `center`, `lcl` and `ucl` separately for each side.
+    Each rule is a small detector keeping running counters, so the cost is
+    O(1) per point and rule and no slices of the data are made.
+
+    The first `warmup` points are counted but not checked; `Spc` skips the
+    first point which is a placeholder for mR, p and u charts.
+
+    A rule fires at index `i` when the window of its `points_num` points
+    ending at `i` violates it, same as testing the slices with
+    `RULES_FUNCS`.
+
+    With `runs` violations come as runs of consecutive indexes
+    {rule: [(start, end), ...]}, `end` included, instead of all indexes,
+    see `index_runs`. A run ending at the last point of one `feed` may be
+    continued by a run starting the next one.
+    """
+
+    def __init__(self, center, lcl, ucl, rules, warmup=0, runs=False):
+        self.center = center
+        self.lcl = lcl
+        self.ucl = ucl
+        self.warmup = warmup
+        self.runs = runs
+        self.index = 0
+        self.detectors = []
+        for r in _unique_rules(rules):
+            self.detectors.append((r, RULES_DETECTORS[r]()))
+        # detectors of custom rules with their own lines
+        self.scaled = [d for r, d in self.detectors if isinstance(d, _Scaled)]
+        self.set_limits(center, lcl, ucl)
+
+    def set_limits(self, center, lcl, ucl):
+        """
+        Change limits used for the next values.
+
+        Detectors keep their state, points already fed are not checked again.
+        """
+        self.center = center
+        self.lcl = lcl
+        self.ucl = ucl
+        # charts without limits (CUSUM) only get the center line based rules
+        inf = float('inf')
+        if ucl is None:
+            self.upper = (inf, inf, inf)
+        else:
+            self.upper = (center + (ucl - center) / 3, center + 2 * (ucl - center) / 3, ucl)
+        if lcl is None:
+            self.lower = (-inf, -inf, -inf)
+        else:
+            self.lower = (center - (center - lcl) / 3, center - 2 * (center - lcl) / 3, lcl)
+        for d in self.scaled:
+            d.set_limits(center, lcl, ucl)
+
+    def zone(self, x):
+        """Return signed sigma zone of value `x`."""
+        if x > self.center:
+            u1, u2, u3 = self.upper
+            return 4 if x > u3 else 3 if x > u2 else 2 if x > u1 else 1
+        if x < self.center:
+            l1, l2, l3 = self.lower
+            return -4 if x < l3 else -3 if x < l2 else -2 if x < l1 else -1
+        return 0
+
+    def classify(self, data):
+        """Return signed sigma zones of `data` as array('b')."""
+        return array('b', map(self.zone, data))
+
+    def feed(self, data, zones=None):
+        """
+        Push next values through the rules.
+
+        Returns only the violations found in `data` as a dict
+        {rule: [index, ...]}, or {rule: [(start, end), ...]} with `runs`;
+        indexes are counted from the first value ever fed to the engine.
+        Zones of `data` already computed with `classify` can be passed in
+        `zones` so they are not computed again.
+        """
+        if zones is not None:
+            return self._feed_zones(data, zones)
+        it = iter(data)
+        index = self.index
+        if index < self.warmup:
+            for _ in itertools.islice(it, self.warmup - index):
+                index += 1
+        points, add = self._recorder()
+        if not self.detectors:
+            for _ in it:
+                index += 1
+            self.index = index
+            return points
+        center = self.center
+        u1, u2, u3 = self.upper
+        l1, l2, l3 = self.lower
+        pushes = [(r, d.push) for r, d in self.detectors]
+        for x in it:
+            # same as self.zone(x), inlined as this is the hot loop
+            if x > center:
+                z = 4 if x > u3 else 3 if x > u2 else 2 if x > u1 else 1
+            elif x < center:
+                z = -4 if x < l3 else -3 if x < l2 else -2 if x < l1 else -1
+            else:
+                z = 0
+            d = x - center
+            for r, push in pushes:
+                if push(x, z, d):
+                    add(r, index)
+            index += 1
+        self.index = index
+        return self._result(points)
+
+    def feed_varying(self, data, centers, lcls, ucls):
+        """
+        Push next values through the rules, each checked against its own
+        limits, e.g. from `window_limits`. Returns violations as `feed`.
+        """
+        skip = max(0, self.warmup - self.index)
+        index = self.index + skip
+        self.index += len(data)
+        points, add = self._recorder()
+        pushes = [(r, d.push) for r, d in self.detectors]
+        limits = zip(data, centers, lcls, ucls)
+        for x, c, l, u in itertools.islice(limits, skip, None):
+            self.set_limits(c, l, u)
+            z = self.zone(x)
+            d = x - c
+            for r, push in pushes:
+                if push(x, z, d):
+                    add(r, index)
+            index += 1
+        return self._result(points)
+
+    def _feed_zones(self, data, zones):
+        skip = max(0, self.warmup - self.index)
+        index = self.index + skip
+        self.index += len(data)
+        points, add = self._recorder()
+        if not self.detectors:
+            return points
+        center = self.center
+        pushes = [(r, d.push) for r, d in self.detectors]
+        for x, z in zip(itertools.islice(data, skip, None), itertools.islice(zones, skip, None)):
+            d = x - center
+            for r, push in pushes:
+                if push(x, z, d):
+                    add(r, index)
+            index += 1
+        return self._result(points)
+
+    def first(self, data, stop_any=False):
+        """
+        Push next values through the rules until they are violated.
+
+        Returns {rule: index} of the first violation of each rule, in the
+        order of `feed`. A rule is not checked after its first violation
+        (its detector is removed from the engine) and the values are only
+        consumed until all rules fired, or with `stop_any` until the first
+        violating point, returning the rules violated there.
+        """
+        it = iter(data)
+        index = self.index
+        if index < self.warmup:
+            for _ in itertools.islice(it, self.warmup - index):
+                index += 1
+        found = {}
+        center = self.center
+        u1, u2, u3 = self.upper
+        l1, l2, l3 = self.lower
+        pushes = [(r, d.push) for r, d in self.detectors]
+        for x in it if pushes else ():
+            # same as self.zone(x), inlined as in feed
+            if x > center:
+                z = 4 if x > u3 else 3 if x > u2 else 2 if x > u1 else 1
+            elif x < center:
+                z = -4 if x < l3 else -3 if x < l2 else -2 if x < l1 else -1
+            else:
+                z = 0
+            d = x - center
+            hit = False
+            for r, push in pushes:
+                if push(x, z, d):
+                    found[r] = index
+                    hit = True
+            index += 1
+            if hit:
+                pushes = [(r, push) for r, push in pushes if r not in found]
+                if stop_any or not pushes:
+                    break
+        self.index = index
+        self.detectors = [(r, d) for r, d in self.detectors if r not in found]
+        return found
+
+    def first_varying(self, data, centers, lcls, ucls, stop_any=False):
+        """`first` with each value checked against its own limits, see `feed_varying`."""
+        skip = max(0, self.warmup - self.index)
+        index = self.index + skip
+        found = {}
+        pushes = [(r, d.push) for r, d in self.detectors]
+        limits = zip(data, centers, lcls, ucls)
+        for x, c, l, u in itertools.islice(limits, skip, None) if pushes else ():
+            self.set_limits(c, l, u)
+            z = self.zone(x)
+            d = x - c
+            hit = False
+            for r, push in pushes:
+                if push(x, z, d):
+                    found[r] = index
+                    hit = True
+            index += 1
+            if hit:
+                pushes = [(r, push) for r, push in pushes if r not in found]
+                if stop_any or not pushes:
+                    break
+        self.index = index
+        self.detectors = [(r, d) for r, d in self.detectors if r not in found]
+        return found
+
+    def _recorder(self):
+        """Return (points, add), `add(rule, index)` records a violation."""
+        points = {}
+        if not self.runs:
+            def add(r, index):
+                points.setdefault(r, []).append(index)
+            return points, add
+
+        def add(r, index):
+            runs = points.get(r)
+            if runs is None:
+                points[r] = [[index, index]]
+            elif runs[-1][1] == index - 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+        return points, add
+
+    def _result(self, points):
+        if self.runs:
+            return dict((r, [tuple(run) for run in runs]) for r, runs in points.items())
+        return points
+
+def index_runs(indexes):
+    """
+    Return sorted indexes as runs of consecutive indexes [(start, end)],
+    `end` included.
+
+    >>> index_runs([1, 2, 3, 4, 7, 9, 10])
+    [(1, 4), (7, 7), (9, 10)]
+    """
+    runs = []
+    for i in indexes:
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return [tuple(run) for run in runs]
+
+def subgroup_size(data):
+    """
+    Return size of subgroups of 2D data, 1 for flat data.
+
+    Data is a list of lists or tuples, or any buffer with a `shape`
+    (NumPy array, 2D memoryview).
+
+    >>> subgroup_size([[1, 2, 3], [2, 3, 4]])
+    3
+    >>> subgroup_size(memoryview(array('d', [1, 2, 3, 4])).cast('B').cast('d', (2, 2)))
+    2
+    """
+    shape = getattr(data, 'shape', None)
+    if shape is not None:
+        return shape[1] if len(shape) == 2 else 1
+    if len(data) and isinstance(data[0], (list, tuple)):
+        return len(data[0])
+    return 1
+
+def _is_sorted(times):
+    if hasattr(times, 'shape'):
+        return bool((times[1:] >= times[:-1]).all())
+    return all(a <= b for a, b in zip(times, itertools.islice(times, 1, None)))
+
+def _bisect(times, t):
+    """Return index of the first of sorted `times` not before `t`."""
+    if hasattr(times, 'searchsorted'):
+        return int(times.searchsorted(t))
+    return bisect.bisect_left(times, t)
+
+def _bisect_runs(pairs, t):
+    """
+    Return index of the first run of flat (start, end) `pairs` starting
+    at or after index `t`, by binary search over the starts in place.
+    """
+    lo, hi = 0, len(pairs) // 2
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if pairs[2*mid] < t:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def _as_array(values):
+    """Return values as array('d')."""
+    if isinstance(values, array) and values.typecode == 'd':
+        return values
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    return array('d', values)
+
+def get_backend(data, backend=None):
+    """
+    Return `numpy_backend` module if it should be used for data, else None.
+
+    By default (`backend` None) NumPy is used when it is installed and the
+    data is array-like, lists stay with the pure Python implementation.
+    """
+    if backend == BACKEND_PYTHON:
+        return None
+    try:
+        from . import numpy_backend
+    except ImportError:
+        if backend == BACKEND_NUMPY:
+            raise
+        return None
+    if backend == BACKEND_NUMPY or numpy_backend.is_array(data):
+        return numpy_backend
+    return None
+
+
+class FrozenLimits(object):
+    """
+    Control limits fitted on Phase I (baseline) data.
+
+    Phase II data is scored against the limits with `score` without
+    recomputing them. Besides (center, LCL, UCL) it keeps the state needed
+    to prepare new points: subgroup size, the last baseline value, so the
+    first moving range of a new batch is taken from the baseline, and the
+    baseline mean and sigma for CUSUM charts, and the chart `params`.
+
+    p, np and u charts of lots of different sizes keep the baseline `bar`
+    (pbar, ubar) instead of limits: new lots are scored with the sizes
+    passed as `sizes`, each against the limits of its own size.
+
+    >>> limits = Spc([1, 2, 3, 3, 2, 1, 3, 2], CHART_X_MR_X).freeze()
+    >>> limits.score([2, 3, 9])
+    {'1 beyond 3*sigma': [2]}
+    >>> limits = Spc([3, 9, 52, 4], CHART_P, sizes=[50, 200, 1000, 80]).freeze()
+    >>> limits.score([6, 40], sizes=[50, 400])
+    {'1 beyond 3*sigma': [1]}
+    """
+
+    def __init__(self, chart_type, center, lcl, ucl, size=1, last=None, target=None, sigma=None,
+                 params=None, bar=None):
+        self.chart_type = chart_type
+        self.center = center
+        self.lcl = lcl
+        self.ucl = ucl
+        self.size = size
+        self.last = last
+        self.target = target
+        self.sigma = sigma
+        self.params = _chart_params(chart_type, params)
+        self.bar = bar
+
+    def _sizes(self, sizes):
+        if self.bar is None:
+            return self.size if sizes is None else sizes
+        if sizes is None:
+            raise ValueError("Chart %s was frozen with lot sizes, give the sizes of the new lots"
+                             % self.chart_type)
+        return sizes
+
+    def prepare(self, data, backend=None, sizes=None):
+        """Return `data` as plotted on the chart, one value per point."""
+        size = self._sizes(sizes)
+        nb = get_backend(data, backend)
+        pd = (STATS_FUNCS if nb is None else nb.STATS_FUNCS)[self.chart_type][1]
+        if self.chart_type == CHART_CUSUM:
+            return pd(data, self.size, target=self.target)[1:]
+        if self.chart_type == CHART_TABULAR_CUSUM:
+            if nb is not None:
+                return nb.tabular_cusum(data, self.target, self.sigma, **self.params)
+            return TabularCusum(target=self.target, sigma=self.sigma, **self.params).extend(data)
+        data2 = pd(data, size, **self.params)
+        if self.chart_type in (CHART_P, CHART_U):
+            return data2[1:]
+        if self.chart_type == CHART_X_MR_MR and len(data2) > 0 and self.last is not None:
+            data2[0] = abs(self.last - data[0])
+        return data2
+
+    def score(self, data, rules=RULES_BASIC, backend=None, runs=False, sizes=None):
+        """
+        Check Phase II `data` against the frozen limits in one pass.
+
+        Returns violations as {rule: [index]} with indexes into `data`, or
+        as {rule: [(start, end)]} runs of consecutive indexes with `runs`.
+        Each batch is checked on its own, runs do not continue from the
+        baseline or from previous batches. Array data is scored with the
+        NumPy backend, see `get_backend`. `sizes` are the sizes of the new
+        lots of charts frozen with lot sizes.
+        """
+        nb = get_backend(data, backend)
+        data2 = self.prepare(data, backend, sizes)
+        center, lcl, ucl = self.get_stats(sizes)
+        if nb is not None:
+            return nb.find_violating_points(data2, center, lcl, ucl, rules, runs=runs)
+        if lot_sizes(ucl):
+            engine = RuleEngine(0, None, None, rules, runs=runs)
+            centers = center if lot_sizes(center) else itertools.repeat(center)
+            return engine.feed_varying(data2, centers, lcl, ucl)
+        engine = RuleEngine(center, lcl, ucl, rules, runs=runs)
+        return engine.feed(data2)
+
+    def first_violations(self, data, rules=RULES_BASIC, stop_any=False, backend=None, sizes=None):
+        """
+        Return {rule: index} of the first violation of each rule in `data`,
+        stopping as soon as all rules (or with `stop_any` any rule) fired,
+        see `RuleEngine.first`. An empty dict means no violation.
+        """
+        nb = get_backend(data, backend)
+        data2 = self.prepare(data, backend, sizes)
+        center, lcl, ucl = self.get_stats(sizes)
+        if nb is not None:
+            return nb.first_violations(data2, center, lcl, ucl, rules, stop_any=stop_any)
+        if lot_sizes(ucl):
+            engine = RuleEngine(0, None, None, rules)
+            centers = center if lot_sizes(center) else itertools.repeat(center)
+            return engine.first_varying(data2, centers, lcl, ucl, stop_any=stop_any)
+        engine = RuleEngine(center, lcl, ucl, rules)
+        return engine.first(data2, stop_any=stop_any)
+
+    def get_stats(self, sizes=None):
+        """
+        Return the frozen limits as tuple: (center, LCL, UCL), for charts
+        frozen with lot sizes the limits of lots of `sizes`.
+        """
+        if self.bar is None:
+            return self.center, self.lcl, self.ucl
+        sizes = self._sizes(sizes)
+        limits = LOT_LIMITS[self.chart_type]
+        if lot_sizes(sizes):
+            return _lot_limits(limits, self.bar, sizes, False)
+        return limits(self.bar, sizes)
+
+
+class _LimitHistory(object):
+    """
+    Limits points of an `Spc` were added with, as (first index, center,
+    lcl, ucl) entries in array columns, 32 bytes per entry.
+
+    An entry is only added when the limits change. A limit which is None
+    (no limit) is kept as nan.
+    """
+    __slots__ = ('starts', 'centers', 'lcls', 'ucls')
+
+    def __init__(self, center, lcl, ucl):
+        self.starts = array('q')
+        self.centers, self.lcls, self.ucls = array('d'), array('d'), array('d')
+        self.append(0, center, lcl, ucl)
+
+    def append(self, start, center, lcl, ucl):
+        if self.starts and self[-1][1:] == (center, lcl, ucl):
+            return
+        nan = float('nan')
+        self.starts.append(start)
+        self.centers.append(center)
+        self.lcls.append(nan if lcl is None else lcl)
+        self.ucls.append(nan if ucl is None else ucl)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        l, u = self.lcls[i], self.ucls[i]
+        return self.starts[i], self.centers[i], None if l != l else l, None if u != u else u
+
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield self[i]
+
+    def ends(self, n):
+        """Return end index of the points of each entry, `n` points in all."""
+        return self.starts[1:].tolist() + [n]
+
 
 class Spc(object):
     """
@@ -338,6 +2118,25 @@ class Spc(object):
     :arguments:
       data
        user data as flat array
+      sizes
+       subgroup (sample) size, by default taken from the data; for p, np
+       and u charts a sequence gives the sample size of each lot and the
+       limits of each point, see `lot_sizes`; such charts take no new
+       points, freeze them and score new lots with their sizes instead
+      backend
+       BACKEND_PYTHON or BACKEND_NUMPY, by default NumPy is used for
+       array-like data when it is installed
+      workers
+       check rules of a long series in chunks on this many processes,
+       see `batch.find_violating_points_parallel`
+      times
+       sorted timestamps of the points (subgroups, lots), any comparable
+       values (numbers, datetimes, NumPy datetime64); violations can then
+       be selected by time range, see `index_range`
+      params
+       parameters of the chart as a dict, see `CHART_PARAMS`, e.g.
+       {'lam': 0.1, 'L': 2.7} for EWMA or {'k': 1, 'h': 4} for tabular
+       CUSUM; defaults are the module constants
 
     **Usage**
 
@@ -355,44 +2154,532 @@ class Spc(object):
     >>> s.get_chart()
     """
 
-    def __init__(self, data, chart_type, rules=RULES_BASIC, newdata=[], sizes=None):
-        self.orig_data = data
+    # tens of thousands of charts can be alive at once, keep them compact
+    __slots__ = ('orig_data', 'chart_type', 'params', 'rules', 'stats', 'size', 'center', 'lcl', 'ucl',
+                 'times', '_data', '_nb', '_workers', '_backend', '_limits', '_zones', '_points',
+                 '_results', '_runs', '_running', '_engine', '_times_buf')
+
+    def __init__(self, data, chart_type, rules=RULES_BASIC, newdata=[], sizes=None, backend=None,
+                 workers=None, times=None, params=None):
+        new_times = None
+        # newdata may be an array too, test its length rather than its truth
+        has_new = newdata is not None and len(newdata) > 0
+        if times is not None:
+            assert len(times) == len(data) + (len(newdata) if has_new else 0)
+            assert _is_sorted(times), "times are not sorted"
+            if has_new:
+                times, new_times = times[:len(data)], times[len(data):]
+        self.times = times
         self.chart_type = chart_type
+        self.params = _chart_params(chart_type, params)
+        # unknown rules raise now, not when the rules are checked
+        _unique_rules(rules)
         self.rules = rules
         self.stats = []
 
-        sf, pd = STATS_FUNCS[chart_type]
-        if sizes == None:
-            if isinstance(data[0], (list, tuple)):
-                size = len(data[0])
-            else:
-                size = 1
+        nb = get_backend(data, backend)
+        sf, pd = (STATS_FUNCS if nb is None else nb.STATS_FUNCS)[chart_type]
+        if isinstance(data, memoryview) and data.ndim == 2:
+            # rows of 2D memoryviews can't be indexed, without NumPy copy
+            # them, with it view them as an array (append and freeze too)
+            data = data.tolist() if nb is None else nb.np.asarray(data)
+        self.orig_data = data
+        if sizes is None:
+            size = subgroup_size(data)
         else:
             size = sizes
-        self.center, self.lcl, self.ucl = sf(data, size)
-        self._data = pd(data, size)
-
-        self.violating_points = self._find_violating_points()
-
-    def _find_violating_points(self, rules=[]):
-        if len(rules) > 0:
-            rs = rules
+        self.size = size
+        self.center, self.lcl, self.ucl = sf(data, size, **self.params)
+        # prepared points are kept unboxed, 8 bytes per point
+        prepared = pd(data, size, **self.params)
+        self._data = prepared if nb is not None else _as_array(prepared)
+        self._setup(nb, workers, backend)
+        if has_new:
+            self.extend(newdata, new_times)
+
+    @classmethod
+    def from_prepared(cls, data, chart_type, stats, prepared, rules=RULES_BASIC, size=1, backend=None):
+        """
+        Return Spc of data with limits (center, LCL, UCL) and prepared
+        points already computed, e.g. by `SpcPair`.
+        """
+        self = cls.__new__(cls)
+        self.times = None
+        self.orig_data = data
+        self.chart_type = chart_type
+        self.params = {}
+        # unknown rules raise now, not when the rules are checked
+        _unique_rules(rules)
+        self.rules = rules
+        self.stats = []
+        self.size = size
+        self.center, self.lcl, self.ucl = stats
+        nb = get_backend(data, backend)
+        self._data = prepared if nb is not None else _as_array(prepared)
+        self._setup(nb, None, backend)
+        return self
+
+    def _setup(self, nb, workers, backend):
+        self._nb = nb
+        self._workers = workers
+        self._backend = backend
+        # (first index, center, lcl, ucl) of points added with these limits
+        self._limits = None if lot_sizes(self.ucl) else _LimitHistory(self.center, self.lcl, self.ucl)
+        # rules are checked lazily, see get_violating_points; violations
+        # are kept as {rule: array('q') of indexes}, ordered rules per rule set;
+        # runs as {rule: array('q') of start, end pairs}, see get_violating_runs
+        self._zones = None
+        self._points = {}
+        self._results = {}
+        self._runs = {}
+        self._running = None
+        self._engine = None
+        # NumPy times grow in a buffer with spare room, see _extend_times
+        self._times_buf = None
+
+    @property
+    def violating_points(self):
+        return self.get_violating_points()
+
+    def _evaluate(self, rules):
+        """Check rules not checked yet, keep their violations in `_points`."""
+        missing = [r for r in _unique_rules(rules) if r not in self._points]
+        if not missing:
+            return
+        found = self._find(missing)
+        for r in missing:
+            self._points[r] = array('q', found.get(r, ()))
+
+    def _find(self, rules, runs=False):
+        """Return violations of all points, as runs with `runs`, see `RuleEngine`."""
+        varying = self._varying()
+        if varying and self._nb is None:
+            return self._replay_varying(rules, runs)
+        if not varying and (len(self._limits) > 1 or (self._nb is None and not self._workers)):
+            return self._replay(rules, runs)
+        if self._workers and not varying:
+            from .batch import find_violating_points_parallel
+            found = find_violating_points_parallel(
+                self._data, self.center, self.lcl, self.ucl, rules, warmup=1,
+                workers=self._workers, backend=self._backend)
+            if runs:
+                # chunks overlap by the rule windows, they report indexes
+                index = index_runs if self._nb is None else self._nb.index_runs
+                found = dict((r, index(idx)) for r, idx in found.items())
+            return found
+        if self._zones is None:
+            self._zones = self._nb.zones(self._data, self.center, self.lcl, self.ucl)
+        return self._nb.find_violating_points(
+            self._data, self.center, self.lcl, self.ucl, rules, warmup=1, z=self._zones, runs=runs)
+
+    def _replay(self, rules, runs=False):
+        """
+        Run rules over all points with the limits they were added with.
+
+        Zones are computed on the first call and reused for other rules.
+        Detectors of the rules are kept for points added later, unless
+        they record `runs`.
+        """
+        c, l, u = self._limits[0][1:]
+        engine = RuleEngine(c, l, u, rules, warmup=1, runs=runs)
+        ends = self._limits.ends(len(self._data))
+        zones = array('b') if self._zones is None else None
+        found = {}
+        for (start, c, l, u), end in zip(self._limits, ends):
+            engine.set_limits(c, l, u)
+            data = self._data if len(self._limits) == 1 else self._data[start:end]
+            if zones is not None:
+                zones.extend(engine.classify(data))
+            z = self._zones if zones is None else zones
+            if len(self._limits) > 1:
+                z = z[start:end]
+            for r, idx in engine.feed(data, z).items():
+                got = found.setdefault(r, [])
+                if runs and got and got[-1][1] == idx[0][0] - 1:
+                    # the run goes on over the change of limits
+                    got[-1] = (got[-1][0], idx[0][1])
+                    idx = idx[1:]
+                got.extend(idx)
+        if zones is not None:
+            self._zones = zones
+        if not runs:
+            self._keep_engine(engine)
+        return found
+
+    def _keep_engine(self, engine):
+        """Keep detectors of `engine` to check points added later."""
+        if self._engine is None:
+            self._engine = engine
         else:
-            rs = self.rules
+            self._engine.detectors.extend(engine.detectors)
+
+    def _varying(self):
+        """Return True if limits have a value per point (lot sizes, EWMA)."""
+        return lot_sizes(self.ucl)
+
+    def _replay_varying(self, rules, runs=False):
+        """Run rules over all points, each with its own limits, see `_replay`."""
+        engine = RuleEngine(0, None, None, rules, warmup=1, runs=runs)
+        center = self.center if lot_sizes(self.center) else itertools.repeat(self.center)
+        found = engine.feed_varying(self._data, center, self.lcl, self.ucl)
+        if not runs:
+            self._keep_engine(engine)
+        return found
+
+    def append(self, value, time=None):
+        """
+        Add one point (or subgroup) to the chart.
+
+        Limits are updated from running sums in O(1) and only the new point
+        is checked against them. Returns new violations as {rule: [index]}.
+        Charts with `times` need the time of the point.
+        """
+        return self.extend([value], None if time is None else [time])
+
+    def extend(self, values, times=None):
+        """
+        Add points (or subgroups) to the chart, see `append`.
+
+        All new points are checked against the limits of the whole data
+        including them; points added earlier are not checked again.
+        Rules checked before with `get_violating_points` are kept up to date.
+        """
+        if self.times is not None:
+            values = list(values)
+            assert times is not None and len(times) == len(values), "times of new points are needed"
+            if len(times):
+                assert _is_sorted(times) and (not len(self.times) or self.times[-1] <= times[0]), \
+                    "times are not sorted"
+                self._extend_times(times)
+        else:
+            assert times is None, "Spc has no times"
+        if self._running is None:
+            if lot_sizes(self.size):
+                raise ValueError("Appending to charts of lots of different sizes, "
+                                 "freeze the chart and score new lots with their sizes")
+            if self.chart_type not in RUNNING_STATS:
+                raise NotImplementedError("Chart %s does not support appending data" % self.chart_type)
+            self._running = RUNNING_STATS[self.chart_type](self.size, **self.params)
+            self._running.fit(self.orig_data)
+            if self.chart_type in (CHART_X_BAR_R_X, CHART_X_BAR_R_R, CHART_X_BAR_S_X, CHART_X_BAR_S_S):
+                self.orig_data = [list(row) for row in self.orig_data]
+            else:
+                self.orig_data = _as_array(self.orig_data)
+            # prepared data may be shared with other charts, see SpcProfile
+            self._data = array('d', self._data) if isinstance(self._data, array) else _as_array(self._data)
+            if self._varying():
+                self.lcl, self.ucl = _as_array(self.lcl), _as_array(self.ucl)
+        self._evaluate(self.rules)
+        if self._zones is not None and not isinstance(self._zones, array):
+            self._zones = array('b', self._zones.tolist())
+        # rules checked by the NumPy backend or in parallel have no detectors yet
+        if self._engine is None:
+            if self._varying():
+                self._engine = RuleEngine(0, None, None, [], warmup=1)
+            else:
+                self._engine = RuleEngine(self.center, self.lcl, self.ucl, [], warmup=1)
+            self._engine.index = len(self._data)
+        engine_rules = [r for r, d in self._engine.detectors]
+        lacking = [r for r in self._points if r not in engine_rules]
+        if lacking:
+            (self._replay_varying if self._varying() else self._replay)(lacking)
+
+        add = self._running.add
+        new = []
+        if self._varying():
+            # limits of each new point from the running state, see Ewma
+            start = len(self._data)
+            for v in values:
+                self.orig_data.append(v)
+                new.append(add(v))
+                c, l, u = self._running.get_stats()
+                self.lcl.append(l)
+                self.ucl.append(u)
+            self._data.extend(new)
+            self._zones = None
+            points = self._engine.feed_varying(new, itertools.repeat(self.center),
+                                               self.lcl[start:], self.ucl[start:])
+            for r, idx in points.items():
+                self._points[r].extend(idx)
+            self._results = {}
+            self._runs = {}
+            return dict((r, points[r]) for r in _order_violations(points, self.rules))
+        for v in values:
+            self.orig_data.append(v)
+            new.append(add(v))
+        if not new:
+            return {}
+        self.center, self.lcl, self.ucl = self._running.get_stats()
+        self._limits.append(len(self._data), self.center, self.lcl, self.ucl)
+        self._data.extend(new)
+        self._engine.set_limits(self.center, self.lcl, self.ucl)
+        zones = self._engine.classify(new)
+        if self._zones is not None:
+            self._zones.extend(zones)
+        points = self._engine.feed(new, zones)
+        for r, idx in points.items():
+            self._points[r].extend(idx)
+        self._results = {}
+        self._runs = {}
+        return dict((r, points[r]) for r in _order_violations(points, self.rules))
+
+    def _extend_times(self, times):
+        """
+        Append times of new points in amortized O(1) per point: a list
+        grows in place, a NumPy array is a view of a buffer doubled when
+        full, so it stays searchable with `searchsorted`.
+        """
+        if not hasattr(self.times, 'searchsorted'):
+            if not isinstance(self.times, list):
+                # tuples and other sequences, converted on the first extend only
+                self.times = list(self.times)
+            self.times.extend(times)
+            return
+        import numpy as np
+        n, k = len(self.times), len(times)
+        buf = self._times_buf
+        if buf is None or len(buf) < n + k:
+            buf = np.empty(max(2 * n, n + k), dtype=self.times.dtype)
+            buf[:n] = self.times
+            self._times_buf = buf
+        buf[n:n + k] = times
+        self.times = buf[:n + k]
+
+    def freeze(self):
+        """Return `FrozenLimits` with current limits to score new data."""
+        if self.chart_type == CHART_EWMA:
+            raise ValueError("Chart %s has limits per point, which cannot be frozen" % self.chart_type)
+        if self._varying():
+            # lots of different sizes: keep pbar (ubar), new lots come with their sizes
+            bar = self.center if not lot_sizes(self.center) else \
+                float(sum(self.orig_data)) / sum(self.size)
+            return FrozenLimits(self.chart_type, bar, None, None, size=None, bar=bar)
+        target = sigma = None
+        if self.chart_type == CHART_CUSUM:
+            target = _mean(self.orig_data)
+        elif self.chart_type == CHART_TABULAR_CUSUM:
+            target, sigma = _smoothing_params(self.orig_data)
+        return FrozenLimits(self.chart_type, self.center, self.lcl, self.ucl,
+                            size=self.size, last=self.orig_data[-1],
+                            target=target, sigma=sigma, params=self.params)
+
+    def get_violating_points(self, rules=[], start=None, end=None):
+        """
+        Return points that violates rules of control chart.
+
+        By default the rules given to `Spc` are checked. Rules are checked
+        on the first request only and the result is kept for the rule set;
+        other rule sets reuse the zones of the points and violations of
+        rules already checked. The dict is built on each call from compact
+        index arrays.
+
+        With `start` and/or `end` only violations of points with times
+        start <= time < end are returned, see `index_range`.
+        """
+        return dict((r, idx.tolist()) for r, idx in self._select(rules, start, end))
+
+    def first_violations(self, rules=[], stop_any=False):
+        """
+        Return {rule: index} of the first violation of each rule, or with
+        `stop_any` only of the rules violated at the first violating point.
+        An empty dict means the chart has no violation.
+
+        Rules already checked are answered from their violations, other
+        rules are checked only up to their first violation, see
+        `RuleEngine.first`; nothing is kept for `get_violating_points`.
+        """
+        rules = tuple(rules or self.rules)
+        rs = _unique_rules(rules)
+        if all(r in self._points for r in rs):
+            found = dict((r, self._points[r][0]) for r in _order_violations(self._points, rules))
+            if stop_any and found:
+                first = min(found.values())
+                return dict((r, i) for r, i in found.items() if i == first)
+            return found
+        if self._nb is not None and (self._limits is None or len(self._limits) == 1):
+            return self._nb.first_violations(self._data, self.center, self.lcl, self.ucl, rs,
+                                             warmup=1, stop_any=stop_any)
+        c, l, u = (0, None, None) if self._varying() else self._limits[0][1:]
+        engine = RuleEngine(c, l, u, rs, warmup=1)
+        if self._varying():
+            center = self.center if lot_sizes(self.center) else itertools.repeat(self.center)
+            return engine.first_varying(self._data, center, self.lcl, self.ucl, stop_any=stop_any)
+        found = {}
+        ends = self._limits.ends(len(self._data))
+        for (start, c, l, u), end in zip(self._limits, ends):
+            engine.set_limits(c, l, u)
+            data = self._data if len(self._limits) == 1 else memoryview(self._data)[start:end]
+            found.update(engine.first(data, stop_any=stop_any))
+            if not engine.detectors or (stop_any and found):
+                break
+        return found
+
+    def get_violating_runs(self, rules=[], start=None, end=None):
+        """
+        Return violations as runs of consecutive points
+        {rule: [(start, end), ...]}, `end` included, see `index_runs`.
+
+        Long out-of-control stretches take one pair each instead of an
+        index per point: rules are checked with the engine recording runs
+        and only the runs are kept, unless their indexes are kept already.
+        `start` and `end` select by time as in `get_violating_points`, a
+        run is cut at the range borders.
+        """
+        rules = tuple(rules or self.rules)
+        rs = _unique_rules(rules)
+        missing = [r for r in rs if r not in self._runs and r not in self._points]
+        found = self._find(missing, runs=True) if missing else {}
+        index = index_runs if self._nb is None else self._nb.index_runs
+        for r in rs:
+            if r not in self._runs:
+                pairs = found.get(r, ()) if r in missing else index(self._points[r])
+                self._runs[r] = array('q', itertools.chain.from_iterable(pairs))
+        first, last = (0, len(self._data)) if start is None and end is None else self.index_range(start, end)
+        runs = {}
+        for r in rs:
+            pairs = self._runs[r]
+            # first run ending at or after `first` up to the first starting at `last`
+            i, j = _bisect_runs(pairs, first), _bisect_runs(pairs, last)
+            if i > 0 and pairs[2*i - 1] >= first and first < last:
+                i -= 1
+            if i < j:
+                runs[r] = [(max(pairs[2*k], first), min(pairs[2*k + 1], last - 1)) for k in range(i, j)]
+        # ordered by the first violating point, as get_violating_points
+        firsts = dict((r, [pairs[0][0]]) for r, pairs in runs.items())
+        return dict((r, runs[r]) for r in _order_violations(firsts, rules))
+
+    def _select(self, rules, start, end):
+        """Return [(rule, index array)] of violations in the time range."""
+        rules = tuple(rules or self.rules)
+        order = self._results.get(rules)
+        if order is None:
+            self._evaluate(rules)
+            order = self._results[rules] = _order_violations(self._points, rules)
+        if start is None and end is None:
+            return [(r, self._points[r]) for r in order]
+        first, last = self.index_range(start, end)
         points = {}
-        for i in range(len(self._data)):
-            for r in rs:
-                func, points_num = RULES_FUNCS[r]
-                if func == None or i <= points_num - 1:
-                    continue
-                if func(self._data[i-points_num+1:i+1], self.center, self.lcl, self.ucl):
-                    points.setdefault(r, []).append(i)
-        return points
+        for r in order:
+            # indexes are sorted, slice them by binary search too
+            idx = self._points[r]
+            i, j = bisect.bisect_left(idx, first), bisect.bisect_left(idx, last)
+            if i < j:
+                points[r] = idx[i:j]
+        return [(r, points[r]) for r in _order_violations(points, rules)]
+
+    def get_violating_times(self, rules=[], start=None, end=None):
+        """Return times of points that violate rules, see `get_violating_points`."""
+        shift = self._time_shift()
+        return dict((r, [self.times[i - shift] for i in idx])
+                    for r, idx in self.get_violating_points(rules, start, end).items())
+
+    def _time_shift(self):
+        assert self.times is not None, "Spc has no times"
+        # point i has time i - 1 on charts with a placeholder
+        return 1 if self.chart_type in PLACEHOLDER_CHARTS else 0
+
+    def index_range(self, start=None, end=None):
+        """
+        Return (first, end) indexes of the points with times
+        start <= time < end, found by binary search in `times`.
+        """
+        shift = self._time_shift()
+        first = 0 if start is None else _bisect(self.times, start) + shift
+        last = len(self._data) if end is None else _bisect(self.times, end) + shift
+        return first, max(first, last)
+
+    def get_stats(self):
+        """
+        Return basic statistics about data as tuple: (center, LCL, UCL).
+
+        With a sample size per lot (`sizes` a sequence) LCL and UCL have a
+        value per point, and so does the center of np charts.
+        """
+        return self.center, self.lcl, self.ucl
+
+
+class SpcPair(object):
+    """
+    Location and dispersion charts of the same data (Xbar R, Xbar S or
+    X mR) computed together.
+
+    Subgroup means and ranges (standard deviations, moving ranges) are
+    computed once in a single pass and shared by both charts, `location`
+    and `dispersion` are `Spc` objects of the two chart types.
+
+    >>> pair = SpcPair([1, 2, 3, 3, 2, 1, 3, 8], PAIR_X_MR)
+    >>> pair.location.get_violating_points()
+    {'1 beyond 3*sigma': [7]}
+    >>> pair.dispersion.get_stats()
+    (1.5714285714285714, 0, 5.750759878419453)
+    """
+
+    __slots__ = ('pair', 'location', 'dispersion')
+
+    def __init__(self, data, pair, rules=RULES_BASIC, sizes=None, backend=None):
+        self.pair = pair
+        nb = get_backend(data, backend)
+        if nb is None and isinstance(data, memoryview) and data.ndim == 2:
+            data = data.tolist()
+        size = subgroup_size(data) if sizes is None else sizes
+        func = (PAIR_FUNCS if nb is None else nb.PAIR_FUNCS)[pair]
+        (loc_stats, loc_data), (disp_stats, disp_data) = func(data, size)
+        loc_type, disp_type = PAIRED_CHARTS[pair]
+        self.location = Spc.from_prepared(data, loc_type, loc_stats, loc_data, rules, size, backend)
+        self.dispersion = Spc.from_prepared(data, disp_type, disp_stats, disp_data, rules, size, backend)
+
+    def get_stats(self):
+        """Return limits of both charts: ((center, LCL, UCL), (center, LCL, UCL))."""
+        return self.location.get_stats(), self.dispersion.get_stats()
 
     def get_violating_points(self, rules=[]):
-        """Return points that violates rules of control chart"""
-        return self.violating_points
+        """Return violations of both charts: (location, dispersion)."""
+        return self.location.get_violating_points(rules), self.dispersion.get_violating_points(rules)
+
+
+class SpcProfile(object):
+    """
+    All charts of the data at once, for individual values X mR - X,
+    X mR - mR, CUSUM and tabular CUSUM, for subgroups the Xbar R and
+    Xbar S charts.
+
+    Intermediates (means, ranges, standard deviations, moving ranges)
+    are computed once and shared by the charts, `charts` maps chart type
+    to `Spc`.
+
+    >>> profile = SpcProfile([1, 2, 3, 3, 2, 1, 3, 8])
+    >>> list(profile.charts)
+    ['X mR - X', 'X mR - mR', 'CUSUM', 'tabular CUSUM']
+    >>> profile[CHART_X_MR_X].get_violating_points()
+    {'1 beyond 3*sigma': [7]}
+    """
+
+    __slots__ = ('size', 'charts')
+
+    def __init__(self, data, rules=RULES_BASIC, sizes=None, backend=None):
+        nb = get_backend(data, backend)
+        if nb is None and isinstance(data, memoryview) and data.ndim == 2:
+            data = data.tolist()
+        self.size = size = subgroup_size(data) if sizes is None else sizes
+        funcs = (PROFILE_FUNCS if nb is None else nb.PROFILE_FUNCS)
+        self.charts = {}
+        shared = {}
+        for chart_type, (stats, prepared) in funcs[size > 1](data, size).items():
+            if nb is None:
+                # Xbar R - X and Xbar S - X keep one array of means
+                if id(prepared) not in shared:
+                    shared[id(prepared)] = _as_array(prepared)
+                prepared = shared[id(prepared)]
+            self.charts[chart_type] = Spc.from_prepared(data, chart_type, stats, prepared,
+                                                        rules, size, backend)
+
+    def __getitem__(self, chart_type):
+        return self.charts[chart_type]
 
     def get_stats(self):
-        """Return basic statistics about data as tuple: (center, LCL, UCL)."""
-        return self.center, self.lcl, self.ucl
+        """Return limits of all charts as {chart: (center, LCL, UCL)}."""
+        return dict((ct, spc.get_stats()) for ct, spc in self.charts.items())
+
+    def get_violating_points(self, rules=[]):
+        """Return violations of all charts as {chart: {rule: [index]}}."""
+        return dict((ct, spc.get_violating_points(rules)) for ct, spc in self.charts.items())
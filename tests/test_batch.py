@@ -0,0 +1,249 @@
+"""Tests for batch evaluation of many series."""
+
+import numpy as np
+import pytest
+
+from spcchart.batch import (
+    evaluate_batch,
+    evaluate_many,
+    first_violations,
+    find_violating_points_parallel,
+    rules_halo,
+    BatchResult,
+)
+from spcchart.spc import (
+    Spc,
+    BACKEND_PYTHON,
+    BACKEND_NUMPY,
+    CHART_X_MR_X,
+    CHART_X_MR_MR,
+    CHART_X_BAR_R_X,
+    CHART_X_BAR_R_R,
+    CHART_X_BAR_S_X,
+    CHART_X_BAR_S_S,
+    CHART_P,
+    CHART_NP,
+    CHART_C,
+    CHART_U,
+    CHART_CUSUM,
+    CHART_TABULAR_CUSUM,
+    CHART_EWMA,
+    RULES_ALL,
+    RULES_9_ON_ONE_SIDE,
+    RuleEngine,
+    get_stats_x_mr_x,
+    register_rule,
+)
+
+
+RNG = np.random.default_rng(5)
+SERIES = [[float(v) for v in RNG.normal(10, 2, n)] + [25.0] for n in (20, 45, 8, 60)]
+SUBGROUPS = [[[float(v) for v in row] for row in RNG.normal(10, 2, (n, 4))] for n in (12, 30, 9)]
+COUNTS = [[int(v) for v in RNG.poisson(6, n)] + [30] for n in (25, 40, 15)]
+
+CASES = [
+    (CHART_X_MR_X, SERIES, None),
+    (CHART_X_MR_MR, SERIES, None),
+    (CHART_X_BAR_R_X, SUBGROUPS, None),
+    (CHART_X_BAR_R_R, SUBGROUPS, None),
+    (CHART_X_BAR_S_X, SUBGROUPS, None),
+    (CHART_X_BAR_S_S, SUBGROUPS, None),
+    (CHART_P, COUNTS, 50),
+    (CHART_NP, COUNTS, 50),
+    (CHART_C, COUNTS, None),
+    (CHART_U, COUNTS, 10),
+]
+
+
+def _check(result, series, chart_type, sizes, rules):
+    assert isinstance(result, BatchResult)
+    assert len(result) == len(series)
+    for i, data in enumerate(series):
+        s = Spc(data, chart_type, rules=rules, sizes=sizes)
+        assert result.get_stats(i) == pytest.approx(s.get_stats())
+        assert result.get_violating_points(i) == s.get_violating_points()
+
+
+class TestEvaluateBatch:
+    """Tests for evaluate_batch against one Spc per series."""
+
+    @pytest.mark.parametrize("chart_type, series, sizes", CASES)
+    def test_python_matches_spc(self, chart_type, series, sizes):
+        """Test the pure Python loop gives the same result as Spc."""
+        result = evaluate_batch(series, chart_type=chart_type, rules=RULES_ALL,
+                                sizes=sizes, backend=BACKEND_PYTHON)
+        _check(result, series, chart_type, sizes, RULES_ALL)
+
+    @pytest.mark.parametrize("chart_type, series, sizes", CASES)
+    def test_numpy_matches_spc(self, chart_type, series, sizes):
+        """Test the vectorized evaluation gives the same result as Spc."""
+        result = evaluate_batch(series, chart_type=chart_type, rules=RULES_ALL,
+                                sizes=sizes, backend=BACKEND_NUMPY)
+        _check(result, series, chart_type, sizes, RULES_ALL)
+
+    def test_offsets_input(self):
+        """Test flat values with offsets."""
+        values = np.concatenate([np.array(s) for s in SERIES])
+        offsets = np.cumsum([0] + [len(s) for s in SERIES])
+        result = evaluate_batch(values, offsets)
+
+        _check(result, SERIES, CHART_X_MR_X, None, ["1 beyond 3*sigma", "7 on one side"])
+        assert result.point.dtype == np.int64
+
+    def test_2d_input(self):
+        """Test every row of a 2D array is a series."""
+        values = RNG.normal(0, 1, (6, 30))
+        result = evaluate_batch(values)
+
+        _check(result, [list(row) for row in values], CHART_X_MR_X, None,
+               ["1 beyond 3*sigma", "7 on one side"])
+
+    def test_compact_arrays(self):
+        """Test violations are returned as parallel arrays sorted by series."""
+        result = evaluate_batch([[1, 2, 3, 3, 2, 1, 3, 8], [1, 2, 1, 2, 1, 2]],
+                                backend=BACKEND_PYTHON)
+
+        assert list(result.series) == [0]
+        assert list(result.rule) == [0]
+        assert list(result.point) == [7]
+        assert result.get_violating_points(1) == {}
+
+    def test_fallback_chart(self):
+        """Test charts without vectorized stats are evaluated series by series."""
+        series = [s[:-1] for s in SERIES]
+        result = evaluate_batch(series, chart_type=CHART_CUSUM, rules=["7 on one side"],
+                                backend=BACKEND_NUMPY)
+
+        assert np.isnan(result.ucl).all()
+        for i, data in enumerate(series):
+            s = Spc(data, CHART_CUSUM, rules=["7 on one side"])
+            assert result.get_violating_points(i) == s.get_violating_points()
+
+
+class TestFirstViolations:
+    """Tests for the first violations of every series."""
+
+    @pytest.mark.parametrize("backend", [BACKEND_PYTHON, BACKEND_NUMPY])
+    @pytest.mark.parametrize("stop_any", [False, True])
+    def test_matches_spc(self, backend, stop_any):
+        """Test first violations per series equal those of Spc."""
+        result = first_violations(SERIES, rules=RULES_ALL, stop_any=stop_any, backend=backend)
+
+        assert len(result) == len(SERIES)
+        for i, data in enumerate(SERIES):
+            first = Spc(data, CHART_X_MR_X, rules=RULES_ALL).first_violations(stop_any=stop_any)
+            assert result.get_violating_points(i) == dict((r, [p]) for r, p in first.items())
+
+    @pytest.mark.parametrize("chart_type", [CHART_CUSUM, CHART_TABULAR_CUSUM])
+    @pytest.mark.parametrize("stop_any", [False, True])
+    def test_cusum_numpy(self, chart_type, stop_any):
+        """Test charts without vectorized statistics take NumPy input."""
+        series = [np.array(s) for s in SERIES]
+        result = first_violations(series, chart_type=chart_type, rules=RULES_ALL,
+                                  stop_any=stop_any, backend=BACKEND_NUMPY)
+
+        assert len(result) == len(SERIES)
+        for i, data in enumerate(SERIES):
+            first = Spc(data, chart_type, rules=RULES_ALL).first_violations(stop_any=stop_any)
+            assert result.get_violating_points(i) == dict((r, [p]) for r, p in first.items())
+
+
+class TestUnknownRules:
+    """Tests for rules which are not known."""
+
+    @pytest.mark.parametrize("backend", [BACKEND_PYTHON, BACKEND_NUMPY])
+    def test_unknown_rule_raises(self, backend):
+        with pytest.raises(KeyError):
+            evaluate_batch(SERIES, rules=["1 beyond 3 sigma"], backend=backend)
+        with pytest.raises(KeyError):
+            first_violations(SERIES, rules=["1 beyond 3 sigma"], backend=backend)
+        with pytest.raises(KeyError):
+            evaluate_many(SERIES, rules=["1 beyond 3 sigma"], workers=2, backend=backend)
+
+
+class TestEwmaRefused:
+    """Tests for charts with limits per point."""
+
+    @pytest.mark.parametrize("backend", [BACKEND_PYTHON, BACKEND_NUMPY])
+    def test_ewma_raises(self, backend):
+        """Test EWMA is refused up front, its limits differ per point."""
+        series = [np.array(s) for s in SERIES] if backend == BACKEND_NUMPY else SERIES
+        with pytest.raises(ValueError, match=CHART_EWMA):
+            evaluate_batch(series, chart_type=CHART_EWMA, backend=backend)
+        with pytest.raises(ValueError, match=CHART_EWMA):
+            first_violations(series, chart_type=CHART_EWMA, backend=backend)
+        with pytest.raises(ValueError, match=CHART_EWMA):
+            evaluate_many(series, chart_type=CHART_EWMA, workers=2, backend=backend)
+
+
+class TestEvaluateMany:
+    """Tests for evaluate_many on a process pool."""
+
+    @pytest.mark.parametrize("backend", [BACKEND_PYTHON, BACKEND_NUMPY])
+    def test_matches_batch(self, backend):
+        """Test the pool gives the same arrays as evaluate_batch."""
+        expected = evaluate_batch(SERIES, rules=RULES_ALL, backend=backend)
+        result = evaluate_many(SERIES, rules=RULES_ALL, workers=2, backend=backend)
+
+        assert list(result.center) == list(expected.center)
+        assert list(result.series) == list(expected.series)
+        assert list(result.rule) == list(expected.rule)
+        assert list(result.point) == list(expected.point)
+
+    def test_custom_rules(self):
+        """Test custom rules are checked by the workers."""
+        rules = RULES_ALL + [register_rule("3 of 4 beyond 0.5 sigma")]
+        expected = evaluate_batch(SERIES, rules=rules, backend=BACKEND_PYTHON)
+        result = evaluate_many(SERIES, rules=rules, workers=2, backend=BACKEND_PYTHON)
+
+        assert list(result.rule) == list(expected.rule)
+        assert list(result.point) == list(expected.point)
+        assert len(RULES_ALL) in list(result.rule)
+
+    def test_subgroups(self):
+        """Test subgrouped series are sent to the workers."""
+        expected = evaluate_batch(SUBGROUPS, chart_type=CHART_X_BAR_R_X, backend=BACKEND_PYTHON)
+        result = evaluate_many(SUBGROUPS, chart_type=CHART_X_BAR_R_X, workers=2,
+                               backend=BACKEND_PYTHON)
+
+        assert list(result.ucl) == list(expected.ucl)
+        for i in range(len(SUBGROUPS)):
+            assert result.get_violating_points(i) == expected.get_violating_points(i)
+
+    def test_single_worker(self):
+        """Test one worker runs in the calling process."""
+        result = evaluate_many(SERIES, workers=1)
+
+        assert result.get_violating_points(0) == Spc(SERIES[0], CHART_X_MR_X).get_violating_points()
+
+
+class TestParallelRules:
+    """Tests for chunk parallel rule checks of one long series."""
+
+    RULES = RULES_ALL + [RULES_9_ON_ONE_SIDE]
+    DATA = [round(float(v), 1) for v in RNG.normal(0, 1, 20000)]
+
+    def test_halo(self):
+        """Test the halo covers the longest rule window."""
+        assert rules_halo(self.RULES) == 14
+        assert rules_halo(["1 beyond 3*sigma"]) == 0
+
+    @pytest.mark.parametrize("backend", [BACKEND_PYTHON, BACKEND_NUMPY])
+    @pytest.mark.parametrize("workers", [2, 7])
+    def test_matches_serial(self, backend, workers):
+        """Test chunked result is identical to the serial engine."""
+        center, lcl, ucl = get_stats_x_mr_x(self.DATA, 1)
+        expected = RuleEngine(center, lcl, ucl, self.RULES, warmup=1).feed(self.DATA)
+        result = find_violating_points_parallel(self.DATA, center, lcl, ucl, self.RULES,
+                                                warmup=1, workers=workers, backend=backend)
+
+        assert result == expected
+        assert list(result) == list(expected)
+
+    def test_spc_workers(self):
+        """Test Spc checks rules in chunks when given workers."""
+        expected = Spc(self.DATA, CHART_X_MR_X, rules=self.RULES)
+        result = Spc(self.DATA, CHART_X_MR_X, rules=self.RULES, workers=3)
+
+        assert result.get_violating_points() == expected.get_violating_points()
+        assert result.append(50) == {"1 beyond 3*sigma": [len(self.DATA)]}
@@ -0,0 +1,350 @@
+"""Tests for the NumPy backend against the pure Python implementation."""
+
+from array import array
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from spcchart import spc
+from spcchart import numpy_backend
+from spcchart.spc import (
+    Spc,
+    RuleEngine,
+    get_backend,
+    BACKEND_PYTHON,
+    BACKEND_NUMPY,
+    CHART_X_MR_X,
+    CHART_X_BAR_R_X,
+    RULES_ALL,
+    RULES_9_ON_ONE_SIDE,
+)
+
+
+RNG = np.random.default_rng(11)
+VALUES = [float(v) for v in RNG.normal(10, 2, 300)]
+SUBGROUPS = [[float(v) for v in row] for row in RNG.normal(10, 2, (60, 5))]
+COUNTS = [int(v) for v in RNG.poisson(6, 200)]
+
+CASES = [
+    (spc.CHART_X_BAR_R_X, SUBGROUPS, 5),
+    (spc.CHART_X_BAR_R_R, SUBGROUPS, 5),
+    (spc.CHART_X_BAR_S_X, SUBGROUPS, 5),
+    (spc.CHART_X_BAR_S_S, SUBGROUPS, 5),
+    (spc.CHART_X_MR_X, VALUES, 1),
+    (spc.CHART_X_MR_MR, VALUES, 1),
+    (spc.CHART_P, COUNTS, 50),
+    (spc.CHART_NP, COUNTS, 50),
+    (spc.CHART_C, COUNTS, 1),
+    (spc.CHART_U, COUNTS, 10),
+    (spc.CHART_CUSUM, VALUES, 1),
+    (spc.CHART_TABULAR_CUSUM, VALUES, 1),
+]
+
+
+class TestStatsFuncs:
+    """Tests for NumPy get_stats_* and prepare_data_* functions."""
+
+    def test_same_charts(self):
+        """Test the backend covers every chart of STATS_FUNCS."""
+        assert set(numpy_backend.STATS_FUNCS) == set(spc.STATS_FUNCS)
+
+    @pytest.mark.parametrize("chart_type, data, size", CASES)
+    def test_matches_reference(self, chart_type, data, size):
+        """Test limits and prepared data match the pure Python functions."""
+        sf, pd = spc.STATS_FUNCS[chart_type]
+        nsf, npd = numpy_backend.STATS_FUNCS[chart_type]
+        expected = sf(data, size)
+        result = nsf(np.array(data), size)
+
+        assert [r is None for r in result] == [e is None for e in expected]
+        assert [r for r in result if r is not None] == pytest.approx(
+            [e for e in expected if e is not None])
+        assert list(npd(np.array(data), size)) == pytest.approx(pd(data, size))
+
+    def test_tabular_cusum(self):
+        """Test vectorized tabular CUSUM matches the streaming one."""
+        expected = spc.TabularCusum(target=10, sigma=2).extend(VALUES)
+        result = numpy_backend.tabular_cusum(VALUES, 10, 2)
+
+        assert list(result) == pytest.approx(expected)
+
+    def test_tabular_cusum_params(self):
+        """Test k and h of the chart reach the vectorized tabular CUSUM."""
+        params = {"k": 0.25, "h": 4}
+        expected = Spc(VALUES, spc.CHART_TABULAR_CUSUM, rules=RULES_ALL, params=params)
+        result = Spc(np.array(VALUES), spc.CHART_TABULAR_CUSUM, rules=RULES_ALL, params=params)
+        limits = expected.freeze()
+
+        assert result.get_stats() == pytest.approx(expected.get_stats())
+        assert list(result._data) == pytest.approx(list(expected._data))
+        assert result.get_violating_points() == expected.get_violating_points()
+        assert limits.score(np.array(VALUES), RULES_ALL) == limits.score(VALUES, RULES_ALL)
+
+
+class TestRules:
+    """Tests for vectorized rule evaluation."""
+
+    @pytest.mark.parametrize("data", [
+        VALUES,
+        [float(v) for v in RNG.integers(0, 6, 3000)],
+        [5.0] * 10 + [15.0] * 10 + [0.0, 20.0] * 10,
+    ])
+    def test_matches_engine(self, data):
+        """Test violations match RuleEngine including the key order."""
+        rules = RULES_ALL + [RULES_9_ON_ONE_SIDE]
+        center, lcl, ucl = spc.get_stats_x_mr_x(data, 1)
+        expected = RuleEngine(center, lcl, ucl, rules, warmup=1).feed(data)
+        result = numpy_backend.find_violating_points(
+            np.array(data), center, lcl, ucl, rules, warmup=1)
+
+        assert result == expected
+        assert list(result) == list(expected)
+
+    def test_zones(self):
+        """Test zones match RuleEngine.zone."""
+        engine = RuleEngine(0, -3, 3, [])
+        data = [-4, -3, -2.5, -1.5, -0.5, 0, 0.5, 1.5, 2.5, 3, 4]
+
+        assert list(numpy_backend.zones(data, 0, -3, 3)) == [engine.zone(x) for x in data]
+
+
+class TestSpcBackend:
+    """Tests for backend selection in Spc."""
+
+    def test_backend_selection(self):
+        """Test NumPy is picked for arrays only, unless forced."""
+        assert get_backend([1, 2, 3]) is None
+        assert get_backend(np.array([1, 2, 3])) is numpy_backend
+        assert get_backend(np.array([1, 2, 3]), BACKEND_PYTHON) is None
+        assert get_backend([1, 2, 3], BACKEND_NUMPY) is numpy_backend
+
+    def test_spc_array_matches_list(self):
+        """Test Spc gives the same result for an array and a list."""
+        data = VALUES + [30.0]
+        expected = Spc(data, CHART_X_MR_X, rules=RULES_ALL)
+        result = Spc(np.array(data), CHART_X_MR_X, rules=RULES_ALL)
+
+        assert result.get_stats() == pytest.approx(expected.get_stats())
+        assert result.get_violating_points() == expected.get_violating_points()
+
+    def test_spc_2d_array(self):
+        """Test subgroup size is taken from a 2D array."""
+        spc_ = Spc(np.array(SUBGROUPS), CHART_X_BAR_R_X)
+
+        assert spc_.size == 5
+        assert spc_.get_stats() == pytest.approx(Spc(SUBGROUPS, CHART_X_BAR_R_X).get_stats())
+
+    def test_spc_array_append(self):
+        """Test appending to an Spc created from an array."""
+        spc_ = Spc(np.array([1.0, 2, 3, 3, 2, 1, 3, 2, 1, 2]), CHART_X_MR_X)
+
+        assert spc_.append(50) == {"1 beyond 3*sigma": [10]}
+
+    def test_buffer_input(self):
+        """Test buffers are picked up by the backend and used without a copy."""
+        buf = array("d", VALUES + [30.0])
+        expected = Spc(list(buf), CHART_X_MR_X, rules=RULES_ALL)
+
+        for data in (buf, memoryview(buf)):
+            assert get_backend(data) is numpy_backend
+            spc_ = Spc(data, CHART_X_MR_X, rules=RULES_ALL)
+            assert np.shares_memory(spc_._data, np.asarray(buf))
+            assert spc_.get_stats() == pytest.approx(expected.get_stats())
+            assert spc_.get_violating_points() == expected.get_violating_points()
+
+    def test_2d_buffer_input(self):
+        """Test a 2D memoryview is read as subgroups."""
+        buf = array("d", [v for row in SUBGROUPS for v in row])
+        view = memoryview(buf).cast("B").cast("d", (len(SUBGROUPS), 5))
+
+        for backend in (None, BACKEND_PYTHON):
+            spc_ = Spc(view, CHART_X_BAR_R_X, backend=backend)
+            assert spc_.size == 5
+            assert spc_.get_stats() == pytest.approx(Spc(SUBGROUPS, CHART_X_BAR_R_X).get_stats())
+
+    @pytest.mark.parametrize("backend", [None, BACKEND_PYTHON])
+    def test_2d_buffer_append_and_freeze(self, backend):
+        """Test a chart of a 2D memoryview takes new subgroups and freezes."""
+        buf = array("d", [v for row in SUBGROUPS for v in row])
+        view = memoryview(buf).cast("B").cast("d", (len(SUBGROUPS), 5))
+        expected = Spc(SUBGROUPS, CHART_X_BAR_R_X, rules=RULES_ALL)
+        spc_ = Spc(view, CHART_X_BAR_R_X, rules=RULES_ALL, backend=backend)
+        new = [[v + 3 for v in row] for row in SUBGROUPS[:3]]
+
+        assert spc_.freeze().score(new, RULES_ALL) == expected.freeze().score(new, RULES_ALL)
+        assert spc_.append(new[0]) == expected.append(new[0])
+        assert spc_.extend(new[1:]) == expected.extend(new[1:])
+        assert spc_.get_stats() == pytest.approx(expected.get_stats())
+        assert spc_.get_violating_points() == expected.get_violating_points()
+
+    @pytest.mark.parametrize("pair, data", [
+        (spc.PAIR_X_BAR_R, SUBGROUPS),
+        (spc.PAIR_X_BAR_S, SUBGROUPS),
+        (spc.PAIR_X_MR, VALUES),
+    ])
+    def test_pair_matches_list(self, pair, data):
+        """Test paired charts of an array equal the pure Python ones."""
+        result = spc.SpcPair(np.array(data), pair, rules=RULES_ALL)
+        expected = spc.SpcPair(data, pair, rules=RULES_ALL)
+
+        for a, b in zip(result.get_stats(), expected.get_stats()):
+            assert a == pytest.approx(b)
+        assert result.get_violating_points() == expected.get_violating_points()
+
+    # integer values, so the CUSUM ends exactly at 0 on both backends
+    @pytest.mark.parametrize("data", [COUNTS, SUBGROUPS])
+    def test_profile_matches_list(self, data):
+        """Test the profile of an array equals the pure Python one."""
+        result = spc.SpcProfile(np.array(data), rules=RULES_ALL)
+        expected = spc.SpcProfile(data, rules=RULES_ALL)
+
+        assert list(result.charts) == list(expected.charts)
+        for chart_type, stats in expected.get_stats().items():
+            assert result.get_stats()[chart_type] == pytest.approx(stats)
+        assert result.get_violating_points() == expected.get_violating_points()
+
+    def test_score_array(self):
+        """Test Phase II scoring of an array."""
+        limits = Spc(VALUES, CHART_X_MR_X).freeze()
+        batch = np.array(VALUES[:50] + [100.0])
+
+        assert limits.score(batch) == limits.score(list(batch))
+        assert limits.score(batch)["1 beyond 3*sigma"][-1] == 50
+
+    @pytest.mark.parametrize("window", [None, 20])
+    @pytest.mark.parametrize("chart_type, data, sizes", [
+        (spc.CHART_X_MR_X, VALUES, None),
+        (spc.CHART_X_MR_MR, VALUES, None),
+        (spc.CHART_X_BAR_S_X, SUBGROUPS, None),
+        (spc.CHART_X_BAR_R_R, SUBGROUPS, None),
+        (spc.CHART_NP, COUNTS, 50),
+        (spc.CHART_C, COUNTS, None),
+    ])
+    def test_window_matches_list(self, chart_type, data, sizes, window):
+        """Test vectorized window limits equal the running ones."""
+        expected_limits, expected = spc.check_window(data, chart_type, RULES_ALL, window, sizes)
+        limits, result = spc.check_window(np.array(data), chart_type, RULES_ALL, window, sizes)
+
+        for a, b in zip(limits, expected_limits):
+            assert np.allclose(a, np.array(b), equal_nan=True)
+        assert result == expected
+
+    @pytest.mark.parametrize("window", [None, 2, 3, 20])
+    @pytest.mark.parametrize("chart_type", [spc.CHART_X_MR_X, spc.CHART_X_MR_MR])
+    def test_window_with_offset(self, chart_type, window):
+        """Test window limits of data with a large offset agree with the exact ones."""
+        rng = np.random.default_rng(4)
+        for _ in range(20):
+            data = 1e6 + rng.normal(0, 3, 50).round(1)
+            expected_limits, expected = spc.check_window(data.tolist(), chart_type, RULES_ALL, window)
+            limits, result = spc.check_window(data, chart_type, RULES_ALL, window)
+
+            for a, b in zip(limits, expected_limits):
+                # relative to the values, far below the spread of the data
+                assert np.allclose(a, np.array(b), rtol=1e-12, atol=0, equal_nan=True)
+            assert result == expected
+
+    @pytest.mark.parametrize("chart_type", [spc.CHART_P, spc.CHART_NP, spc.CHART_U])
+    def test_lot_sizes_match_list(self, chart_type):
+        """Test vectorized per-lot limits equal the pure Python ones."""
+        sizes = [int(v) for v in RNG.integers(30, 3000, len(COUNTS))]
+        expected = Spc(COUNTS, chart_type, rules=RULES_ALL, sizes=sizes)
+        result = Spc(np.array(COUNTS), chart_type, rules=RULES_ALL, sizes=np.array(sizes))
+
+        for a, b in zip(result.get_stats(), expected.get_stats()):
+            assert np.allclose(a, np.array(b))
+        assert result.get_violating_points() == expected.get_violating_points()
+
+    def test_linear_recurrence(self):
+        """Test the blocked recurrence equals the sequential one."""
+        g = np.array(VALUES)
+        expected = []
+        y = 0.0
+        for v in VALUES:
+            y = v + 0.8 * y
+            expected.append(y)
+
+        assert numpy_backend.linear_recurrence(g, 0.8, block=8) == pytest.approx(expected)
+        assert numpy_backend.linear_recurrence(g[:5], 0.8) == pytest.approx(expected[:5])
+
+    @pytest.mark.parametrize("params", [None, {"lam": 0.5, "L": 2.5}])
+    def test_ewma_matches_list(self, params):
+        """Test the vectorized EWMA chart equals the recursive one."""
+        data = VALUES + [14.0] * 10
+        expected = Spc(data, spc.CHART_EWMA, rules=RULES_ALL, params=params)
+        result = Spc(np.array(data), spc.CHART_EWMA, rules=RULES_ALL, params=params)
+
+        assert np.allclose(result._data, list(expected._data))
+        for a, b in zip(result.get_stats(), expected.get_stats()):
+            assert np.allclose(a, np.array(b))
+        assert result.get_violating_points() == expected.get_violating_points()
+        assert result.extend([20.0]) == expected.extend([20.0])
+
+    def test_runs_match_list(self):
+        """Test vectorized runs equal the pure Python ones."""
+        data = VALUES + [16.0] * 20 + VALUES[:50]
+        expected = Spc(data, CHART_X_MR_X, rules=RULES_ALL)
+        result = Spc(np.array(data), CHART_X_MR_X, rules=RULES_ALL)
+        limits = expected.freeze()
+
+        assert result.get_violating_runs() == expected.get_violating_runs()
+        assert limits.score(np.array(data), RULES_ALL, runs=True) == limits.score(data, RULES_ALL, runs=True)
+        assert numpy_backend.index_runs(array("q", [3, 4, 5, 9])) == [(3, 5), (9, 9)]
+
+    @pytest.mark.parametrize("chunk", [1, 7, 1024])
+    @pytest.mark.parametrize("stop_any", [False, True])
+    def test_first_violations_chunks(self, chunk, stop_any):
+        """Test chunked early exit equals the pure Python engine."""
+        data = VALUES + [16.0] * 9 + VALUES[:40]
+        center, lcl, ucl = spc.get_stats_x_mr_x(data, 1)
+        expected = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1).first(data, stop_any=stop_any)
+        result = numpy_backend.first_violations(np.array(data), center, lcl, ucl, RULES_ALL,
+                                                warmup=1, stop_any=stop_any, chunk=chunk)
+
+        assert result == expected and list(result) == list(expected)
+        assert Spc(np.array(data), CHART_X_MR_X, rules=RULES_ALL).first_violations(stop_any=stop_any) == expected
+
+    def test_custom_rules_match_engine(self):
+        """Test compiled custom rules, also varying limits, equal the pure Python engine."""
+        rules = [spc.register_rule(r) for r in
+                 ("3 of 4 beyond 1.5 sigma", "10 of 11 on one side", "6 below 0.5*sigma",
+                  "3 beyond 1.5 sigma on both sides", "2 beyond 2*sigma", "4 trending", "5 up down")]
+        rules += RULES_ALL
+        data = VALUES + [16.0] * 5 + [float(v) for v in RNG.integers(8, 13, 500)]
+        center, lcl, ucl = spc.get_stats_x_mr_x(data, 1)
+        expected = RuleEngine(center, lcl, ucl, rules, warmup=1).feed(data)
+        result = numpy_backend.find_violating_points(np.array(data), center, lcl, ucl, rules, warmup=1)
+
+        assert result == expected and list(result) == list(expected)
+        ucls = [ucl + (i % 3) for i in range(len(data))]
+        engine = RuleEngine(center, lcl, ucl, rules, warmup=1)
+        expected = engine.feed_varying(data, [center] * len(data), [lcl] * len(data), ucls)
+        result = numpy_backend.find_violating_points(np.array(data), center, lcl, np.array(ucls),
+                                                     rules, warmup=1)
+
+        assert result == expected and list(result) == list(expected)
+
+    @pytest.mark.parametrize("chart_type", [spc.CHART_CUSUM, spc.CHART_TABULAR_CUSUM, spc.CHART_EWMA])
+    def test_target_charts_match_list(self, chart_type):
+        """Test CUSUM and EWMA charts of the same data agree for list and array input."""
+        rng = np.random.default_rng(0)
+        for i in range(100):
+            n = int(rng.integers(5, 60))
+            data = [rng.normal(10, 2, n).round(1), rng.integers(0, 5, n).astype(float),
+                    np.repeat(0.1 * rng.integers(1, 9, 4), rng.integers(1, 12, 4))][i % 3]
+            expected = Spc(data.tolist(), chart_type, rules=RULES_ALL)
+            result = Spc(data, chart_type, rules=RULES_ALL)
+
+            assert result._data[-1] == pytest.approx(expected._data[-1], abs=1e-9)
+            assert result.get_violating_points() == expected.get_violating_points()
+
+    def test_x_mr_exact(self):
+        """Test X mR centers of ill-conditioned data are identical for list and array input."""
+        rng = np.random.default_rng(6)
+        for _ in range(20):
+            data = 1e6 + rng.normal(0, 3, 50).round(1)
+            for chart_type in (spc.CHART_X_MR_X, spc.CHART_X_MR_MR):
+                assert Spc(data, chart_type).get_stats() == Spc(data.tolist(), chart_type).get_stats()
+            assert (spc.SpcPair(data, spc.PAIR_X_MR).get_stats()
+                    == spc.SpcPair(data.tolist(), spc.PAIR_X_MR).get_stats())
@@ -105,6 +105,26 @@ class TestPlotlySpcChart:
         chart_c = PlotlySpcChart(data, title="C Chart", chart_type=CHART_C)
         assert chart_c.chart_type == CHART_C
 
+    def test_lot_sizes_limit_lines(self):
+        """Test limits of lots of different sizes are drawn per point."""
+        data = [5, 3, 12, 6]
+        chart = PlotlySpcChart(data, title="p Chart", chart_type=CHART_P, sizes=[100, 50, 200, 100])
+        lines = {trace.name: trace.y for trace in chart.get_figure().data}
+
+        ucl = lines['UCL (Upper Control Limit)']
+        assert len(ucl) == len(data)
+        assert ucl[0] == ucl[3] and ucl[1] > ucl[0] > ucl[2]
+
+    def test_times_on_x_axis(self):
+        """Test timestamps are used for the x-axis."""
+        data = [10, 11, 10, 11, 10, 11, 10, 100]
+        times = ["2024-01-01 00:%02d" % m for m in (0, 5, 7, 20, 21, 30, 44, 59)]
+        chart = PlotlySpcChart(data, title="Times", times=times)
+        traces = {trace.name: trace for trace in chart.get_figure().data}
+
+        assert list(traces['Violations'].x) == [times[7]]
+        assert list(traces['Data Points'].x) == times[:7]
+
     def test_violation_detection(self):
         """Test that violations are detected."""
         # Create data with an obvious outlier
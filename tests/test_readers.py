@@ -0,0 +1,110 @@
+"""Tests for the streaming CSV and NDJSON readers."""
+
+import gc
+import gzip
+import io
+import json
+import warnings
+
+import pytest
+
+from spcchart.spc import Spc, CHART_X_MR_X, CHART_X_BAR_R_X
+from spcchart.readers import open_text, read_csv, read_ndjson, subgroups, stream_spc
+
+
+VALUES = [float(i % 7) + 0.5 for i in range(50)]
+
+
+def _write_csv(path, values, compress=False):
+    text = "time,value\n" + "".join("%d,%r\n" % (i, v) for i, v in enumerate(values))
+    if compress:
+        with gzip.open(path, "wt") as f:
+            f.write(text)
+    else:
+        path.write_text(text)
+
+
+class TestReaders:
+    """Tests for reading columns in chunks."""
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_read_csv(self, tmp_path, compress):
+        """Test a CSV column is read in chunks, compressed or not."""
+        path = tmp_path / "data.csv"
+        _write_csv(path, VALUES, compress)
+        chunks = list(read_csv(path, "value", chunk_size=16))
+
+        assert [len(c) for c in chunks] == [16, 16, 16, 2]
+        assert sum(chunks, []) == VALUES
+        assert sum(read_csv(path, 1), []) == VALUES
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_file_is_closed(self, tmp_path, compress):
+        """Test reading a file, gzip compressed or not, leaves no open file behind."""
+        path = tmp_path / "data.csv"
+        _write_csv(path, VALUES, compress)
+
+        # an unclosed file warns from its finalizer, where an error filter
+        # could not raise into the test, so record the warnings instead
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            assert sum(read_csv(path, "value"), []) == VALUES
+            with open_text(path) as f:
+                f.readline()
+            gc.collect()
+
+        assert [w for w in caught if issubclass(w.category, ResourceWarning)] == []
+
+    def test_read_csv_skips_empty(self):
+        """Test empty cells are skipped."""
+        f = io.StringIO("a;b\n1;2\n3;\n4;5\n")
+
+        assert list(read_csv(f, "b", delimiter=";")) == [[2.0, 5.0]]
+
+    def test_read_csv_name_without_header(self):
+        """Test a column name without a header row raises ValueError."""
+        with pytest.raises(ValueError, match="no header"):
+            list(read_csv(io.StringIO("1\n2\n"), "value", header=False))
+
+    def test_read_ndjson(self, tmp_path):
+        """Test a NDJSON field is read, null and missing values skipped."""
+        path = tmp_path / "data.ndjson.gz"
+        with gzip.open(path, "wt") as f:
+            for v in VALUES:
+                f.write(json.dumps({"value": v, "unit": "mm"}) + "\n")
+            f.write('{"value": null}\n{"unit": "mm"}\n\n')
+
+        assert sum(read_ndjson(path, "value", chunk_size=7), []) == VALUES
+
+    def test_subgroups(self):
+        """Test subgroups are formed across chunk borders."""
+        chunks = [[1, 2, 3], [4, 5], [6, 7, 8, 9, 10, 11]]
+
+        assert list(subgroups(chunks, 4)) == [[[1, 2, 3, 4]], [[5, 6, 7, 8]]]
+
+    def test_stream_spc(self, tmp_path):
+        """Test chunks are pushed into an incremental Spc."""
+        path = tmp_path / "data.csv"
+        _write_csv(path, VALUES + [30.0])
+        chart = stream_spc(read_csv(path, "value", chunk_size=10), CHART_X_MR_X)
+        expected = Spc(VALUES[:10], CHART_X_MR_X)
+        for i in range(10, len(VALUES) + 1, 10):
+            expected.extend((VALUES + [30.0])[i:i + 10])
+
+        assert chart.get_stats() == pytest.approx(Spc(VALUES + [30.0], CHART_X_MR_X).get_stats())
+        assert chart.get_violating_points() == expected.get_violating_points()
+        assert chart.get_violating_points()["1 beyond 3*sigma"] == [50]
+
+    def test_stream_spc_subgroups(self):
+        """Test subgroups formed on the fly give the Xbar chart."""
+        f = io.StringIO("\n".join(str(v) for v in VALUES))
+        chart = stream_spc(subgroups(read_csv(f, header=False, chunk_size=3), 5), CHART_X_BAR_R_X)
+        rows = [VALUES[i:i + 5] for i in range(0, 50, 5)]
+
+        assert chart.size == 5
+        assert chart.get_stats() == pytest.approx(Spc(rows, CHART_X_BAR_R_X).get_stats())
+
+    def test_stream_spc_empty(self):
+        """Test streaming no values raises ValueError."""
+        with pytest.raises(ValueError, match="no data"):
+            stream_spc(read_csv(io.StringIO("value\n")), CHART_X_MR_X)
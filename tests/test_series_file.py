@@ -0,0 +1,94 @@
+"""Tests for memory-mapped series files."""
+
+import tracemalloc
+from array import array
+
+import pytest
+import numpy as np
+
+from spcchart.spc import (
+    Spc,
+    CHART_X_MR_X,
+    CHART_X_MR_MR,
+    CHART_X_BAR_R_X,
+    CHART_X_BAR_S_S,
+    CHART_P,
+    CHART_C,
+    CHART_CUSUM,
+    CHART_TABULAR_CUSUM,
+    RULES_ALL,
+)
+from spcchart.series_file import SeriesFile, write_series, check_series
+
+
+RNG = np.random.default_rng(5)
+VALUES = [float(v) for v in RNG.normal(10, 2, 500)] + [30.0] + [12.0] * 10
+SUBGROUPS = [[float(v) for v in row] for row in RNG.normal(10, 2, (80, 5))]
+COUNTS = [int(v) for v in RNG.poisson(6, 300)] + [25]
+
+
+class TestSeriesFile:
+    """Tests for reading series files."""
+
+    def test_header_file(self, tmp_path):
+        """Test values and subgroup size are read back."""
+        path = tmp_path / "subgroups.spc"
+        write_series(path, SUBGROUPS, size=5)
+
+        with SeriesFile(path) as series:
+            assert series.size == 5
+            assert len(series) == len(SUBGROUPS)
+            assert series.view.tolist() == SUBGROUPS
+            blocks = [b.tolist() for b in series.blocks(30)]
+            assert [len(b) for b in blocks] == [30, 30, 20]
+
+    def test_raw_file(self, tmp_path):
+        """Test a raw float64 file is read as single values."""
+        path = tmp_path / "values.f64"
+        with open(path, "wb") as f:
+            array("d", VALUES).tofile(f)
+
+        with SeriesFile(path) as series:
+            assert series.size == 1
+            assert series.view.tolist() == VALUES
+            assert Spc(series.view, CHART_X_MR_X).get_violating_points() == \
+                Spc(np.array(VALUES), CHART_X_MR_X).get_violating_points()
+
+    @pytest.mark.parametrize("chart_type, data, size", [
+        (CHART_X_MR_X, VALUES, 1),
+        (CHART_X_MR_MR, VALUES, 1),
+        (CHART_C, COUNTS, 1),
+        (CHART_P, COUNTS, 50),
+        # integer data, so the mean of the first pass is exact
+        (CHART_CUSUM, COUNTS, 1),
+        (CHART_TABULAR_CUSUM, COUNTS, 1),
+        (CHART_X_BAR_R_X, SUBGROUPS, 5),
+        (CHART_X_BAR_S_S, SUBGROUPS, 5),
+    ])
+    def test_check_matches_spc(self, tmp_path, chart_type, data, size):
+        """Test checking a file in blocks gives the same result as Spc."""
+        path = tmp_path / "series.spc"
+        subgroups = isinstance(data[0], list)
+        write_series(path, data, size=size if subgroups else 1)
+        sizes = None if subgroups or size == 1 else size
+        spc = Spc(data, chart_type, rules=RULES_ALL, sizes=sizes)
+
+        with SeriesFile(path) as series:
+            limits, violations = check_series(series, chart_type, rules=RULES_ALL, sizes=sizes,
+                                              block_size=7)
+
+        assert limits.get_stats() == pytest.approx(spc.get_stats())
+        assert violations == spc.get_violating_points()
+
+    def test_bounded_memory(self, tmp_path):
+        """Test memory used to check a file does not grow with its length."""
+        path = tmp_path / "long.spc"
+        write_series(path, (float(i % 7) for i in range(200000)))
+
+        with SeriesFile(path) as series:
+            tracemalloc.start()
+            check_series(series, CHART_X_MR_X, block_size=1000)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        assert peak < 200000
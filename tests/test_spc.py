@@ -1,5 +1,10 @@
 """Tests for the SPC statistical module."""
 
+import datetime
+import math
+import statistics
+from array import array
+
 import pytest
 import numpy as np
 from spcchart.spc import (
@@ -15,11 +20,40 @@ from spcchart.spc import (
     CHART_C,
     CHART_U,
     CHART_CUSUM,
+    CHART_TABULAR_CUSUM,
+    BACKEND_PYTHON,
     RULES_BASIC,
     RULES_WECO,
     RULES_NELSON,
+    RULES_ALL,
+    RULES_FUNCS,
+    RULES_9_ON_ONE_SIDE,
+    RuleEngine,
+    STATS_FUNCS,
+    RUNNING_STATS,
+    FrozenLimits,
     get_stats_x_mr_x,
     get_stats_c,
+    prepare_data_cusum,
+    TabularCusum,
+    Ewma,
+    CHART_EWMA,
+    get_partial_stats,
+    subgroup_stats,
+    prepare_data_x_bar_rs_x,
+    prepare_data_x_bar_s_s,
+    SpcPair,
+    SpcProfile,
+    PAIRED_CHARTS,
+    PAIR_X_BAR_R,
+    PAIR_X_BAR_S,
+    PAIR_X_MR,
+    merge_stats,
+    window_limits,
+    check_window,
+    index_runs,
+    parse_rule,
+    register_rule,
 )
 
 
@@ -166,6 +200,79 @@ class TestSpcAttributeCharts:
         assert lcl >= 0
 
 
+class TestSpcLotSizes:
+    """Tests for p, np and u charts of lots of different sizes."""
+
+    LOTS = [50, 200, 1000, 80, 400, 120, 60, 2000, 300, 90]
+    DEFECTS = [3, 9, 52, 4, 21, 5, 3, 101, 15, 4]
+
+    @pytest.mark.parametrize("chart_type", [CHART_P, CHART_NP, CHART_U])
+    def test_constant_sizes_match_scalar(self, chart_type):
+        """Test equal lot sizes give the limits of a single size."""
+        spc = Spc(COUNTS, chart_type, sizes=[100] * len(COUNTS))
+        expected = Spc(COUNTS, chart_type, sizes=100)
+        center, lcl, ucl = spc.get_stats()
+
+        assert len(lcl) == len(spc._data)
+        assert set(lcl) == {expected.lcl} and set(ucl) == {expected.ucl}
+        assert spc.get_violating_points() == expected.get_violating_points()
+
+    def test_p_limits_per_lot(self):
+        """Test each lot has limits from its own size."""
+        spc = Spc(self.DEFECTS, CHART_P, sizes=self.LOTS)
+        pbar = sum(self.DEFECTS) / sum(self.LOTS)
+        center, lcl, ucl = spc.get_stats()
+
+        assert center == pytest.approx(pbar)
+        for i, n in enumerate(self.LOTS):
+            sd = math.sqrt(pbar * (1 - pbar) / n)
+            # index 0 is the placeholder point
+            assert ucl[i + 1] == pytest.approx(pbar + 3 * sd)
+            assert lcl[i + 1] == pytest.approx(max(0, pbar - 3 * sd))
+
+    def test_violations_against_own_limits(self):
+        """Test a point is only beyond the limits of its own lot."""
+        # 6 of 50 is within the limits of a small lot, 240 of 2000 is not
+        spc = Spc(self.DEFECTS + [6, 240], CHART_P, sizes=self.LOTS + [50, 2000])
+
+        beyond = spc.get_violating_points()["1 beyond 3*sigma"]
+        assert 12 in beyond and 11 not in beyond
+
+    def test_np_center_per_lot(self):
+        """Test the np chart center is n * pbar of each lot."""
+        center, lcl, ucl = Spc(self.DEFECTS, CHART_NP, sizes=self.LOTS).get_stats()
+        pbar = sum(self.DEFECTS) / sum(self.LOTS)
+
+        assert list(center) == pytest.approx([n * pbar for n in self.LOTS])
+
+    def test_append_not_supported(self):
+        """Test appending to charts of lots of different sizes is refused."""
+        spc = Spc(self.DEFECTS, CHART_U, sizes=self.LOTS)
+
+        with pytest.raises(ValueError):
+            spc.append(3)
+
+    @pytest.mark.parametrize("chart_type", [CHART_P, CHART_NP, CHART_U])
+    def test_freeze_scores_new_lots(self, chart_type):
+        """Test new lots are scored against the limits of their own sizes."""
+        limits = Spc(self.DEFECTS, chart_type, sizes=self.LOTS).freeze()
+        pbar = sum(self.DEFECTS) / sum(self.LOTS)
+        # 6 of 50 is within the limits of a small lot, 240 of 2000 is not
+        lots, defects = [50, 2000, 300], [6, 240, 15]
+
+        assert limits.bar == pytest.approx(pbar)
+        assert limits.score(defects, sizes=lots) == {"1 beyond 3*sigma": [1]}
+        assert limits.score(np.array(defects), sizes=lots) == {"1 beyond 3*sigma": [1]}
+        assert limits.first_violations(defects, sizes=lots) == {"1 beyond 3*sigma": 1}
+        center, lcl, ucl = limits.get_stats(sizes=lots)
+        expected = Spc(self.DEFECTS, chart_type, sizes=self.LOTS).get_stats()
+        assert ucl[0] == pytest.approx(expected[2][0 if chart_type == CHART_NP else 1])
+        # one size for all new lots
+        assert limits.score([100, 240], sizes=2000) == {"1 beyond 3*sigma": [1]}
+        with pytest.raises(ValueError):
+            limits.score(defects)
+
+
 class TestSpcCUSUM:
     """Tests for CUSUM (Cumulative Sum) charts."""
 
@@ -183,6 +290,176 @@ class TestSpcCUSUM:
         assert ucl is None
 
 
+    def test_cusum_prepare_generator(self):
+        """Test CUSUM data can be prepared from a generator."""
+        data = [1, 2, 3, 3, 2, 1, 3, 8]
+        expected = prepare_data_cusum(data, 1)
+
+        assert prepare_data_cusum((d for d in data), 1) == expected
+        assert prepare_data_cusum((d for d in data), 1, target=2.875) == expected
+        assert expected[0] == 0
+        assert expected[-1] == pytest.approx(0)
+
+    def test_cusum_prepare_large(self):
+        """Test CUSUM of a long series is computed in linear time."""
+        data = [float(i % 7) for i in range(200000)]
+        result = prepare_data_cusum(data, 1)
+
+        assert len(result) == len(data) + 1
+        assert result[7] == pytest.approx(sum(data[:7]) - 7 * sum(data) / len(data))
+
+
+class TestTabularCusum:
+    """Tests for the tabular CUSUM chart."""
+
+    def test_tabular_sums(self):
+        """Test upper and lower sums with given target and sigma."""
+        cusum = TabularCusum(target=10, sigma=1)
+
+        assert cusum.extend([10, 11, 12, 13]) == [0, 0.5, 2.0, 4.5]
+        assert cusum.extend([9, 7]) == [3.0, -3.0]
+        assert cusum.add(7) == -5.5
+        assert cusum.get_stats() == (0, -5, 5)
+
+    def test_tabular_chart_signals_shift(self):
+        """Test a small sustained shift is detected beyond the limits."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10, 11, 9] + [11] * 12
+        spc = Spc(data, CHART_TABULAR_CUSUM, rules=["1 beyond 3*sigma"])
+        center, lcl, ucl = spc.get_stats()
+
+        assert center == 0
+        assert lcl == -ucl
+        assert ucl > 0
+        assert "1 beyond 3*sigma" in spc.get_violating_points()
+
+    def test_tabular_append_matches_batch(self):
+        """Test appending points continues the sums with fixed target and sigma."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10]
+        spc = Spc(data, CHART_TABULAR_CUSUM, rules=[])
+        spc.extend([12, 13])
+        cusum = TabularCusum()
+        cusum.fit(data)
+
+        assert list(spc._data[:-2]) == list(Spc(data, CHART_TABULAR_CUSUM, rules=[])._data)
+        assert list(spc._data[-2:]) == cusum.extend([12, 13])
+
+    def test_tabular_params(self):
+        """Test k and h of the chart are taken from params, also when appending and scoring."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10, 11, 9]
+        spc = Spc(data, CHART_TABULAR_CUSUM, rules=["1 beyond 3*sigma"], params={"k": 0.25, "h": 4})
+        fitted = TabularCusum()
+        fitted.fit(data)
+        cusum = TabularCusum(target=fitted.target, sigma=fitted.sigma, k=0.25, h=4)
+
+        assert list(spc._data) == [0] + cusum.extend(data)
+        assert spc.get_stats() == cusum.get_stats()
+        # the smaller h signals one point earlier than the default
+        assert spc.extend([12] * 4) == {"1 beyond 3*sigma": [13, 14]}
+        assert list(spc._data[-4:]) == cusum.extend([12] * 4)
+        limits = Spc(data, CHART_TABULAR_CUSUM, params={"k": 0.25, "h": 4}).freeze()
+        assert limits.score([12] * 4, rules=["1 beyond 3*sigma"]) == {"1 beyond 3*sigma": [2, 3]}
+        assert limits.get_stats() == cusum.get_stats()
+
+
+class TestEwma:
+    """Tests for the EWMA chart."""
+
+    def test_ewma_values_and_limits(self):
+        """Test the smoother and the exact limits of each point."""
+        ewma = Ewma(target=10, sigma=1, lam=0.5, L=3)
+        lam = 0.5
+
+        assert ewma.extend([10, 12, 12]) == [10.0, 11.0, 11.5]
+        q = sum((1 - lam) ** (2 * j) for j in range(3)) * lam ** 2
+        assert ewma.get_stats() == pytest.approx((10, 10 - 3 * math.sqrt(q), 10 + 3 * math.sqrt(q)))
+
+    def test_ewma_limits_converge(self):
+        """Test limits widen towards the asymptotic L*sigma*sqrt(lambda/(2-lambda))."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10, 11, 9] * 10
+        center, lcl, ucl = Spc(data, CHART_EWMA).get_stats()
+        sigma = Spc(data, CHART_X_MR_MR).get_stats()[0] / 1.128
+        limit = 3 * sigma * math.sqrt(0.2 / 1.8)
+
+        assert center == pytest.approx(statistics.mean(data))
+        assert len(ucl) == len(data) + 1
+        assert ucl[0] == center
+        assert all(a < b for a, b in zip(ucl[:20], ucl[1:20]))
+        assert ucl[-1] - center == pytest.approx(limit)
+        assert [u - center for u in ucl] == pytest.approx([center - l for l in lcl])
+
+    def test_ewma_signals_shift(self):
+        """Test a sustained shift is detected beyond the limits."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10, 11, 9] * 3 + [12] * 10
+        spc = Spc(data, CHART_EWMA, rules=["1 beyond 3*sigma"])
+
+        # index 0 is the placeholder point (the target)
+        assert spc.get_violating_points() == {"1 beyond 3*sigma": [36, 37, 38, 39, 40]}
+
+    def test_ewma_append_matches_stream(self):
+        """Test appending points continues the smoother and its limits."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10]
+        spc = Spc(data, CHART_EWMA, rules=RULES_ALL)
+        ewma = Ewma()
+        ewma.fit(data)
+        one = Spc(data, CHART_EWMA, rules=RULES_ALL)
+        for x in [12, 13, 14]:
+            one.append(x)
+
+        assert spc.extend([12, 13, 14])["1 beyond 3*sigma"] == [11]
+        assert list(spc._data[-3:]) == ewma.extend([12, 13, 14])
+        assert spc.get_stats() == (ewma.target, spc.lcl, spc.ucl)
+        assert (spc.lcl[-1], spc.ucl[-1]) == ewma.get_stats()[1:]
+        assert one.get_violating_points() == spc.get_violating_points()
+
+    def test_ewma_params(self):
+        """Test lambda and L of the chart are taken from params."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10, 12, 13]
+        spc = Spc(data, CHART_EWMA, rules=RULES_ALL, params={"lam": 0.5, "L": 2})
+        fitted = Ewma()
+        fitted.fit(data)
+        ewma = Ewma(target=fitted.target, sigma=fitted.sigma, lam=0.5, L=2)
+        points = ewma.extend(data)
+        default = Spc(data, CHART_EWMA)
+
+        assert list(spc._data) == pytest.approx([ewma.target] + points)
+        assert (spc.lcl[-1], spc.ucl[-1]) == pytest.approx(ewma.get_stats()[1:])
+        assert spc.ucl[-1] != pytest.approx(default.ucl[-1])
+        # appended points continue the smoother with the same lambda
+        spc.append(14)
+        ewma.add(14)
+        assert spc._data[-1] == pytest.approx(ewma.z)
+        assert (spc.lcl[-1], spc.ucl[-1]) == pytest.approx(ewma.get_stats()[1:])
+
+    def test_unknown_params(self):
+        """Test parameters the chart does not have are refused."""
+        with pytest.raises(ValueError, match="lambda"):
+            Spc([10, 11, 9, 10], CHART_EWMA, params={"lambda": 0.5})
+        with pytest.raises(ValueError):
+            Spc([10, 11, 9, 10], CHART_X_MR_X, params={"lam": 0.5})
+
+    def test_ewma_merge(self):
+        """Test merged parts continue the smoother across the border."""
+        data = [10, 11, 9, 10, 11, 9, 10, 10, 12, 13]
+        whole = Ewma(target=10, sigma=1)
+        whole.extend(data)
+        parts = [get_partial_stats(shard, CHART_EWMA, target=10, sigma=1)
+                 for shard in (data[:3], data[3:4], data[4:])]
+        merged = merge_stats(parts)
+
+        assert merged.n == len(data)
+        assert merged.z == pytest.approx(whole.z)
+        assert merged.get_stats() == pytest.approx(whole.get_stats())
+        with pytest.raises(TypeError, match=CHART_EWMA):
+            merged.discard(10, 11)
+
+    def test_ewma_not_frozen(self):
+        """Test freezing limits per point is refused."""
+        spc = Spc([10, 11, 9, 10, 11, 9], CHART_EWMA)
+
+        with pytest.raises(ValueError, match=CHART_EWMA):
+            spc.freeze()
+
+
 class TestSpcRules:
     """Tests for control chart rules (WECO, Nelson, etc.)."""
 
@@ -210,6 +487,852 @@ class TestSpcRules:
 
         assert isinstance(violations, dict)
 
+    def test_rules_argument(self):
+        """Test get_violating_points checks the rules it is given."""
+        rng = np.random.default_rng(3)
+        data = list(rng.normal(0, 1, 300)) + [0.8] * 10 + [5.0]
+        spc = Spc(data, CHART_X_MR_X, rules=RULES_BASIC)
+        nelson = Spc(data, CHART_X_MR_X, rules=RULES_NELSON)
+
+        assert spc.get_violating_points(RULES_NELSON) == nelson.get_violating_points()
+        assert list(spc.get_violating_points(RULES_NELSON)) == list(nelson.get_violating_points())
+        assert spc.get_violating_points() == Spc(data, CHART_X_MR_X).get_violating_points()
+
+    def test_rules_checked_lazily(self):
+        """Test rules are checked on first request and kept per rule set."""
+        spc = Spc([1, 2, 3, 3, 2, 1, 3, 8], CHART_X_MR_X)
+        assert spc._points == {}
+
+        violations = spc.get_violating_points()
+        points, zones = dict(spc._points), spc._zones
+        assert spc.get_violating_points() == violations
+        spc.get_violating_points(RULES_WECO)
+        assert spc._zones is zones
+        assert all(spc._points[r] is points[r] for r in points)
+
+    def test_compact_storage(self):
+        """Test Spc keeps points and violations in typed arrays."""
+        spc = Spc([1, 2, 3, 3, 2, 1, 3, 8], CHART_X_MR_X)
+        spc.get_violating_points()
+
+        assert not hasattr(spc, "__dict__")
+        assert spc._data.typecode == "d"
+        assert spc._points["1 beyond 3*sigma"].typecode == "q"
+
+    def test_rules_after_append(self):
+        """Test rules requested after append use the limits points were added with."""
+        data = [1, 2, 3, 3, 2, 1, 3, 2, 1, 2, 50, 2, 2, 2, 2, 2, 2, 2, 2, 2]
+        spc = Spc(data[:10], CHART_X_MR_X)
+        spc.get_violating_points()
+        spc.extend(data[10:])
+        eager = Spc(data[:10], CHART_X_MR_X, rules=RULES_ALL)
+        eager.get_violating_points()
+        eager.extend(data[10:])
+
+        assert spc.get_violating_points(RULES_ALL) == eager.get_violating_points()
+        spc.append(2)
+        eager.append(2)
+        assert spc.get_violating_points(RULES_ALL) == eager.get_violating_points()
+
+
+def _reference_violations(data, center, lcl, ucl, rules):
+    """Slice based rule check, as Spc did it before the single pass engine."""
+    points = {}
+    for i in range(len(data)):
+        for r in rules:
+            func, points_num = RULES_FUNCS[r]
+            if func is None or i <= points_num - 1:
+                continue
+            if func(data[i-points_num+1:i+1], center, lcl, ucl):
+                points.setdefault(r, []).append(i)
+    return points
+
+
+class TestRuleEngine:
+    """Tests for the single pass rule engine."""
+
+    def test_matches_reference(self):
+        """Test engine gives the same dict as the slice based check."""
+        rng = np.random.default_rng(7)
+        data = list(rng.normal(0, 1, 2000)) + [4.0, 0.5, 0.5] + list(rng.normal(0.8, 1, 500))
+        center, lcl, ucl = get_stats_x_mr_x(data, size=1)
+        expected = _reference_violations(data, center, lcl, ucl, RULES_ALL)
+        result = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1).feed(data)
+
+        assert result == expected
+        assert list(result) == list(expected)
+
+    def test_matches_reference_with_ties(self):
+        """Test engine matches the slice based check on integer data with ties."""
+        rng = np.random.default_rng(3)
+        data = [int(v) for v in rng.integers(0, 6, 3000)] + [9, 9, 1, 9, 0, 9, 0, 9]
+        center, lcl, ucl = get_stats_x_mr_x(data, size=1)
+        rules = RULES_ALL + [RULES_9_ON_ONE_SIDE]
+        expected = _reference_violations(data, center, lcl, ucl, rules)
+        result = RuleEngine(center, lcl, ucl, rules, warmup=1).feed(data)
+
+        assert result == expected
+
+    def test_spc_matches_reference(self):
+        """Test Spc violations match the slice based check."""
+        data = [5] * 10 + [15] * 10
+        spc = Spc(data, CHART_X_MR_X, rules=RULES_ALL)
+        center, lcl, ucl = spc.get_stats()
+
+        assert spc.get_violating_points() == _reference_violations(data, center, lcl, ucl, RULES_ALL)
+
+    def test_feed_in_parts(self):
+        """Test feeding data in parts gives the same result as at once."""
+        data = [1, 2, 3, 3, 2, 1, 3, 8, 4, 4, 4, 4, 4, 4, 4, 4, 1]
+        center, lcl, ucl = get_stats_x_mr_x(data, size=1)
+        whole = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1).feed(data)
+
+        engine = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1)
+        parts = {}
+        for chunk in (data[:5], data[5:11], data[11:]):
+            for rule, points in engine.feed(chunk).items():
+                parts.setdefault(rule, []).extend(points)
+
+        assert parts == whole
+
+    def test_point_on_center_keeps_run(self):
+        """Test a point on the center line does not break a run."""
+        engine = RuleEngine(0, -3, 3, ["7 on one side"])
+        result = engine.feed([1, 1, 1, 0, -1, -1, -1, -1])
+
+        assert result == {"7 on one side": [6, 7]}
+
+
+class TestUnknownRules:
+    """Tests for rules which are not known."""
+
+    @pytest.mark.parametrize("rule", ["1 beyond 3 sigma", "5 of 6 beyond 1.5 sigma"])
+    def test_unknown_rule_raises(self, rule):
+        """Test a misspelled or unregistered rule is not read as no violations."""
+        data = [1, 2, 3, 3, 2, 1, 3, 2, 1, 2, 20]
+        with pytest.raises(KeyError):
+            RuleEngine(0, -3, 3, [rule])
+        with pytest.raises(KeyError):
+            Spc(data, CHART_X_MR_X, rules=[rule])
+        with pytest.raises(KeyError):
+            Spc(data, CHART_X_MR_X).get_violating_points([rule])
+        with pytest.raises(KeyError):
+            Spc(data, CHART_X_MR_X).freeze().score(data, rules=[rule])
+
+
+class TestViolationRuns:
+    """Tests for violations as runs of consecutive points."""
+
+    DATA = [10, 11, 9, 10, 11, 9, 10, 10, 11, 9] + [14] * 12 + [10, 9, 11, 40]
+
+    def test_engine_runs_match_indexes(self):
+        """Test runs built by the engine cover the same indexes."""
+        center, lcl, ucl = get_stats_x_mr_x(self.DATA, size=1)
+        points = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1).feed(self.DATA)
+        runs = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1, runs=True).feed(self.DATA)
+
+        assert list(runs) == list(points)
+        assert runs == dict((r, index_runs(idx)) for r, idx in points.items())
+        assert runs["8 on one side"] == [(8, 9), (17, 21)]
+
+    def test_engine_runs_per_feed(self):
+        """Test a run continues over chunks as a run starting the next feed."""
+        engine = RuleEngine(0, -3, 3, ["7 on one side"], runs=True)
+
+        assert engine.feed([1] * 9) == {"7 on one side": [(6, 8)]}
+        assert engine.feed([1] * 3 + [-1]) == {"7 on one side": [(9, 11)]}
+
+    def test_spc_runs(self):
+        """Test runs of Spc, also in a time range."""
+        spc = Spc(self.DATA, CHART_X_MR_X, rules=RULES_ALL, times=list(range(len(self.DATA))))
+        runs = spc.get_violating_runs()
+
+        assert runs["1 beyond 3*sigma"] == [(25, 25)]
+        assert runs["7 on one side"] == [(7, 9), (16, 21)]
+        assert spc.get_violating_runs(["7 on one side"], start=18, end=20) == {"7 on one side": [(18, 19)]}
+
+    def test_spc_runs_kept_without_indexes(self):
+        """Test runs are recorded by the engine, indexes are not expanded."""
+        spc = Spc(self.DATA, CHART_TABULAR_CUSUM, rules=["1 beyond 3*sigma"])
+        runs = spc.get_violating_runs()
+
+        assert spc._points == {}
+        assert list(spc._runs["1 beyond 3*sigma"]) == [5, 16, 26, 26]
+        points = spc.get_violating_points()["1 beyond 3*sigma"]
+        assert runs == {"1 beyond 3*sigma": index_runs(points)}
+
+    def test_spc_runs_ranges(self):
+        """Test runs cut at range borders match runs of the points in range."""
+        spc = Spc(self.DATA, CHART_X_MR_X, rules=RULES_ALL, times=list(range(len(self.DATA))))
+        expected = Spc(self.DATA, CHART_X_MR_X, rules=RULES_ALL, times=list(range(len(self.DATA))))
+
+        for start, end in [(0, 30), (8, 8), (8, 9), (17, 20), (20, 26), (None, 18), (18, None)]:
+            points = expected.get_violating_points(start=start, end=end)
+            runs = spc.get_violating_runs(start=start, end=end)
+            assert runs == dict((r, index_runs(idx)) for r, idx in points.items())
+            assert list(runs) == list(points)
+
+    def test_spc_runs_after_append(self):
+        """Test runs include points appended after they were checked."""
+        spc = Spc(self.DATA[:20], CHART_X_MR_X, rules=RULES_ALL)
+        expected = Spc(self.DATA[:20], CHART_X_MR_X, rules=RULES_ALL)
+        spc.get_violating_runs()
+        spc.extend(self.DATA[20:])
+        expected.extend(self.DATA[20:])
+        points = expected.get_violating_points()
+
+        assert spc.get_violating_runs() == dict((r, index_runs(idx)) for r, idx in points.items())
+
+    def test_cusum_runs(self):
+        """Test a long stretch beyond the limits is one run."""
+        spc = Spc(self.DATA, CHART_TABULAR_CUSUM, rules=["1 beyond 3*sigma"])
+
+        assert spc.get_violating_runs() == {"1 beyond 3*sigma": [(5, 16), (26, 26)]}
+        assert len(spc.get_violating_points()["1 beyond 3*sigma"]) == 13
+
+    def test_score_runs(self):
+        """Test Phase II scoring as runs."""
+        limits = Spc(self.DATA[:10], CHART_X_MR_X).freeze()
+
+        assert limits.score(self.DATA, runs=True)["1 beyond 3*sigma"] == [(10, 21), (25, 25)]
+
+
+class TestFirstViolations:
+    """Tests for the early exit alerting mode."""
+
+    DATA = [10, 11, 9, 10, 11, 9, 10, 10, 11, 9] + [14] * 12 + [10, 9, 11, 40]
+
+    def test_engine_stops_early(self):
+        """Test the engine consumes values only up to the violations."""
+        center, lcl, ucl = get_stats_x_mr_x(self.DATA, size=1)
+        engine = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1)
+        consumed = []
+        data = (consumed.append(x) or x for x in self.DATA)
+
+        assert engine.first(data, stop_any=True) == {"4 of 5 beyond 1*sigma": 5}
+        assert len(consumed) == 6
+        assert "4 of 5 beyond 1*sigma" not in [r for r, d in engine.detectors]
+
+    @pytest.mark.parametrize("stop_any", [False, True])
+    def test_spc_matches_violations(self, stop_any):
+        """Test first violations equal the start of the full result."""
+        spc = Spc(self.DATA, CHART_X_MR_X, rules=RULES_ALL)
+        first = spc.first_violations(stop_any=stop_any)
+        expected = dict((r, idx[0]) for r, idx in Spc(self.DATA, CHART_X_MR_X, rules=RULES_ALL)
+                        .get_violating_points().items())
+        if stop_any:
+            expected = {"4 of 5 beyond 1*sigma": 5}
+
+        assert first == expected and list(first) == list(expected)
+        # answered from the checked rules as well
+        spc.get_violating_points()
+        assert spc.first_violations(stop_any=stop_any) == expected
+
+    def test_spc_after_extend(self):
+        """Test points added later are checked with their own limits."""
+        charts = []
+        for _ in range(2):
+            spc = Spc(self.DATA[:10], CHART_X_MR_X, rules=["1 beyond 3*sigma"])
+            for x in self.DATA[10:]:
+                spc.append(x)
+            charts.append(spc)
+        points = charts[1].get_violating_points(RULES_ALL)
+
+        # other rules than those of the chart are not checked yet
+        assert charts[0].first_violations(RULES_ALL) == dict((r, idx[0]) for r, idx in points.items())
+
+    def test_healthy_series(self):
+        """Test no violation gives an empty dict."""
+        spc = Spc([10, 11, 9, 10, 11, 9, 10, 10, 11, 9], CHART_X_MR_X)
+
+        assert spc.first_violations(stop_any=True) == {}
+
+    def test_frozen_limits(self):
+        """Test Phase II batches are checked up to the first violation."""
+        limits = Spc(self.DATA[:10], CHART_X_MR_X).freeze()
+
+        assert limits.first_violations(self.DATA, stop_any=True) == {"1 beyond 3*sigma": 10}
+        assert limits.first_violations(self.DATA[:10]) == {}
+
+
+class TestNelsonRules:
+    """Tests for the zone and trend rules, limits 0 +/- 3 (sigma 1)."""
+
+    def _check(self, data, rule):
+        return RuleEngine(0, -3, 3, [rule]).feed(data).get(rule, [])
+
+    def test_2_of_3_beyond_2sigma(self):
+        assert self._check([0, 2.5, 0, 2.5], "2 of 3 beyond 2*sigma") == [3]
+        assert self._check([0, 2.5, 0, -2.5], "2 of 3 beyond 2*sigma") == []
+
+    def test_4_of_5_beyond_1sigma(self):
+        assert self._check([1.5, 1.5, 0, 1.5, 1.5, 0], "4 of 5 beyond 1*sigma") == [4]
+
+    def test_6_trending(self):
+        assert self._check([0, 1, 2, 3, 4, 5, 6, 6], "6 trending") == [5, 6]
+        assert self._check([5, 4, 3, 2, 1, 0], "6 trending") == [5]
+
+    def test_14_up_down(self):
+        data = [0, 1] * 7 + [1]
+        assert self._check(data, "14 up down") == [13]
+
+    def test_15_below_1sigma(self):
+        data = [0.5, -0.5] * 8
+        assert self._check(data, "15 below 1*sigma") == [14, 15]
+
+    def test_8_beyond_1sigma_both_sides(self):
+        rule = "8 beyond 1*sigma on both sides"
+        assert self._check([1.5, -1.5] * 4, rule) == [7]
+        assert self._check([1.5] * 8, rule) == []
+
+    def test_nelson_spc(self):
+        """Test Spc reports the Nelson rules for a level shift."""
+        data = [5] * 10 + [15] * 10
+        spc = Spc(data, CHART_X_MR_X, rules=RULES_NELSON)
+        violations = spc.get_violating_points()
+
+        assert "9 on one side" in violations
+        assert "8 beyond 1*sigma on both sides" in violations
+
+
+CUSTOM_RULES = [
+    "3 of 4 beyond 1.5 sigma",
+    "10 of 11 on one side",
+    "5 beyond 0.5*sigma",
+    "2 beyond 3.5 sigma",
+    "12 below 0.5 sigma",
+    "4 beyond 1.5*sigma on both sides",
+    "4 trending",
+    "8 up down",
+]
+
+
+class TestCustomRules:
+    """Tests for rules compiled from the rule language."""
+
+    def test_parse_rule(self):
+        assert parse_rule("3 of 4 beyond 1.5 sigma") == ("beyond", 3, 4, 1.5)
+        assert parse_rule("10 of 11 on one side") == ("beyond", 10, 11, 0)
+        assert parse_rule("9 On One  Side") == ("on one side", 9, 9, 0)
+        assert parse_rule("8 beyond 1*sigma on both sides") == ("both sides", 8, 8, 1)
+        assert parse_rule("5 trending") == ("trending", 5, 5, 0)
+        for r in RULES_ALL:
+            parse_rule(r)
+
+    @pytest.mark.parametrize("rule", [
+        "4 of 3 beyond 1 sigma", "0 on one side", "1 trending", "5 sideways", "2 beyond sigma"])
+    def test_parse_rule_errors(self, rule):
+        with pytest.raises(ValueError):
+            parse_rule(rule)
+
+    def test_builtin_rules_compile_to_same_result(self):
+        """Test the built-in rules written in another case compile to the same checks."""
+        rng = np.random.default_rng(5)
+        data = list(rng.normal(0, 1, 1000)) + list(rng.integers(-2, 3, 1000).astype(float))
+        center, lcl, ucl = get_stats_x_mr_x(data, size=1)
+        custom = [register_rule(r.upper()) for r in RULES_ALL]
+        expected = RuleEngine(center, lcl, ucl, RULES_ALL, warmup=1).feed(data)
+        result = RuleEngine(center, lcl, ucl, custom, warmup=1).feed(data)
+
+        assert result == dict((r.upper(), points) for r, points in expected.items())
+
+    def test_matches_reference(self):
+        """Test custom rules in one engine pass match the slice based check."""
+        rng = np.random.default_rng(9)
+        data = (list(rng.normal(0, 1, 3000)) + [6.0, 6.0, 0.0] +
+                list(rng.integers(-2, 3, 1000).astype(float)))
+        center, lcl, ucl = get_stats_x_mr_x(data, size=1)
+        rules = [register_rule(r) for r in CUSTOM_RULES] + RULES_WECO
+        expected = _reference_violations(data, center, lcl, ucl, rules)
+        result = RuleEngine(center, lcl, ucl, rules, warmup=1).feed(data)
+
+        assert result == expected
+        assert all(r in result for r in CUSTOM_RULES)
+
+    def test_fractional_sigma(self):
+        """Test levels between the zones use their own lines, per side."""
+        rule = register_rule("2 of 3 beyond 1.5 sigma")
+
+        assert RuleEngine(0, -3, 6, [rule]).feed([3.1, 0, 3.1]) == {rule: [2]}
+        assert RuleEngine(0, -3, 6, [rule]).feed([2.9, 0, 2.9]) == {}
+        assert RuleEngine(0, -3, 6, [rule]).feed([-1.6, 0, -1.6]) == {rule: [2]}
+
+    def test_varying_limits(self):
+        """Test fractional levels follow limits changing per point."""
+        rule = register_rule("2 of 2 beyond 1.5 sigma")
+        engine = RuleEngine(0, None, None, [rule])
+        result = engine.feed_varying([1.6, 1.6, 1.6], [0, 0, 0], [-3, -3, -3], [3, 3, 6])
+
+        assert result == {rule: [1]}
+
+    def test_spc(self):
+        """Test Spc, first violations and freezing take custom rules."""
+        rule = register_rule("3 of 4 beyond 1.5 sigma")
+        data = [0, 1, -1, 0, 1, -1, 0, 1, -1, 0, 2.5, 2.5, 1, 2.5]
+        spc = Spc(data, CHART_X_MR_X)
+
+        assert spc.get_violating_points([rule]) == {rule: [13]}
+        assert spc.first_violations([rule]) == {rule: 13}
+        assert spc.freeze().score(data, rules=[rule]) == {rule: [13]}
+
+    def test_register_builtin(self):
+        assert register_rule(RULES_9_ON_ONE_SIDE) is RULES_9_ON_ONE_SIDE
+        with pytest.raises(ValueError):
+            register_rule("7 on both sides")
+
+
+SUBGROUPS = [
+    [20, 21, 19, 22, 20],
+    [19, 20, 21, 20, 19],
+    [21, 22, 20, 21, 20],
+    [20, 19, 21, 20, 22],
+    [22, 23, 21, 20, 21],
+]
+COUNTS = [5, 3, 4, 6, 5, 4, 3, 7, 2, 5]
+
+
+class TestSpcTimes:
+    """Tests for charts with timestamps of the points."""
+
+    DATA = [10, 11, 10, 11, 10, 12, 10, 30, 11, 10, 11, 10, 12, 10, 11, 30]
+    # irregular sampling
+    TIMES = [datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=m)
+             for m in (0, 7, 30, 31, 45, 90, 100, 125, 180, 181, 200, 260, 270, 300, 301, 330)]
+
+    def test_violations_in_time_range(self):
+        """Test violations are selected by time, end excluded."""
+        spc = Spc(self.DATA, CHART_X_MR_X, times=self.TIMES)
+        start = datetime.datetime(2024, 1, 1, 2, 0)
+
+        assert spc.get_violating_points() == {"1 beyond 3*sigma": [7, 15], "7 on one side": [14]}
+        assert spc.index_range(start) == (7, 16)
+        assert spc.get_violating_points(start=start, end=self.TIMES[15]) == \
+            {"1 beyond 3*sigma": [7], "7 on one side": [14]}
+        # keys in order of the first violation in the range
+        assert list(spc.get_violating_points(start=self.TIMES[8])) == ["7 on one side", "1 beyond 3*sigma"]
+        assert spc.get_violating_points(end=start) == {}
+        assert spc.get_violating_times(["1 beyond 3*sigma"]) == \
+            {"1 beyond 3*sigma": [self.TIMES[7], self.TIMES[15]]}
+
+    def test_placeholder_chart_times(self):
+        """Test times of charts with a placeholder first point."""
+        spc = Spc([2, 3, 2, 2, 3, 2, 20], CHART_P, sizes=50, times=list(range(10, 17)))
+
+        assert spc.get_violating_points() == {"1 beyond 3*sigma": [7]}
+        assert spc.get_violating_times() == {"1 beyond 3*sigma": [16]}
+        assert spc.get_violating_points(start=16) == {"1 beyond 3*sigma": [7]}
+        assert spc.get_violating_points(start=17) == {}
+
+    def test_extend_with_times(self):
+        """Test times of appended points travel with them."""
+        spc = Spc(self.DATA[:8], CHART_X_MR_X, times=self.TIMES[:8])
+        spc.extend(self.DATA[8:], self.TIMES[8:])
+
+        assert spc.times == self.TIMES
+        assert spc.get_violating_times(start=self.TIMES[8])["1 beyond 3*sigma"] == [self.TIMES[15]]
+        with pytest.raises(AssertionError):
+            spc.append(5)
+        with pytest.raises(AssertionError):
+            spc.append(5, self.TIMES[0])
+
+    def test_unsorted_times(self):
+        """Test times must be sorted."""
+        with pytest.raises(AssertionError):
+            Spc(self.DATA, CHART_X_MR_X, times=self.TIMES[::-1])
+
+    def test_numpy_times(self):
+        """Test datetime64 times are searched with searchsorted."""
+        times = np.array(self.TIMES, dtype="datetime64[m]")
+        spc = Spc(self.DATA, CHART_X_MR_X, times=times)
+
+        assert spc.get_violating_points(start=np.datetime64("2024-01-01T02:00")) == \
+            {"1 beyond 3*sigma": [7, 15], "7 on one side": [14]}
+
+    def test_extend_with_numpy_times(self):
+        """Test datetime64 times of appended points stay an array."""
+        times = np.array(self.TIMES, dtype="datetime64[m]")
+        spc = Spc(self.DATA[:8], CHART_X_MR_X, times=times[:8])
+        spc.extend(self.DATA[8:12], times[8:12])
+        spc.append(self.DATA[12], times[12])
+        spc.extend(self.DATA[13:], times[13:])
+        spc.extend([], times[:0])
+
+        assert isinstance(spc.times, np.ndarray)
+        assert (spc.times == times).all()
+        assert spc.get_violating_times(start=times[8])["1 beyond 3*sigma"] == [times[15]]
+        with pytest.raises(AssertionError):
+            spc.append(5, times[0])
+
+
+class TestSpcAppend:
+    """Tests for incremental Spc.append / Spc.extend."""
+
+    @pytest.mark.parametrize("chart_type, data, size", [
+        (CHART_X_MR_X, [1, 2, 3, 3, 2, 1, 3, 8, 2.5], 1),
+        (CHART_X_MR_MR, [1, 2, 3, 3, 2, 1, 3, 8, 2.5], 1),
+        (CHART_X_BAR_R_X, SUBGROUPS, 5),
+        (CHART_X_BAR_R_R, SUBGROUPS, 5),
+        (CHART_X_BAR_S_X, SUBGROUPS, 5),
+        (CHART_X_BAR_S_S, SUBGROUPS, 5),
+        (CHART_P, COUNTS, 100),
+        (CHART_NP, COUNTS, 100),
+        (CHART_C, COUNTS, 1),
+        (CHART_U, COUNTS, 10),
+    ])
+    def test_append_matches_batch(self, chart_type, data, size):
+        """Test appended data gives the same limits and points as a new Spc."""
+        sizes = None if size in (1, 5) else size
+        spc = Spc(data[:3], chart_type, sizes=sizes)
+        for value in data[3:]:
+            spc.append(value)
+        full = Spc(data, chart_type, sizes=sizes)
+
+        assert spc.get_stats() == pytest.approx(full.get_stats())
+        assert spc._data == pytest.approx(full._data)
+
+    def test_limit_history_is_compact(self):
+        """Test limits are recorded only when they change, in array columns."""
+        data = [1, 2, 3, 3, 2, 1, 3, 8]
+        cusum = Spc(data, CHART_CUSUM, rules=RULES_ALL)
+        spc = Spc(data, CHART_X_MR_X, rules=RULES_ALL)
+        for i in range(200):
+            cusum.append(data[i % len(data)])
+            spc.append(data[i % len(data)])
+        spc.extend([])
+
+        assert len(cusum._limits) == 1
+        assert len(spc._limits) == 201
+        assert spc._limits.centers.typecode == "d"
+        assert spc._limits[-1] == (len(spc._data) - 1,) + spc.get_stats()
+        assert spc.get_violating_points(RULES_NELSON) == \
+            Spc(data, CHART_X_MR_X, rules=RULES_ALL, newdata=[data[i % len(data)] for i in range(200)]
+                ).get_violating_points(RULES_NELSON)
+
+    def test_running_stats_for_all_charts(self):
+        """Test every chart with stats and prepared data has running stats."""
+        for chart_type, (sf, pd) in STATS_FUNCS.items():
+            if sf is not None:
+                assert chart_type in RUNNING_STATS
+
+    def test_append_reports_new_violations(self):
+        """Test append returns only the violations of the new point."""
+        spc = Spc([1, 2, 3, 3, 2, 1, 3, 2, 1, 2], CHART_X_MR_X)
+        violations = spc.append(50)
+
+        assert violations == {"1 beyond 3*sigma": [10]}
+        assert spc.get_violating_points()["1 beyond 3*sigma"] == [10]
+        assert spc.append(2) == {}
+
+    def test_newdata(self):
+        """Test newdata is appended after the initial data."""
+        spc = Spc([1, 2, 3, 3, 2], CHART_X_MR_X, newdata=[1, 3, 8])
+        full = Spc([1, 2, 3, 3, 2, 1, 3, 8], CHART_X_MR_X)
+
+        assert spc.get_stats() == pytest.approx(full.get_stats())
+        assert list(spc.orig_data) == [1, 2, 3, 3, 2, 1, 3, 8]
+
+    @pytest.mark.parametrize("newdata", [np.array([1.0, 3, 8]), array("d", [1, 3, 8])])
+    def test_newdata_array(self, newdata):
+        """Test newdata given as an array is appended too."""
+        spc = Spc([1, 2, 3, 3, 2], CHART_X_MR_X, newdata=newdata, times=list(range(8)))
+        full = Spc([1, 2, 3, 3, 2, 1, 3, 8], CHART_X_MR_X)
+
+        assert spc.get_stats() == pytest.approx(full.get_stats())
+        assert spc.times == list(range(8))
+        assert Spc([1, 2, 3], CHART_X_MR_X, newdata=np.array([])).get_stats() == \
+            Spc([1, 2, 3], CHART_X_MR_X).get_stats()
+
+    def test_append_does_not_change_input(self):
+        """Test the list passed to Spc is not modified by append."""
+        data = [1, 2, 3, 3, 2]
+        spc = Spc(data, CHART_X_MR_X)
+        spc.extend([4, 5])
+
+        assert data == [1, 2, 3, 3, 2]
+
+    def test_append_cusum(self):
+        """Test CUSUM continues around the target of the initial data."""
+        spc = Spc([1, 2, 3], CHART_CUSUM, rules=[])
+        spc.extend([4, 5])
+
+        assert list(spc._data) == [0, -1.0, -1.0, 0.0, 2.0, 5.0]
+
+
+class TestSubgroupStats:
+    """Tests for the single pass subgroup statistics."""
+
+    @pytest.mark.parametrize("offset", [0, 1e6, 1e12])
+    def test_matches_statistics(self, offset):
+        """Test means, ranges and deviations agree with the statistics module."""
+        rng = np.random.default_rng(9)
+        data = [list(offset + rng.normal(0, 1, rng.integers(2, 11))) for _ in range(500)]
+        means, ranges, stds = subgroup_stats(data)
+
+        assert means == pytest.approx([statistics.mean(x) for x in data], rel=1e-14, abs=1e-14)
+        assert ranges == [max(x) - min(x) for x in data]
+        assert stds == pytest.approx([statistics.stdev(x) for x in data], rel=1e-13)
+
+    def test_prepared_data(self):
+        """Test Xbar and S points are the ones of the statistics module."""
+        data = SUBGROUPS + [[1, 1, 1, 1, 1], [0.1, 0.2, 0.3, 0.4, 0.5]]
+
+        assert prepare_data_x_bar_rs_x(data, 5) == pytest.approx([statistics.mean(x) for x in data])
+        assert prepare_data_x_bar_s_s(data, 5) == pytest.approx([statistics.stdev(x) for x in data])
+        assert prepare_data_x_bar_s_s([[2, 2, 2]], 3) == [0]
+
+
+class TestSpcPair:
+    """Tests for location and dispersion charts computed together."""
+
+    @pytest.mark.parametrize("pair, data", [
+        (PAIR_X_BAR_R, SUBGROUPS + [[20, 21, 20, 21, 20]]),
+        (PAIR_X_BAR_S, SUBGROUPS + [[20, 21, 20, 21, 20]]),
+        (PAIR_X_MR, [1, 2, 3, 3, 2, 1, 3, 8, 2.5, 3, 3.5]),
+    ])
+    def test_matches_single_charts(self, pair, data):
+        """Test both charts equal the charts computed one by one."""
+        result = SpcPair(data, pair, rules=RULES_ALL)
+
+        for spc, chart_type in zip((result.location, result.dispersion), PAIRED_CHARTS[pair]):
+            expected = Spc(data, chart_type, rules=RULES_ALL)
+            assert spc.chart_type == chart_type
+            assert spc.get_stats() == pytest.approx(expected.get_stats())
+            assert list(spc._data) == pytest.approx(list(expected._data))
+            assert spc.get_violating_points() == expected.get_violating_points()
+
+    def test_append(self):
+        """Test points can be appended to both charts of a pair."""
+        result = SpcPair([1, 2, 3, 3, 2, 1, 3, 2], PAIR_X_MR)
+
+        assert result.location.append(50) == {"1 beyond 3*sigma": [8]}
+        assert result.dispersion.get_stats() == pytest.approx(
+            Spc([1, 2, 3, 3, 2, 1, 3, 2], CHART_X_MR_MR).get_stats())
+
+
+class TestSpcProfile:
+    """Tests for all charts of the data computed together."""
+
+    @pytest.mark.parametrize("data, chart_types", [
+        ([1, 2, 3, 3, 2, 1, 3, 8, 2.5, 3, 3.5],
+         [CHART_X_MR_X, CHART_X_MR_MR, CHART_CUSUM, CHART_TABULAR_CUSUM]),
+        (SUBGROUPS + [[20, 21, 20, 21, 20]],
+         [CHART_X_BAR_R_X, CHART_X_BAR_R_R, CHART_X_BAR_S_X, CHART_X_BAR_S_S]),
+    ])
+    def test_matches_single_charts(self, data, chart_types):
+        """Test every chart of the profile equals the chart computed alone."""
+        profile = SpcProfile(data, rules=RULES_ALL)
+
+        assert list(profile.charts) == chart_types
+        for chart_type in chart_types:
+            expected = Spc(data, chart_type, rules=RULES_ALL)
+            assert profile[chart_type].get_stats() == pytest.approx(expected.get_stats())
+            assert list(profile[chart_type]._data) == pytest.approx(list(expected._data))
+            assert profile.get_violating_points()[chart_type] == expected.get_violating_points()
+
+    def test_shared_means(self):
+        """Test Xbar charts share their points, also after appending to one."""
+        profile = SpcProfile(SUBGROUPS)
+        r_chart, s_chart = profile[CHART_X_BAR_R_X], profile[CHART_X_BAR_S_X]
+
+        assert r_chart._data is s_chart._data
+        r_chart.append([20, 21, 20, 21, 20])
+        assert len(s_chart._data) == len(SUBGROUPS)
+
+
+class TestMergeStats:
+    """Tests for merging statistics of data shards."""
+
+    @pytest.mark.parametrize("chart_type, data, size", [
+        (CHART_X_MR_X, [1, 2, 3, 3, 2, 1, 3, 8, 2.5], 1),
+        (CHART_X_MR_MR, [1, 2, 3, 3, 2, 1, 3, 8, 2.5], 1),
+        (CHART_X_BAR_R_X, SUBGROUPS, 5),
+        (CHART_X_BAR_S_S, SUBGROUPS, 5),
+        (CHART_P, COUNTS, 100),
+        (CHART_NP, COUNTS, 100),
+        (CHART_C, COUNTS, 1),
+        (CHART_U, COUNTS, 10),
+    ])
+    def test_merged_shards_match_whole(self, chart_type, data, size):
+        """Test limits of merged shards equal the limits of all data."""
+        shards = [data[:2], data[2:3], data[3:]]
+        parts = [get_partial_stats(shard, chart_type, size) for shard in shards]
+        # merging is associative, the grouping does not matter
+        left = merge_stats(parts)
+        right = merge_stats([parts[0], merge_stats(parts[1:])])
+        whole = STATS_FUNCS[chart_type][0](data, size)
+
+        assert left.get_stats() == whole
+        assert right.get_stats() == whole
+
+    @pytest.mark.parametrize("chart_type", [CHART_X_MR_X, CHART_X_MR_MR, CHART_X_BAR_R_X, CHART_X_BAR_S_X])
+    def test_merged_limits_are_exact(self, chart_type):
+        """Test merged limits equal single pass limits bit for bit."""
+        rng = np.random.default_rng(13)
+        for _ in range(50):
+            if chart_type in (CHART_X_MR_X, CHART_X_MR_MR):
+                size = 1
+                data = rng.normal(1000, 7.3, rng.integers(8, 40)).tolist()
+            else:
+                size = 5
+                data = rng.normal(10, 3, (rng.integers(8, 40), size)).tolist()
+            cuts = sorted(rng.choice(range(1, len(data)), 3, replace=False).tolist())
+            cuts = [0] + cuts + [len(data)]
+            parts = [get_partial_stats(data[a:b], chart_type, size) for a, b in zip(cuts, cuts[1:])]
+
+            assert merge_stats(parts).get_stats() == STATS_FUNCS[chart_type][0](data, size)
+
+    def test_merge_keeps_parts(self):
+        """Test merge_stats does not modify the first part."""
+        parts = [get_partial_stats(d, CHART_C) for d in ([1, 2], [3, 4])]
+        merge_stats(parts)
+
+        assert parts[0].n == 2
+
+    def test_merge_tabular_cusum(self):
+        """Test merged tabular CUSUM sums equal the sums over all data."""
+        data = [10, 11, 12, 9, 8, 8, 13, 12, 10, 7]
+        whole = TabularCusum(target=10, sigma=1)
+        whole.extend(data)
+        parts = []
+        for shard in (data[:3], data[3:4], data[4:]):
+            part = TabularCusum(target=10, sigma=1)
+            part.extend(shard)
+            parts.append(part)
+        merged = merge_stats(parts)
+
+        assert (merged.sh, merged.sl) == pytest.approx((whole.sh, whole.sl))
+
+    @pytest.mark.parametrize("chart_type", [CHART_CUSUM, CHART_TABULAR_CUSUM])
+    def test_partial_stats_target(self, chart_type):
+        """Test shards of CUSUM charts merge with a target given to all."""
+        data = [10, 11, 12, 9, 8, 8, 13, 12, 10, 7]
+        sigma = 1 if chart_type == CHART_TABULAR_CUSUM else None
+        whole = get_partial_stats(data, chart_type, target=10, sigma=sigma)
+        parts = [get_partial_stats(shard, chart_type, target=10, sigma=sigma)
+                 for shard in (data[:3], data[3:4], data[4:])]
+        merged = merge_stats(parts)
+
+        assert merged.target == 10
+        assert merged.get_stats() == whole.get_stats()
+        if chart_type == CHART_CUSUM:
+            assert merged.s == pytest.approx(whole.s)
+        else:
+            assert (merged.sh, merged.sl) == pytest.approx((whole.sh, whole.sl))
+
+    def test_partial_stats_target_other_charts(self):
+        """Test a target is refused for charts without one."""
+        with pytest.raises(ValueError):
+            get_partial_stats([1, 2, 3], CHART_X_MR_X, target=2)
+        with pytest.raises(ValueError):
+            get_partial_stats([1, 2, 3], CHART_CUSUM, target=2, sigma=1)
+
+    def test_unsupported_merge_names_chart(self):
+        """Test statistics without merge or window raise TypeError naming the chart."""
+        cusum = get_partial_stats([10, 11, 12], CHART_TABULAR_CUSUM, target=10, sigma=1)
+
+        with pytest.raises(TypeError, match=CHART_TABULAR_CUSUM):
+            cusum.discard(10, 11)
+
+
+class TestWindowLimits:
+    """Tests for limits from a rolling or expanding window."""
+
+    @pytest.mark.parametrize("chart_type, data, size", [
+        (CHART_X_MR_X, [1, 2, 3, 3, 2, 1, 3, 8, 2.5, 4], None),
+        (CHART_X_MR_MR, [1, 2, 3, 3, 2, 1, 3, 8, 2.5, 4], None),
+        (CHART_X_BAR_R_X, SUBGROUPS, None),
+        (CHART_X_BAR_S_S, SUBGROUPS, None),
+        (CHART_P, COUNTS, 100),
+        (CHART_U, COUNTS, 10),
+    ])
+    @pytest.mark.parametrize("window", [None, 4])
+    def test_limits_match_window_slices(self, chart_type, data, size, window):
+        """Test limits of each point equal the limits of its window."""
+        points, centers, lcls, ucls = window_limits(data, chart_type, window, size)
+
+        assert len(points) == len(data)
+        for i in range(1, len(data)):
+            start = 0 if window is None else max(0, i + 1 - window)
+            expected = Spc(data[start:i + 1], chart_type, sizes=size).get_stats()
+            assert (centers[i], lcls[i], ucls[i]) == pytest.approx(expected)
+
+    def test_expanding_matches_appends(self):
+        """Test the expanding window checks points as Spc.append does."""
+        data = [1, 2, 3, 3, 2, 1, 3, 8, 2, 2, 2, 2, 2, 2, 2, 2, 2, -9]
+        spc = Spc(data[:2], CHART_X_MR_X, rules=RULES_ALL)
+        for x in data[2:]:
+            spc.append(x)
+        limits, violations = check_window(data, CHART_X_MR_X, RULES_ALL)
+
+        assert limits[1][-1] == pytest.approx(spc.get_stats()[0])
+        assert violations == spc.get_violating_points()
+        assert violations["1 beyond 3*sigma"] == [7, 17]
+
+    def test_rolling_follows_shift(self):
+        """Test a rolling window adapts to a level shift."""
+        data = [10, 11, 10, 9, 10, 11, 10, 9] + [20, 21, 20, 19, 20, 21, 20, 19, 20]
+        expanding = check_window(data, CHART_X_MR_X)[1]
+        rolling = check_window(data, CHART_X_MR_X, window=4)[1]
+
+        # the expanding window keeps flagging the new level
+        assert expanding["1 beyond 3*sigma"][:3] == [8, 9, 10]
+        # points are part of their own window, the shift widens the limits
+        assert rolling == {}
+
+    def test_cusum_not_supported(self):
+        """Test CUSUM charts have no window limits."""
+        with pytest.raises(NotImplementedError):
+            window_limits([1, 2, 3], CHART_CUSUM, 2)
+
+
+class TestFrozenLimits:
+    """Tests for Phase I / Phase II scoring with frozen limits."""
+
+    def test_score_against_baseline(self):
+        """Test new data is checked against the baseline limits."""
+        baseline = Spc([1, 2, 3, 3, 2, 1, 3, 2], CHART_X_MR_X)
+        limits = baseline.freeze()
+
+        assert limits.get_stats() == baseline.get_stats()
+        assert limits.score([2, 3, 9]) == {"1 beyond 3*sigma": [2]}
+        assert baseline.get_stats() == limits.get_stats()
+
+    def test_score_moving_range_uses_baseline(self):
+        """Test the first moving range of a batch uses the last baseline value."""
+        limits = Spc([1, 2, 1, 2, 1, 2, 1, 2], CHART_X_MR_MR).freeze()
+
+        assert limits.prepare([2, 3]) == [0, 1]
+        assert limits.prepare([30, 31]) == [28, 1]
+        assert limits.score([30, 31]) == {"1 beyond 3*sigma": [0]}
+
+    def test_score_p_chart(self):
+        """Test p chart indexes point into the scored batch."""
+        limits = Spc(COUNTS, CHART_P, sizes=100).freeze()
+
+        assert limits.prepare([5, 50]) == [0.05, 0.5]
+        assert limits.score([5, 50]) == {"1 beyond 3*sigma": [1]}
+
+    def test_score_subgroups(self):
+        """Test Xbar chart scoring of new subgroups."""
+        limits = Spc(SUBGROUPS, CHART_X_BAR_R_X).freeze()
+        result = limits.score([[20, 21, 20, 21, 20], [30, 31, 30, 31, 30]])
+
+        assert result == {"1 beyond 3*sigma": [1]}
+
+    def test_score_tabular_cusum(self):
+        """Test tabular CUSUM batches are scored with the baseline target and sigma."""
+        limits = Spc([10, 11, 9, 10, 11, 9, 10, 10], CHART_TABULAR_CUSUM, rules=[]).freeze()
+        result = limits.score([12] * 10, rules=["1 beyond 3*sigma"])
+
+        assert limits.target == 10
+        assert result["1 beyond 3*sigma"][-1] == 9
+
+    def test_stored_limits(self):
+        """Test limits can be created from stored values."""
+        limits = FrozenLimits(CHART_X_MR_X, 0, -3, 3)
+
+        assert limits.score([0, 1, 4, -4]) == {"1 beyond 3*sigma": [2, 3]}
+
 
 class TestEdgeCases:
     """Tests for edge cases and error handling."""
@@ -220,6 +1343,17 @@ class TestEdgeCases:
             data = [5]
             spc = Spc(data, CHART_X_MR_X)
 
+    def test_buffer_input_pure_python(self):
+        """Test array and memoryview input without the NumPy backend."""
+        data = [1, 2, 3, 3, 2, 1, 3, 8]
+        expected = Spc(data, CHART_X_MR_MR)
+        buf = array("d", data)
+
+        for d in (buf, memoryview(buf)):
+            spc = Spc(d, CHART_X_MR_MR, backend=BACKEND_PYTHON)
+            assert spc.get_stats() == expected.get_stats()
+            assert spc.get_violating_points() == expected.get_violating_points()
+
     def test_empty_data(self):
         """Test handling of empty data."""
         with pytest.raises((AssertionError, ValueError, IndexError)):